@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency of the CDC consumer with in-process stand-ins.
+
+Seeds a SQLite stand-in source with --backlog rows, which the consumer
+catches up by polling, then plays source transactions of --txn-rows rows at
+--rate rows/sec for --seconds through a StandinChangeStream. The real
+CdcConsumer micro-batches them into the sink (the SQLite stand-in, or a
+real Postgres with --sink-dsn). Prints one JSON object with rows/sec,
+commit-to-load latency percentiles and the number of micro-batches, and
+exits 1 if any row is missing from the sink or the stream's last position
+was not acknowledged.
+
+    python benchmarks/bench_cdc.py --rate 20000 --txn-rows 50 --seconds 10
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kind', choices=['mysql', 'postgres'], default='postgres')
+    parser.add_argument('--backlog', type=int, default=10000, help='Rows caught up by polling before streaming')
+    parser.add_argument('--rate', type=int, default=10000, help='Source rows committed per second')
+    parser.add_argument('--txn-rows', type=int, default=50, help='Rows per source transaction')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--max-batch-rows', type=int, default=5000)
+    parser.add_argument('--max-batch-delay', type=float, default=0.2)
+    parser.add_argument('--sink-dsn', help='Load into this Postgres instead of the SQLite stand-in')
+    parser.add_argument('--workdir', help='Where to seed stand-ins (default: a temp dir)')
+    parser.add_argument('--output', help='Also write the result as JSON to this file')
+    args = parser.parse_args()
+
+    from bench_ingest import build_sink, seed_sink, seed_source
+    from dagster_etl.cdc import CdcConsumer, MicroBatcher
+    from dagster_etl.config import EndpointConfig
+    from dagster_etl.connectors import CONNECTORS
+    import standins
+
+    logging.basicConfig(level=logging.WARNING)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='bench_cdc_'))
+    workdir.mkdir(parents=True, exist_ok=True)
+    source_path, sink_path = str(workdir / f'{args.kind}.sqlite'), str(workdir / 'supabase.sqlite')
+    seed_source(source_path, args.kind, args.backlog)
+    if not args.sink_dsn:
+        seed_sink(sink_path)
+
+    connector = CONNECTORS[args.kind]
+    endpoint_name = f"bench-cdc-{args.kind}"
+    supabase = build_sink(args.sink_dsn, sink_path)
+    supabase.execute_query(f"DELETE FROM {connector.table} WHERE endpoint_name = %s", (endpoint_name,))
+    supabase.execute_query("DELETE FROM ingest_state WHERE endpoint_name = %s", (endpoint_name,))
+    source = (standins.SqliteMySQLEndpoint if args.kind == 'mysql' else standins.SqlitePostgresEndpoint)(path=source_path)
+
+    config = EndpointConfig(args.kind, endpoint_name, 'localhost', 0, endpoint_id=1, chunk_size=5000, max_chunk_size=50000)
+    stream = standins.StandinChangeStream()
+    consumer = CdcConsumer(supabase, source, config, logging.getLogger("bench_cdc"), stream=stream)
+    consumer.batcher = MicroBatcher(args.max_batch_rows, args.max_batch_delay)
+    stop = threading.Event()
+    thread = threading.Thread(target=consumer.run, args=(stop,))
+    thread.start()
+
+    # Stream after the backlog, one transaction every txn_rows / rate seconds
+    next_id, interval = args.backlog + 1, args.txn_rows / args.rate
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.seconds:
+        rows = [
+            (i, datetime.now(), *(round(random.uniform(-10, 10), 6) for _ in connector.channels))
+            for i in range(next_id, next_id + args.txn_rows)
+        ]
+        stream.commit(rows)
+        next_id += args.txn_rows
+        time.sleep(max(0.0, started + (next_id - args.backlog - 1) / args.rate - time.perf_counter()))
+    streamed = next_id - args.backlog - 1
+    stop.set()
+    thread.join()
+    elapsed = time.perf_counter() - started
+
+    loaded = supabase.execute_query(
+        f"SELECT COUNT(*) AS n FROM {connector.table} WHERE endpoint_name = %s", (endpoint_name,)
+    )[0]['n']
+    latencies = np.fromiter(consumer.latencies, dtype=np.float64) * 1000
+    p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (None, None)
+    result = {
+        "kind": args.kind,
+        "caught_up_rows": consumer.caught_up_rows,
+        "streamed_rows": consumer.streamed_rows,
+        "rows_per_sec": round(streamed / elapsed, 1),
+        "micro_batches": consumer.flushes,
+        "latency_p50_ms": round(p50, 1) if p50 is not None else None,
+        "latency_p99_ms": round(p99, 1) if p99 is not None else None,
+        "latency_max_ms": round(latencies.max(), 1) if len(latencies) else None,
+        "sink_rows": loaded,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+
+    failures = []
+    if loaded != args.backlog + streamed:
+        failures.append(f"sink holds {loaded} rows, expected {args.backlog + streamed}")
+    if stream.acknowledged != stream.position:
+        failures.append(f"last acknowledged position {stream.acknowledged}, stream at {stream.position}")
+    if failures:
+        print("CDC check failed:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
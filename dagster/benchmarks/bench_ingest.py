@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+End-to-end ingestion benchmark with local stand-in endpoints.
+
+Seeds SQLite stand-ins for the MySQL and PostgreSQL `measurements` tables
+and a folder tree like the file endpoint's /data. It then materializes the
+real ingest_* assets against them, each scenario in a fresh process so
+peak RSS is per scenario. The sink is a SQLite stand-in by default; pass
+--sink-dsn to load into a real Postgres with supabase/init.sql applied.
+
+Prints one JSON object per scenario (rows/sec, p50/p99 chunk latency, peak
+RSS, round trips). With --baseline, exits 1 if any scenario's rows/sec
+dropped by more than --tolerance.
+
+    python benchmarks/bench_ingest.py --rows 100000 --folders 1000 --output bench.json
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue as queue_module
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+ASSETS = {
+    'mysql': 'ingest_mysql_data',
+    'postgres': 'ingest_postgres_data',
+    'file': 'ingest_file_data',
+}
+
+XML_TEMPLATE = """<?xml version='1.0' encoding='utf-8'?>
+<measurement><timestamp>{timestamp}</timestamp><latitude>{lat}</latitude><longitude>{lon}</longitude><altitude>{alt}</altitude></measurement>"""
+
+KML_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document><Placemark><Point><coordinates>{lon},{lat},0</coordinates></Point></Placemark></Document></kml>"""
+
+
+def seed_source(path: str, kind: str, rows: int, batch: int = 50000):
+    """Fill a SQLite stand-in for an endpoint's measurements table"""
+    from standins import SOURCE_SCHEMAS
+
+    conn = sqlite3.connect(path)
+    conn.execute(SOURCE_SCHEMAS[kind])
+    channels = 3 if kind == 'mysql' else 6
+    start = datetime(2024, 1, 1)
+    placeholders = ', '.join(['?'] * (channels + 2))
+    for offset in range(0, rows, batch):
+        conn.executemany(
+            f"INSERT INTO measurements VALUES ({placeholders})",
+            (
+                (i + 1, start + timedelta(seconds=10 * i), *(round(random.uniform(-10, 10), 6) for _ in range(channels)))
+                for i in range(offset, min(offset + batch, rows))
+            )
+        )
+        conn.commit()
+    conn.close()
+
+
+def seed_folders(root: str, count: int, images: int = 3):
+    """Create file-endpoint style folders with XML, KMZ and placeholder images"""
+    start = datetime(2024, 1, 1)
+    past = time.time() - 3600
+    for i in range(count):
+        timestamp = start + timedelta(seconds=10 * i)
+        folder = Path(root) / timestamp.strftime("%Y%m%d_%H%M%S")
+        folder.mkdir(parents=True, exist_ok=True)
+        lat, lon = round(random.uniform(-90, 90), 6), round(random.uniform(-180, 180), 6)
+        (folder / "measurement.xml").write_text(
+            XML_TEMPLATE.format(timestamp=timestamp.isoformat(), lat=lat, lon=lon, alt=round(random.uniform(0, 1000), 2))
+        )
+        with zipfile.ZipFile(folder / "location.kmz", 'w', zipfile.ZIP_DEFLATED) as kmz:
+            kmz.writestr("doc.kml", KML_TEMPLATE.format(lat=lat, lon=lon))
+        for n in range(images):
+            (folder / f"image_{n + 1}.jpg").write_bytes(b'\xff\xd8\xff\xd9')
+        # Backdate so the settle check treats the folder as complete
+        os.utime(folder, (past, past))
+
+
+def seed_sink(path: str):
+    from standins import SINK_SCHEMA
+
+    conn = sqlite3.connect(path)
+    conn.executescript(SINK_SCHEMA)
+    conn.close()
+
+
+def build_sink(args_sink_dsn: str, sink_path: str):
+    from standins import SqliteSupabase, TimedSupabase
+
+    if not args_sink_dsn:
+        return SqliteSupabase(path=sink_path)
+    dsn = urlparse(args_sink_dsn)
+    return TimedSupabase(
+        host=dsn.hostname or 'localhost',
+        port=dsn.port or 5432,
+        user=dsn.username or 'postgres',
+        password=dsn.password or '',
+        database=(dsn.path or '/postgres').lstrip('/'),
+    )
+
+
+def run_scenario(scenario: dict, results):
+    """Materialize one ingest asset in this (fresh) process and report its metrics"""
+    os.environ['FILE_DATA_DIR'] = scenario['data_dir']
+
+    from dagster import materialize
+    from dagster_etl import assets
+    import standins
+
+    kind = scenario['kind']
+    endpoint_name = f"bench-{kind}"
+    supabase = build_sink(scenario['sink_dsn'], scenario['sink_path'])
+
+    # Start every scenario from an empty target
+    table = {'mysql': 'accelerometer_data', 'postgres': 'accel_mag_data', 'file': 'file_metadata'}[kind]
+    supabase.execute_query(f"DELETE FROM {table} WHERE endpoint_name = %s", (endpoint_name,))
+    supabase.execute_query("DELETE FROM ingest_state WHERE endpoint_name = %s", (endpoint_name,))
+    if kind == 'file' and scenario['file_mode'] == 'incremental':
+        # A recent sweep makes the run use the high-water-mark scan instead of reconciling
+        supabase.save_checkpoint('file_metadata', endpoint_name, last_reconciled_at=datetime.now())
+    standins.ROUND_TRIPS.clear()
+    standins.CHUNK_SECONDS.clear()
+
+    resources = {'supabase': supabase}
+    if kind == 'mysql':
+        resources['mysql_endpoint'] = standins.SqliteMySQLEndpoint(path=scenario['source_path'])
+    elif kind == 'postgres':
+        resources['postgres_endpoint'] = standins.SqlitePostgresEndpoint(path=scenario['source_path'])
+
+    if kind == 'file':
+        max_chunks = scenario['folders']
+    else:
+        max_chunks = math.ceil(scenario['rows'] / scenario['chunk_size']) + 1
+    tags = {
+        "endpoint_name": endpoint_name,
+        "chunk_size": str(scenario['chunk_size']),
+        "max_chunks_per_run": str(max_chunks),
+        "pipeline_depth": str(scenario['pipeline_depth']),
+        "adaptive_chunking": str(scenario['adaptive']).lower(),
+        "min_chunk_size": str(scenario['chunk_size']),
+        "max_chunk_size": str(scenario['max_chunk_size']),
+        "run_time_budget_seconds": "86400",
+    }
+
+    asset = assets.INGEST_ASSETS.get(kind, assets.ingest_file_data)
+    started = time.perf_counter()
+    result = materialize([asset], resources=resources, tags=tags)
+    elapsed = time.perf_counter() - started
+    output = result.output_for_node(ASSETS[kind])
+
+    latencies = sorted(standins.CHUNK_SECONDS)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    results.put({
+        "scenario": scenario['name'],
+        "kind": kind,
+        "rows": output["ingested_count"],
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(output["ingested_count"] / elapsed, 1) if elapsed else None,
+        "chunks": len(latencies),
+        "chunk_p50_ms": round(quantiles[49] * 1000, 3) if quantiles else None,
+        "chunk_p99_ms": round(quantiles[98] * 1000, 3) if quantiles else None,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "round_trips": dict(standins.ROUND_TRIPS),
+    })
+
+
+def check_baseline(results: list, baseline_path: str, tolerance: float) -> list:
+    """Scenarios whose rows/sec fell more than tolerance below the baseline"""
+    baseline = {r["scenario"]: r for r in json.loads(Path(baseline_path).read_text())}
+    regressions = []
+    for r in results:
+        before = baseline.get(r["scenario"])
+        if before and before.get("rows_per_sec") and r["rows_per_sec"] < before["rows_per_sec"] * (1 - tolerance):
+            regressions.append(f"{r['scenario']}: {r['rows_per_sec']} rows/s vs baseline {before['rows_per_sec']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='Rows seeded per database endpoint (1k-10M)')
+    parser.add_argument('--folders', type=int, default=1000, help='Folders seeded for the file endpoint (100-100k)')
+    parser.add_argument('--kinds', default='mysql,postgres,file')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--max-chunk-size', type=int, default=50000)
+    parser.add_argument('--pipeline-depth', type=int, default=2)
+    parser.add_argument('--adaptive', action='store_true')
+    parser.add_argument('--file-mode', choices=['incremental', 'reconcile'], default='incremental')
+    parser.add_argument('--sink-dsn', help='Load into this Postgres instead of the SQLite stand-in')
+    parser.add_argument('--workdir', help='Where to seed stand-ins (default: a temp dir)')
+    parser.add_argument('--output', help='Also write the results as a JSON array to this file')
+    parser.add_argument('--baseline', help='JSON results from a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--timeout', type=float, default=3600, help='Seconds allowed per scenario')
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='bench_ingest_'))
+    workdir.mkdir(parents=True, exist_ok=True)
+    kinds = args.kinds.split(',')
+
+    sink_path = str(workdir / 'supabase.sqlite')
+    if not args.sink_dsn:
+        seed_sink(sink_path)
+
+    scenarios = []
+    for kind in kinds:
+        scenario = {
+            "name": f"{kind}-{args.folders if kind == 'file' else args.rows}",
+            "kind": kind,
+            "rows": args.rows,
+            "folders": args.folders,
+            "chunk_size": args.chunk_size,
+            "max_chunk_size": args.max_chunk_size,
+            "pipeline_depth": args.pipeline_depth,
+            "adaptive": args.adaptive,
+            "file_mode": args.file_mode,
+            "sink_dsn": args.sink_dsn,
+            "sink_path": sink_path,
+            "source_path": str(workdir / f'{kind}.sqlite'),
+            "data_dir": str(workdir / 'data'),
+        }
+        started = time.perf_counter()
+        if kind == 'file':
+            if not Path(scenario["data_dir"]).exists():
+                seed_folders(scenario["data_dir"], args.folders)
+        elif not Path(scenario["source_path"]).exists():
+            seed_source(scenario["source_path"], kind, args.rows)
+        print(f"Seeded {scenario['name']} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        scenarios.append(scenario)
+
+    # Spawned processes don't inherit the parent's memory, so peak RSS is the scenario's own
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for scenario in scenarios:
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_scenario, args=(scenario, queue))
+        process.start()
+        # Read before joining: a child blocked on flushing the queue would never exit
+        try:
+            result = queue.get(timeout=args.timeout)
+        except queue_module.Empty:
+            result = None
+        process.join()
+        if result is None or process.exitcode != 0:
+            raise SystemExit(f"Scenario {scenario['name']} failed with exit code {process.exitcode}")
+        results.append(result)
+        print(json.dumps(result), flush=True)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = check_baseline(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the dagster_etl code location.
+
+Every run worker started by the DefaultRunLauncher and every sensor tick
+imports the code location before doing any work, so its import time is paid
+hundreds of times an hour. This imports it in fresh interpreters under
+``python -X importtime``, keeps the fastest of --repeat attempts, and prints
+one JSON object with the total, the slowest modules by cumulative time, and
+any deferred module that was imported eagerly.
+
+Exits 1 if a module in DEFERRED_MODULES was imported, if the total is above
+--budget-ms, or if it grew more than --tolerance against --baseline.
+
+    python benchmarks/import_budget.py --output imports.json
+    python benchmarks/import_budget.py --budget-ms 2500 --baseline imports.json
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+# Drivers, libraries and package modules only some runs, assets or sensors need;
+# importing the code location must not load any of them
+DEFERRED_MODULES = (
+    'mysql.connector', 'asyncpg', 'aiomysql', 'pymysql', 'pymysqlreplication', 'watchdog', 'PIL',
+    'numpy', 'psycopg2',
+    'dagster_etl.bulk_load', 'dagster_etl.cdc', 'dagster_etl.columnar', 'dagster_etl.file_events',
+    'dagster_etl.images', 'dagster_etl.manifest', 'dagster_etl.metrics', 'dagster_etl.rollups', 'dagster_etl.spill',
+)
+
+_LINE_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile_import(module: str) -> dict:
+    """Import module in a fresh interpreter and parse its -X importtime report"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = _LINE_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2,
+            })
+    return {
+        "total_ms": round(sum(m["cumulative_ms"] for m in modules if m["depth"] == 0), 1),
+        "modules": modules,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='dagster_etl', help='Module to import')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to try; the fastest counts')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to report')
+    parser.add_argument('--budget-ms', type=float, help='Fail if the import takes longer than this')
+    parser.add_argument('--output', help='Also write the result as JSON to this file')
+    parser.add_argument('--baseline', help='JSON result from a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    # The first attempt also warms the filesystem cache and writes .pyc files
+    profile = min((profile_import(args.module) for _ in range(args.repeat)), key=lambda p: p["total_ms"])
+    imported = {m["module"] for m in profile["modules"]}
+    # package_ms is the package's own module bodies; slowest lists what they pull in
+    own = args.module.split('.')[0]
+    result = {
+        "module": args.module,
+        "total_ms": profile["total_ms"],
+        "package_ms": round(sum(m["self_ms"] for m in profile["modules"] if m["module"].split('.')[0] == own), 1),
+        "module_count": len(profile["modules"]),
+        "eager_modules": [name for name in DEFERRED_MODULES if name in imported],
+        "slowest": [
+            {"module": m["module"], "cumulative_ms": m["cumulative_ms"]}
+            for m in sorted(profile["modules"], key=lambda m: m["cumulative_ms"], reverse=True)
+            if m["module"].split('.')[0] != own
+        ][:args.top],
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+
+    failures = []
+    if result["eager_modules"]:
+        failures.append(f"imported at load time: {', '.join(result['eager_modules'])}")
+    if args.budget_ms is not None and result["total_ms"] > args.budget_ms:
+        failures.append(f"{result['total_ms']} ms is over the {args.budget_ms} ms budget")
+    if args.baseline:
+        before = json.loads(Path(args.baseline).read_text())
+        if result["total_ms"] > before["total_ms"] * (1 + args.tolerance):
+            failures.append(f"{result['total_ms']} ms vs baseline {before['total_ms']} ms")
+    if failures:
+        print("Import budget exceeded:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
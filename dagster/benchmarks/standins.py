@@ -0,0 +1,269 @@
+"""
+SQLite stand-ins for the endpoint and Supabase resources.
+
+They subclass the real resources and only replace the driver-specific
+pieces (connections, placeholders, COPY, GREATEST), so the ingest assets run
+their real code paths against local files. Every source fetch and sink
+statement is counted in ROUND_TRIPS, and every insert_batch call is timed
+in CHUNK_SECONDS. StandinChangeStream stands in for a replication stream.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from dagster_etl.cdc import ChangeBatch
+from dagster_etl.columnar import MeasurementBatch
+from dagster_etl.resources import (
+    CONFLICT_KEYS,
+    MYSQL_MEASUREMENT_COLUMNS,
+    POSTGRES_MEASUREMENT_COLUMNS,
+    MySQLEndpointResource,
+    PostgresEndpointResource,
+    SupabaseResource,
+)
+
+ROUND_TRIPS = Counter()
+CHUNK_SECONDS = []
+_lock = threading.Lock()
+
+SOURCE_SCHEMAS = {
+    'mysql': """
+        CREATE TABLE IF NOT EXISTS measurements (
+            id INTEGER PRIMARY KEY, timestamp TIMESTAMP NOT NULL,
+            accel_x REAL, accel_y REAL, accel_z REAL
+        )
+    """,
+    'postgres': """
+        CREATE TABLE IF NOT EXISTS measurements (
+            id INTEGER PRIMARY KEY, timestamp TIMESTAMP NOT NULL,
+            accel_x REAL, accel_y REAL, accel_z REAL,
+            mag_x REAL, mag_y REAL, mag_z REAL
+        )
+    """,
+}
+
+SINK_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ingest_control (
+        id INTEGER PRIMARY KEY, ip_address TEXT, port INTEGER, name TEXT, chunk_size INTEGER,
+        max_chunks_per_run INTEGER, active BOOLEAN, endpoint_type TEXT, database_name TEXT,
+        pipeline_depth INTEGER, adaptive_chunking BOOLEAN, min_chunk_size INTEGER,
+        max_chunk_size INTEGER, run_time_budget_seconds INTEGER, ingest_mode TEXT NOT NULL DEFAULT 'poll', file_source TEXT NOT NULL DEFAULT 'local',
+        updated_at TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS ingest_state (
+        target_table TEXT NOT NULL, endpoint_name TEXT NOT NULL, last_source_id INTEGER,
+        last_folder TEXT, last_reconciled_at TIMESTAMP, cdc_position INTEGER, rows_ingested INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP, PRIMARY KEY (target_table, endpoint_name)
+    );
+    CREATE TABLE IF NOT EXISTS accelerometer_data (
+        id INTEGER PRIMARY KEY, endpoint_name TEXT NOT NULL, timestamp TIMESTAMP NOT NULL,
+        accel_x REAL, accel_y REAL, accel_z REAL, source_id INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS accel_mag_data (
+        id INTEGER PRIMARY KEY, endpoint_name TEXT NOT NULL, timestamp TIMESTAMP NOT NULL,
+        accel_x REAL, accel_y REAL, accel_z REAL, mag_x REAL, mag_y REAL, mag_z REAL, source_id INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS file_metadata (
+        id INTEGER PRIMARY KEY, endpoint_name TEXT NOT NULL, folder_path TEXT NOT NULL,
+        xml_file TEXT, kmz_file TEXT, image_count INTEGER, measured_at TIMESTAMP,
+        latitude REAL, longitude REAL, altitude REAL,
+        kml_latitude REAL, kml_longitude REAL, kml_altitude REAL, created_at TIMESTAMP NOT NULL
+    );
+    -- Not partitioned, so source keys are unique directly (Supabase uses sensor_source_keys)
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_accelerometer_endpoint_source ON accelerometer_data(endpoint_name, source_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_accel_mag_endpoint_source ON accel_mag_data(endpoint_name, source_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_file_metadata_endpoint_folder ON file_metadata(endpoint_name, folder_path);
+"""
+
+
+def count(kind: str, n: int = 1):
+    with _lock:
+        ROUND_TRIPS[kind] += n
+
+
+def connect(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+
+
+def _stream(path: str, columns, last_id, batch_size, max_rows, metrics=None, max_id=None):
+    conn = connect(path)
+    try:
+        count('source_connect')
+        query = f"SELECT {', '.join(columns)} FROM measurements WHERE id > ?{' AND id <= ?' if max_id is not None else ''} ORDER BY id"
+        params = (last_id,) if max_id is None else (last_id, max_id)
+        if max_rows:
+            query += " LIMIT ?"
+            params += (max_rows,)
+        cursor = conn.execute(query, params)
+        while True:
+            size = batch_size() if callable(batch_size) else batch_size
+            fetch_started = time.perf_counter()
+            rows = cursor.fetchmany(size)
+            count('source_fetch')
+            if not rows:
+                break
+            if metrics is not None:
+                metrics.record_fetch(time.perf_counter() - fetch_started)
+            yield rows
+    finally:
+        conn.close()
+
+
+class SqliteMySQLEndpoint(MySQLEndpointResource):
+    """MySQLEndpointResource reading measurements from a SQLite file"""
+
+    path: str
+
+    def stream_measurements(self, host, port, database, last_id=0, batch_size=50, max_rows=None, metrics=None,
+                            max_id=None):
+        return _stream(self.path, MYSQL_MEASUREMENT_COLUMNS, last_id, batch_size, max_rows, metrics, max_id)
+
+    def stream_measurement_batches(self, host, port, database, last_id=0, batch_size=50, max_rows=None,
+                                   metrics=None, max_id=None):
+        for rows in _stream(self.path, MYSQL_MEASUREMENT_COLUMNS, last_id, batch_size, max_rows, metrics, max_id):
+            yield MeasurementBatch.from_rows(rows, MYSQL_MEASUREMENT_COLUMNS[2:])
+
+
+class SqlitePostgresEndpoint(PostgresEndpointResource):
+    """PostgresEndpointResource reading measurements from a SQLite file"""
+
+    path: str
+
+    def stream_measurements(self, host, port, database, last_id=0, batch_size=50, max_rows=None, metrics=None,
+                            max_id=None):
+        return _stream(self.path, POSTGRES_MEASUREMENT_COLUMNS, last_id, batch_size, max_rows, metrics, max_id)
+
+    def stream_measurement_batches(self, host, port, database, last_id=0, batch_size=50, max_rows=None,
+                                   metrics=None, max_id=None):
+        for rows in _stream(self.path, POSTGRES_MEASUREMENT_COLUMNS, last_id, batch_size, max_rows, metrics, max_id):
+            yield MeasurementBatch.from_rows(rows, POSTGRES_MEASUREMENT_COLUMNS[2:])
+
+
+class SqliteSupabase(SupabaseResource):
+    """SupabaseResource writing to a SQLite file"""
+
+    path: str
+
+    @contextmanager
+    def connection(self):
+        conn = connect(self.path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def execute_query(self, query: str, params: tuple = None):
+        count('sink_statement')
+        with self.connection() as conn:
+            cursor = conn.execute(query.replace('%s', '?'), params or ())
+            if query.strip().upper().startswith('SELECT'):
+                columns = [desc[0] for desc in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            conn.commit()
+            return cursor.rowcount
+
+    def insert_batch(self, table: str, columns: list, values: list, checkpoint: dict = None,
+                     timings: dict = None, replace_range: tuple = None):
+        started = time.perf_counter()
+        try:
+            return super().insert_batch(table, columns, values, checkpoint=checkpoint, timings=timings,
+                                        replace_range=replace_range)
+        finally:
+            with _lock:
+                CHUNK_SECONDS.append(time.perf_counter() - started)
+
+    @staticmethod
+    def _delete_source_range(cursor, table: str, endpoint_name: str, after_id: int, up_to_id: int):
+        count('sink_statement')
+        cursor.execute(
+            f"DELETE FROM {table} WHERE endpoint_name = ? AND source_id > ? AND source_id <= ?",
+            (endpoint_name, after_id, up_to_id)
+        )
+
+    def _load_rows(self, cursor, table: str, columns: list, values: list) -> int:
+        count('sink_statement')
+        if isinstance(values, MeasurementBatch):
+            values = values.to_rows()
+        placeholders = ', '.join(['?'] * len(columns))
+        # SQLite's INSERT OR IGNORE stands in for the staged ON CONFLICT DO NOTHING merge
+        verb = 'INSERT OR IGNORE' if self.load_mode == 'upsert' and table in CONFLICT_KEYS else 'INSERT'
+        cursor.executemany(f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", values)
+        return cursor.rowcount
+
+    @staticmethod
+    def _save_checkpoint(cursor, table: str, rows_inserted: int, endpoint_name: str, **watermarks):
+        count('sink_statement')
+        columns = ['target_table', 'endpoint_name', 'rows_ingested'] + list(watermarks)
+        # SQLite's multi-argument max() returns NULL if any argument is NULL, unlike GREATEST
+        updates = ''.join(
+            f", {c} = max(coalesce(ingest_state.{c}, excluded.{c}), coalesce(excluded.{c}, ingest_state.{c}))"
+            for c in watermarks
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO ingest_state ({', '.join(columns)})
+            VALUES ({', '.join(['?'] * len(columns))})
+            ON CONFLICT (target_table, endpoint_name) DO UPDATE SET
+                rows_ingested = ingest_state.rows_ingested + excluded.rows_ingested,
+                updated_at = CURRENT_TIMESTAMP{updates}
+            """,
+            (table, endpoint_name, rows_inserted, *watermarks.values())
+        )
+
+
+class TimedSupabase(SupabaseResource):
+    """The real SupabaseResource with per-chunk timing, for benchmarking against Postgres"""
+
+    def execute_query(self, query: str, params: tuple = None):
+        count('sink_statement')
+        return super().execute_query(query, params)
+
+    def insert_batch(self, table: str, columns: list, values: list, checkpoint: dict = None,
+                     timings: dict = None, replace_range: tuple = None):
+        # One COPY plus SAVEPOINT/RELEASE, the checkpoint upsert and COMMIT
+        count('sink_statement', 5 if checkpoint else 4)
+        started = time.perf_counter()
+        try:
+            return super().insert_batch(table, columns, values, checkpoint=checkpoint, timings=timings,
+                                        replace_range=replace_range)
+        finally:
+            with _lock:
+                CHUNK_SECONDS.append(time.perf_counter() - started)
+
+
+class StandinChangeStream:
+    """In-process stand-in for a CDC replication stream; commit() plays a source transaction"""
+
+    def __init__(self):
+        self.position = 0
+        self.acknowledged = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def commit(self, rows):
+        with self._lock:
+            self.position += 1
+            self._queue.put(ChangeBatch(self.position, list(rows), time.time()))
+
+    def open(self, position) -> bool:
+        return position is not None
+
+    def read(self, timeout: float):
+        try:
+            changes = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                changes.append(self._queue.get_nowait())
+            except queue.Empty:
+                return changes
+
+    def acknowledge(self, position: int):
+        self.acknowledged = position
+
+    def close(self):
+        pass
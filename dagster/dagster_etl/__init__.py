@@ -1,27 +1,43 @@
 from dagster import Definitions
-from .assets import ingest_mysql_data, ingest_postgres_data, ingest_file_data
-from .sensors import endpoint_monitor_sensor
-from .jobs import etl_job
+from .assets import BACKFILL_ASSETS, INGEST_ASSETS, ROLLUP_ASSETS, file_images, ingest_file_data, ingest_async_data
+from .async_engine import AsyncIngestResource
+from .sensors import endpoint_monitor_sensor, backfill_planner_sensor, file_event_sensor
+from .jobs import BACKFILL_JOBS, etl_job
+from .maintenance import storage_maintenance_job, storage_maintenance_schedule
 from .resources import SupabaseResource, MySQLEndpointResource, PostgresEndpointResource
 import os
 
-# Define all resources
-resources = {
+# Define all resources (not named `resources`, which is the dagster_etl.resources submodule)
+RESOURCES = {
     "supabase": SupabaseResource(
         host=os.getenv("SUPABASE_HOST", "supabase-db"),
         port=int(os.getenv("SUPABASE_PORT", "5432")),
         user=os.getenv("SUPABASE_USER", "postgres"),
         password=os.getenv("SUPABASE_PASSWORD", "postgres"),
-        database=os.getenv("SUPABASE_DB", "postgres")
+        database=os.getenv("SUPABASE_DB", "postgres"),
+        pool_min_size=int(os.getenv("SUPABASE_POOL_MIN_SIZE", "1")),
+        pool_max_size=int(os.getenv("SUPABASE_POOL_MAX_SIZE", "5")),
+        pool_idle_timeout=float(os.getenv("SUPABASE_POOL_IDLE_TIMEOUT", "300")),
+        bulk_load_method=os.getenv("SUPABASE_BULK_LOAD_METHOD", "copy"),
+        load_mode=os.getenv("SUPABASE_LOAD_MODE", "upsert")
     ),
     "mysql_endpoint": MySQLEndpointResource(),
-    "postgres_endpoint": PostgresEndpointResource()
+    "postgres_endpoint": PostgresEndpointResource(),
+    "async_engine": AsyncIngestResource(
+        max_concurrency=int(os.getenv("INGEST_ASYNC_CONCURRENCY", "200")),
+        writer_pool_size=int(os.getenv("INGEST_ASYNC_WRITER_POOL_SIZE", "10")),
+        source_timeout=float(os.getenv("INGEST_ASYNC_SOURCE_TIMEOUT", "30"))
+    )
 }
 
 # Define the Dagster repository
 defs = Definitions(
-    assets=[ingest_mysql_data, ingest_postgres_data, ingest_file_data],
-    sensors=[endpoint_monitor_sensor],
-    jobs=[etl_job],
-    resources=resources
+    assets=[
+        *INGEST_ASSETS.values(), *BACKFILL_ASSETS.values(), *ROLLUP_ASSETS.values(),
+        ingest_file_data, file_images, ingest_async_data,
+    ],
+    sensors=[endpoint_monitor_sensor, backfill_planner_sensor, file_event_sensor],
+    jobs=[etl_job, *BACKFILL_JOBS.values(), storage_maintenance_job],
+    schedules=[storage_maintenance_schedule],
+    resources=RESOURCES
 )
@@ -1,271 +1,661 @@
-from dagster import asset, OpExecutionContext, AssetExecutionContext
-from .resources import SupabaseResource, MySQLEndpointResource, PostgresEndpointResource
+from dagster import asset, AssetIn, AssetsDefinition, Failure, Output, OpExecutionContext, AssetExecutionContext
+from .resources import SupabaseResource
+from .async_engine import AsyncIngestResource
+from .backfill import BACKFILL_PARTITIONS, parse_partition_key
+from .batching import AdaptiveBatchSizer, estimate_batch_bytes
+from .config import EndpointConfig
+from .connectors import CONNECTORS, SourceConnector
+from .filesystem import (
+    EXTRACTED_COLUMNS, extract_folders, named_folders, newest_timestamp_folder, scan_all_folders, scan_new_folders,
+)
+from .pipeline import Prefetcher
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 import os
+import time
 from pathlib import Path
-import xml.etree.ElementTree as ET
 from datetime import datetime
+from typing import TYPE_CHECKING
 
+# Modules only some assets need (NumPy via columnar and spill, images, manifest, metrics)
+# are imported where they are used, so loading the code location does not import them
+if TYPE_CHECKING:
+    from .metrics import IngestMetrics
+    from .spill import SpillingSink
 
-@asset
-def ingest_mysql_data(
-    context: AssetExecutionContext,
-    supabase: SupabaseResource,
-    mysql_endpoint: MySQLEndpointResource
-) -> dict:
-    """
-    Ingest data from MySQL endpoint to Supabase with multi-chunk processing for backfill support
+# Root the file endpoint writes its folders to (mounted into the dagster container)
+FILE_DATA_DIR = os.getenv("FILE_DATA_DIR", "/data")
+
+# 'columnar' moves database chunks as NumPy arrays (MeasurementBatch); 'rows' as lists of tuples
+BATCH_FORMAT = os.getenv("INGEST_BATCH_FORMAT", "columnar")
+
+# Refresh sensor_rollups after every accelerometer/magnetometer ingest and backfill
+ROLLUPS_ENABLED = os.getenv("INGEST_ROLLUPS", "true").lower() == "true"
+
+# Hash and thumbnail the images of every folder a local file ingest run loads
+IMAGES_ENABLED = os.getenv("INGEST_IMAGES", "true").lower() == "true"
+
+# Local spill buffer for database chunks: 'off', 'fallback' (spill chunks Supabase cannot take
+# and replay them once it is back) or 'always' (write every chunk ahead to disk, then replay).
+# INGEST_SPILL_MAX_BYTES caps the buffer (0 = unlimited); INGEST_SPILL_COMPRESSION is the
+# zlib level, 0 stores segments uncompressed so replay memory-maps them
+SPILL_MODE = os.getenv("INGEST_SPILL_MODE", "off")
+SPILL_DIR = os.getenv("INGEST_SPILL_DIR", "/opt/dagster/spill")
+SPILL_MAX_BYTES = int(os.getenv("INGEST_SPILL_MAX_BYTES", str(10 * 1024 ** 3)))
+SPILL_COMPRESSION = int(os.getenv("INGEST_SPILL_COMPRESSION", "1"))
+SPILL_REPLAY_ROWS = int(os.getenv("INGEST_SPILL_REPLAY_ROWS", "100000"))
+
+
+class _EndpointLog:
+    """Prefixes log lines with the endpoint name so fan-out runs stay readable"""
+
+    def __init__(self, log, endpoint_name: str):
+        self._log = log
+        self._prefix = f"[{endpoint_name}] "
+
+    def info(self, message: str):
+        self._log.info(self._prefix + message)
+
+    def warning(self, message: str):
+        self._log.warning(self._prefix + message)
+
+    def error(self, message: str):
+        self._log.error(self._prefix + message)
+
+
+def _ingest_endpoints(context: AssetExecutionContext, supabase: SupabaseResource, endpoint_type: str, ingest_one) -> Output:
     """
-    # Get endpoint configuration from context
-    endpoint_name = context.run.tags.get('endpoint_name', 'Unknown')
-    endpoint_host = context.run.tags.get('endpoint_host', 'mysql-endpoint')
-    endpoint_port = int(context.run.tags.get('endpoint_port', '3306'))
-    endpoint_db = context.run.tags.get('endpoint_db', 'sensors')
-    chunk_size = int(context.run.tags.get('chunk_size', '50'))
-    max_chunks_per_run = int(context.run.tags.get('max_chunks_per_run', '20'))
+    Run ingest_one for the endpoint(s) selected by the run tags.
 
-    context.log.info(f"Starting ingestion from MySQL endpoint: {endpoint_name}")
-    context.log.info(f"Configuration: chunk_size={chunk_size}, max_chunks_per_run={max_chunks_per_run}")
+    A run tagged with ``endpoint_ids`` (fan-out mode) ingests all of those
+    endpoints concurrently on a thread pool. Each endpoint's failure is
+    captured in its own result, and the asset only fails if every endpoint
+    failed. Otherwise the run ingests the single endpoint described by its tags.
+    Each endpoint's IngestMetrics is exported and attached as output metadata.
+    """
+    from .metrics import IngestMetrics, export as export_metrics
+
+    endpoint_ids = context.run.tags.get('endpoint_ids')
+    if not endpoint_ids:
+        config = EndpointConfig.from_tags(context.run.tags, endpoint_type)
+        return _ingest_with_metrics(
+            context.log, endpoint_type, config.name,
+            lambda metrics: ingest_one(context.log, config, metrics)
+        )
+
+    configs = [
+        EndpointConfig.from_control_row(row)
+        for row in supabase.get_endpoints([int(i) for i in endpoint_ids.split(',')])
+    ]
+    max_workers = int(context.run.tags.get('fanout_workers', '8'))
+    context.log.info(f"Fan-out ingestion of {len(configs)} {endpoint_type} endpoint(s) with {max_workers} workers")
+
+    def run(config: EndpointConfig):
+        log = _EndpointLog(context.log, config.name)
+        metrics = IngestMetrics(endpoint_type, config.name)
+        started = time.perf_counter()
+        try:
+            result = ingest_one(log, config, metrics)
+            result["status"] = "success"
+        except Exception as e:
+            result = {"endpoint": config.name, "status": "failed", "error": str(e), "ingested_count": 0}
+        result["duration_seconds"] = round(time.perf_counter() - started, 3)
+        export_metrics(metrics, log)
+        _log_metrics(log, metrics)
+        result["metrics"] = metrics.summary()
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"ingest_{endpoint_type}") as pool:
+        results = list(pool.map(run, configs))
+
+    return _summarize_endpoints(context, endpoint_type, results)
+
+
+def _summarize_endpoints(context: AssetExecutionContext, endpoint_type: str, results: list) -> Output:
+    """Output for a multi-endpoint run; fails the asset only if every endpoint failed"""
+    failed = [r for r in results if r["status"] == "failed"]
+    summary = {
+        "ingested_count": sum(r["ingested_count"] for r in results),
+        "endpoint_count": len(results),
+        "failed_count": len(failed),
+        "endpoints": {r["endpoint"]: r for r in results},
+    }
+    metadata = {
+        "ingested_count": summary["ingested_count"],
+        "endpoint_count": len(results),
+        "failed_count": len(failed),
+        "per_endpoint": {r["endpoint"]: {k: v for k, v in r.items() if k != "endpoint"} for r in results},
+    }
+    for phase in ("connect", "query", "fetch", "queue_wait", "checkout", "load", "commit"):
+        metadata[f"metrics/{phase}_seconds"] = round(
+            sum(r["metrics"].get(f"{phase}_seconds", 0.0) for r in results), 4
+        )
+
+    for r in failed:
+        context.log.error(f"Error ingesting from {endpoint_type} endpoint {r['endpoint']}: {r['error']}")
+    if results and len(failed) == len(results):
+        raise Failure(description=f"All {len(results)} {endpoint_type} endpoints failed", metadata={"errors": {r["endpoint"]: r["error"] for r in failed}})
+
+    return Output(summary, metadata=metadata)
+
+
+def _open_stream(endpoint, *args, **kwargs):
+    """The endpoint's measurement stream in the configured BATCH_FORMAT"""
+    if BATCH_FORMAT == 'columnar':
+        return endpoint.stream_measurement_batches(*args, **kwargs)
+    return endpoint.stream_measurements(*args, **kwargs)
+
+
+def _spilling_sink(log, supabase: SupabaseResource, table: str, channels, endpoint_name: str) -> 'SpillingSink':
+    """The sink a database endpoint's chunks are loaded through, per SPILL_MODE"""
+    from .spill import SPILL_MODES, SpillBuffer, SpillingSink
+
+    if SPILL_MODE not in SPILL_MODES:
+        raise ValueError(f"INGEST_SPILL_MODE must be one of {SPILL_MODES}, got {SPILL_MODE!r}")
+    spill = None if SPILL_MODE == 'off' else SpillBuffer(SPILL_DIR, SPILL_MAX_BYTES, SPILL_COMPRESSION)
+    return SpillingSink(
+        supabase, spill, table, channels, endpoint_name, log,
+        write_ahead=SPILL_MODE == 'always', replay_rows=SPILL_REPLAY_ROWS
+    )
+
+
+def _chunk_values(log, measurements, endpoint_name: str):
+    """insert_batch values for a fetched chunk, plus the chunk's last source id"""
+    from .columnar import MeasurementBatch
+
+    if isinstance(measurements, MeasurementBatch):
+        invalid = measurements.validate()
+        if invalid:
+            log.warning(f"Loading out-of-range values as NULL: {invalid}")
+        return measurements.for_endpoint(endpoint_name), measurements.last_id
+    return [row + (endpoint_name,) for row in measurements], measurements[-1][0]
+
+
+def _ingest_with_metrics(log, endpoint_type: str, endpoint_name: str, ingest) -> Output:
+    """Call ingest(metrics), export the metrics even if it fails, and attach them to the output"""
+    from .metrics import IngestMetrics, export as export_metrics
+
+    metrics = IngestMetrics(endpoint_type, endpoint_name)
+    try:
+        result = ingest(metrics)
+    finally:
+        export_metrics(metrics, log)
+    _log_metrics(log, metrics)
+    return Output(result, metadata=metrics.to_metadata())
+
+
+def _log_metrics(log, metrics: 'IngestMetrics'):
+    summary = metrics.summary()
+    phases = ", ".join(f"{key[:-8]}={value:.2f}s" for key, value in summary.items() if key.endswith("_seconds"))
+    log.info(f"Timings: {phases or 'none'} (p50 chunk {summary['chunk_p50_ms']}ms, bottleneck: {summary['bottleneck']})")
+
+
+def build_ingest_asset(connector: SourceConnector) -> AssetsDefinition:
+    """The incremental ingest asset for a connector's endpoints (single-endpoint or fan-out runs)"""
+
+    @asset(
+        name=connector.ingest_asset_name,
+        required_resource_keys={"supabase", connector.resource_key},
+        description=f"Ingest data from {connector.label} endpoint(s) into {connector.table} with multi-chunk processing",
+    )
+    def ingest_database_data(context: AssetExecutionContext) -> Output[dict]:
+        supabase = context.resources.supabase
+        endpoint = getattr(context.resources, connector.resource_key)
+        return _ingest_endpoints(
+            context, supabase, connector.endpoint_type,
+            lambda log, config, metrics: _ingest_database_endpoint(log, supabase, endpoint, connector, config, metrics)
+        )
+
+    return ingest_database_data
+
+
+def _ingest_database_endpoint(log, supabase: SupabaseResource, endpoint, connector: SourceConnector,
+                              config: EndpointConfig, metrics: 'IngestMetrics' = None) -> dict:
+    """Ingest one database endpoint through its connector, resuming from its ingest_state checkpoint"""
+    endpoint_id = config.endpoint_id
+    endpoint_name = config.name
+    endpoint_host = config.host
+    endpoint_port = config.port
+    endpoint_db = config.database
+    chunk_size = config.chunk_size
+    max_chunks_per_run = config.max_chunks_per_run
+    pipeline_depth = config.pipeline_depth
+    adaptive_chunking = config.adaptive_chunking
+    min_chunk_size = config.min_chunk_size
+    max_chunk_size = config.max_chunk_size
+    run_time_budget = config.run_time_budget_seconds
+
+    log.info(f"Starting ingestion from {connector.label} endpoint: {endpoint_name}")
+    log.info(f"Configuration: chunk_size={chunk_size}, max_chunks_per_run={max_chunks_per_run}, pipeline_depth={pipeline_depth}")
+    if adaptive_chunking:
+        log.info(f"Adaptive chunking: {min_chunk_size}-{max_chunk_size} rows, time budget {run_time_budget}s")
 
     try:
-        # Get last ingested ID from Supabase
-        query = """
-            SELECT MAX(source_id) as last_id
-            FROM accelerometer_data
-            WHERE endpoint_name = %s
-        """
-        result = supabase.execute_query(query, (endpoint_name,))
-        last_id = result[0]['last_id'] if result and result[0]['last_id'] else 0
-        starting_id = last_id
-
-        context.log.info(f"Starting from ID: {last_id}")
+        # Replay anything spilled by earlier runs, then resume after the ingest_state
+        # checkpoint (or the newest spilled chunk, while Supabase is down)
+        sink = _spilling_sink(log, supabase, connector.table, connector.channels, endpoint_name)
+        last_id = sink.start()
+        # Rollups are refreshed from the committed checkpoint, so replayed chunks are covered
+        starting_id = sink.committed_id
+
+        log.info(f"Starting from ID: {last_id}")
 
         # Multi-chunk processing loop
         total_ingested = 0
         chunks_processed = 0
-        columns = ['endpoint_name', 'timestamp', 'accel_x', 'accel_y', 'accel_z', 'source_id']
 
-        for chunk_num in range(max_chunks_per_run):
-            # Fetch next chunk
-            measurements = mysql_endpoint.fetch_measurements(
-                endpoint_host, endpoint_port, endpoint_db, chunk_size, last_id
+        # One connection and one server-side cursor for the whole run; in adaptive mode
+        # the stream asks the sizer for each batch size and the row cap uses the ceiling
+        if adaptive_chunking:
+            sizer = AdaptiveBatchSizer(
+                chunk_size, min_chunk_size, max_chunk_size, time_budget_seconds=run_time_budget
             )
+            # Sizes in the order the stream asked for them; prefetched chunks were
+            # requested before the sizer saw the chunks ahead of them
+            requested_sizes = deque()
 
-            if not measurements:
-                context.log.info(f"No more measurements available after {chunks_processed} chunks")
-                break
-
-            # Prepare data for insertion
-            values = [
-                (endpoint_name, m['timestamp'], m['accel_x'], m['accel_y'], m['accel_z'], m['id'])
-                for m in measurements
-            ]
-
-            # Insert into Supabase
-            rows_inserted = supabase.insert_batch('accelerometer_data', columns, values)
-            total_ingested += rows_inserted
-            chunks_processed += 1
+            def batch_size() -> int:
+                requested_sizes.append(sizer.next_size())
+                return requested_sizes[-1]
 
-            # Update last_id for next iteration
-            last_id = measurements[-1]['id']
-
-            context.log.info(f"Chunk {chunks_processed}/{max_chunks_per_run}: Inserted {rows_inserted} records (total: {total_ingested}, last_id: {last_id})")
-
-            # If we got fewer records than chunk_size, we've caught up
-            if len(measurements) < chunk_size:
-                context.log.info(f"Caught up! Received {len(measurements)} records (less than chunk_size={chunk_size})")
-                break
+            max_rows = max_chunk_size * max_chunks_per_run
+        else:
+            sizer = None
+            batch_size, max_rows = chunk_size, chunk_size * max_chunks_per_run
+
+        batches = _open_stream(
+            endpoint, endpoint_host, endpoint_port, endpoint_db, last_id,
+            batch_size=batch_size, max_rows=max_rows, metrics=metrics
+        )
+        if pipeline_depth > 0:
+            # Fetch the next chunks on a background thread while this one is inserted;
+            # last_id below still only advances once a chunk is committed
+            batches = Prefetcher(batches, depth=pipeline_depth)
+
+        rows_fetched = 0
+        queue_waited = 0.0
+        with closing(batches):
+            chunk_started = time.perf_counter()
+            for measurements in batches:
+                rows_fetched += len(measurements)
+
+                # Prepare data for insertion
+                values, chunk_last_id = _chunk_values(log, measurements, endpoint_name)
+
+                # Insert into Supabase and advance the checkpoint in the same transaction,
+                # or spill the chunk to local disk while Supabase is unavailable
+                sink_timings = {}
+                rows_inserted = sink.load(values, chunk_last_id, timings=sink_timings)
+                total_ingested += rows_inserted
+                chunks_processed += 1
+
+                # Update last_id for next iteration
+                last_id = chunk_last_id
+
+                if sink.spilled_rows:
+                    log.info(f"Chunk {chunks_processed}/{max_chunks_per_run}: Spilled {len(measurements)} records (spilled: {sink.spilled_rows}, last_id: {last_id})")
+                else:
+                    log.info(f"Chunk {chunks_processed}/{max_chunks_per_run}: Inserted {rows_inserted} records (total: {total_ingested}, last_id: {last_id})")
+
+                # Chunk latency is commit-to-commit, so it covers fetch, queue wait and insert
+                chunk_seconds = time.perf_counter() - chunk_started
+                chunk_started = time.perf_counter()
+                batch_bytes = estimate_batch_bytes(measurements)
+                if metrics is not None:
+                    queue_wait = getattr(batches, 'wait_seconds', 0.0)
+                    metrics.record_chunk(len(measurements), batch_bytes, chunk_seconds, queue_wait - queue_waited, sink_timings)
+                    queue_waited = queue_wait
+
+                if sizer:
+                    sizer.record(len(measurements), chunk_seconds, batch_bytes, requested=requested_sizes.popleft())
+                    if not sizer.within_budget():
+                        log.info(f"Run time budget of {run_time_budget}s reached after {chunks_processed} chunks")
+                        break
+
+                if chunks_processed >= max_chunks_per_run:
+                    break
+            else:
+                # The stream only runs dry before max_rows when the source has no more rows
+                if rows_fetched < max_rows:
+                    log.info(f"Caught up! Received {rows_fetched} records (less than max_rows={max_rows})")
+
+        # Write-ahead chunks, and chunks spilled before Supabase came back, are replayed now
+        sink.finish()
+        total_ingested += sink.replayed_rows
+        if sink.spilled_rows:
+            log.warning(f"{sink.spilled_rows} records are waiting in the spill buffer for Supabase")
+
+        if sizer and sizer.size != chunk_size and sink.healthy:
+            # Persist the learned size so the next run starts warm
+            supabase.save_chunk_size(endpoint_id, endpoint_name, sizer.size)
+            log.info(f"Adaptive chunk size {chunk_size} -> {sizer.size} ({sizer.rows_per_second or 0:.0f} rows/s)")
 
         if total_ingested == 0:
-            context.log.info("No new measurements to ingest")
+            log.info("No new measurements to ingest")
         else:
-            context.log.info(f"Successfully ingested {total_ingested} measurements across {chunks_processed} chunks from {endpoint_name}")
-            context.log.info(f"ID range: {starting_id} -> {last_id} ({last_id - starting_id} IDs processed)")
+            log.info(f"Successfully ingested {total_ingested} measurements across {chunks_processed} chunks from {endpoint_name}")
+            log.info(f"ID range: {starting_id} -> {last_id} ({last_id - starting_id} IDs processed)")
 
         return {
             "ingested_count": total_ingested,
             "chunks_processed": chunks_processed,
             "endpoint": endpoint_name,
             "last_id": last_id,
-            "starting_id": starting_id
+            "starting_id": starting_id,
+            "chunk_size": sizer.size if sizer else chunk_size,
+            "spilled_count": sink.spilled_rows,
+            "replayed_count": sink.replayed_rows
         }
 
     except Exception as e:
-        context.log.error(f"Error ingesting from MySQL endpoint {endpoint_name}: {str(e)}")
+        log.error(f"Error ingesting from {connector.label} endpoint {endpoint_name}: {str(e)}")
         raise
 
 
 @asset
-def ingest_postgres_data(
+def ingest_async_data(
     context: AssetExecutionContext,
     supabase: SupabaseResource,
-    postgres_endpoint: PostgresEndpointResource
-) -> dict:
+    async_engine: AsyncIngestResource
+) -> Output[dict]:
     """
-    Ingest data from PostgreSQL endpoint to Supabase with multi-chunk processing for backfill support
+    Ingest the MySQL and PostgreSQL endpoints in the run's endpoint_ids tag concurrently on one event loop
     """
-    # Get endpoint configuration from context
-    endpoint_name = context.run.tags.get('endpoint_name', 'Unknown')
-    endpoint_host = context.run.tags.get('endpoint_host', 'postgres-endpoint')
-    endpoint_port = int(context.run.tags.get('endpoint_port', '5432'))
-    endpoint_db = context.run.tags.get('endpoint_db', 'sensors')
-    chunk_size = int(context.run.tags.get('chunk_size', '50'))
-    max_chunks_per_run = int(context.run.tags.get('max_chunks_per_run', '20'))
-
-    context.log.info(f"Starting ingestion from PostgreSQL endpoint: {endpoint_name}")
-    context.log.info(f"Configuration: chunk_size={chunk_size}, max_chunks_per_run={max_chunks_per_run}")
-
-    try:
-        # Get last ingested ID from Supabase
-        query = """
-            SELECT MAX(source_id) as last_id
-            FROM accel_mag_data
-            WHERE endpoint_name = %s
-        """
-        result = supabase.execute_query(query, (endpoint_name,))
-        last_id = result[0]['last_id'] if result and result[0]['last_id'] else 0
-        starting_id = last_id
-
-        context.log.info(f"Starting from ID: {last_id}")
-
-        # Multi-chunk processing loop
-        total_ingested = 0
-        chunks_processed = 0
-        columns = ['endpoint_name', 'timestamp', 'accel_x', 'accel_y', 'accel_z',
-                   'mag_x', 'mag_y', 'mag_z', 'source_id']
-
-        for chunk_num in range(max_chunks_per_run):
-            # Fetch next chunk
-            measurements = postgres_endpoint.fetch_measurements(
-                endpoint_host, endpoint_port, endpoint_db, chunk_size, last_id
+    from .metrics import export as export_metrics
+
+    configs = [
+        EndpointConfig.from_control_row(row)
+        for row in supabase.get_endpoints([int(i) for i in context.run.tags['endpoint_ids'].split(',')])
+    ]
+    context.log.info(f"Async ingestion of {len(configs)} endpoint(s), up to {async_engine.max_concurrency} at once")
+    results = async_engine.run(supabase, configs, lambda config: _EndpointLog(context.log, config.name))
+
+    for result in results:
+        log = _EndpointLog(context.log, result["endpoint"])
+        metrics = result["metrics"]
+        export_metrics(metrics, log)
+        _log_metrics(log, metrics)
+        result["metrics"] = metrics.summary()
+        if ROLLUPS_ENABLED and result["status"] == "success" and result["ingested_count"]:
+            # The async asset is not upstream of the rollup assets, so it refreshes its endpoints' rollups itself
+            result["rollups"] = supabase.refresh_rollups(
+                CONNECTORS[result["endpoint_type"]].table, result["endpoint"], result["starting_id"], result["last_id"]
             )
 
-            if not measurements:
-                context.log.info(f"No more measurements available after {chunks_processed} chunks")
-                break
+    return _summarize_endpoints(context, 'database', results)
 
-            # Prepare data for insertion
-            values = [
-                (endpoint_name, m['timestamp'], m['accel_x'], m['accel_y'], m['accel_z'],
-                 m['mag_x'], m['mag_y'], m['mag_z'], m['id'])
-                for m in measurements
-            ]
 
-            # Insert into Supabase
-            rows_inserted = supabase.insert_batch('accel_mag_data', columns, values)
-            total_ingested += rows_inserted
-            chunks_processed += 1
+def build_backfill_asset(connector: SourceConnector) -> AssetsDefinition:
+    """The partitioned backfill asset for a connector (see backfill_planner_sensor)"""
 
-            # Update last_id for next iteration
-            last_id = measurements[-1]['id']
+    @asset(
+        name=connector.backfill_asset_name,
+        partitions_def=BACKFILL_PARTITIONS[connector.endpoint_type],
+        required_resource_keys={"supabase", connector.resource_key},
+        description=f"Load one planned source id range of a {connector.label} endpoint",
+    )
+    def backfill_database_data(context: AssetExecutionContext) -> Output[dict]:
+        return _backfill_partition(
+            context, context.resources.supabase, getattr(context.resources, connector.resource_key), connector
+        )
 
-            context.log.info(f"Chunk {chunks_processed}/{max_chunks_per_run}: Inserted {rows_inserted} records (total: {total_ingested}, last_id: {last_id})")
+    return backfill_database_data
 
-            # If we got fewer records than chunk_size, we've caught up
-            if len(measurements) < chunk_size:
-                context.log.info(f"Caught up! Received {len(measurements)} records (less than chunk_size={chunk_size})")
-                break
 
-        if total_ingested == 0:
-            context.log.info("No new measurements to ingest")
-        else:
-            context.log.info(f"Successfully ingested {total_ingested} measurements across {chunks_processed} chunks from {endpoint_name}")
-            context.log.info(f"ID range: {starting_id} -> {last_id} ({last_id - starting_id} IDs processed)")
-
-        return {
-            "ingested_count": total_ingested,
-            "chunks_processed": chunks_processed,
-            "endpoint": endpoint_name,
-            "last_id": last_id,
-            "starting_id": starting_id
-        }
-
-    except Exception as e:
-        context.log.error(f"Error ingesting from PostgreSQL endpoint {endpoint_name}: {str(e)}")
-        raise
+def _backfill_partition(context: AssetExecutionContext, supabase: SupabaseResource, endpoint,
+                        connector: SourceConnector) -> Output:
+    """
+    Load the source ids (after_id, up_to_id] named by the run's partition key.
+
+    Each chunk replaces the endpoint's rows in the id range it covers, in the
+    same transaction as the insert, so a partition can be re-run (or retried
+    after a partial failure) without creating duplicates. ingest_state is not
+    touched: the planner already moved the watermark past every planned range.
+    Once the range is loaded it is cleared from backfill_ranges, where the
+    planner would otherwise request it again.
+    """
+    endpoint_id, after_id, up_to_id = parse_partition_key(context.partition_key)
+    rows = supabase.get_endpoints([endpoint_id])
+    if not rows:
+        raise Failure(description=f"Endpoint {endpoint_id} for backfill partition {context.partition_key} no longer exists")
+    config = EndpointConfig.from_control_row(rows[0])
+    output = _ingest_with_metrics(
+        context.log, connector.endpoint_type, config.name,
+        lambda metrics: _load_source_range(context.log, supabase, endpoint, connector, config, after_id, up_to_id, metrics)
+    )
+    supabase.complete_backfill(connector.table, context.partition_key)
+    return output
+
+
+def _load_source_range(log, supabase: SupabaseResource, endpoint, connector: SourceConnector, config: EndpointConfig,
+                       after_id: int, up_to_id: int, metrics: 'IngestMetrics') -> dict:
+    from .columnar import batch_columns
+
+    endpoint_name = config.name
+    # Backfill ranges are sized up front, so load at the adaptive ceiling rather than the steady-state size
+    chunk_size = max(config.chunk_size, config.max_chunk_size)
+    table = connector.table
+    columns = batch_columns(connector.channels)
+    log.info(f"Backfilling {endpoint_name} source ids ({after_id}, {up_to_id}] in chunks of {chunk_size}")
+
+    batches = _open_stream(
+        endpoint, config.host, config.port, config.database, after_id,
+        batch_size=chunk_size, max_id=up_to_id, metrics=metrics
+    )
+    if config.pipeline_depth > 0:
+        batches = Prefetcher(batches, depth=config.pipeline_depth)
+
+    total_ingested = 0
+    range_start = after_id
+    queue_waited = 0.0
+    with closing(batches):
+        chunk_started = time.perf_counter()
+        for measurements in batches:
+            values, chunk_last_id = _chunk_values(log, measurements, endpoint_name)
+            # The last chunk's range runs to up_to_id so ids missing at the source are cleared too
+            range_end = chunk_last_id if len(measurements) == chunk_size else up_to_id
+
+            sink_timings = {}
+            rows_inserted = supabase.insert_batch(
+                table, columns, values,
+                timings=sink_timings, replace_range=(endpoint_name, range_start, range_end)
+            )
+            total_ingested += rows_inserted
+            range_start = range_end
+
+            chunk_seconds = time.perf_counter() - chunk_started
+            chunk_started = time.perf_counter()
+            queue_wait = getattr(batches, 'wait_seconds', 0.0)
+            metrics.record_chunk(len(measurements), estimate_batch_bytes(measurements), chunk_seconds, queue_wait - queue_waited, sink_timings)
+            queue_waited = queue_wait
+
+    log.info(f"Backfilled {total_ingested} measurements from {endpoint_name} (ids {after_id} -> {up_to_id})")
+    result = {
+        "ingested_count": total_ingested,
+        "endpoint": endpoint_name,
+        "after_id": after_id,
+        "up_to_id": up_to_id,
+    }
+    if ROLLUPS_ENABLED:
+        # Partitions run outside the incremental asset graph, so they refresh their own range's rollups
+        result["rollups"] = supabase.refresh_rollups(table, endpoint_name, after_id, up_to_id)
+    return result
+
+
+def build_rollup_asset(connector: SourceConnector) -> AssetsDefinition:
+    """1s/1m/1h rollups of a connector's table, refreshed for the rows its upstream ingest run loaded"""
+
+    @asset(
+        name=connector.rollup_asset_name,
+        ins={"ingested": AssetIn(connector.ingest_asset_name)},
+        required_resource_keys={"supabase"},
+        description=f"1s/1m/1h min/max/mean/RMS of {connector.table}, refreshed for the rows the upstream ingest run loaded",
+    )
+    def database_rollups(context: AssetExecutionContext, ingested: dict) -> Output[dict]:
+        return _refresh_rollups(context, context.resources.supabase, connector.table, ingested)
+
+    return database_rollups
+
+
+def _refresh_rollups(context: AssetExecutionContext, supabase: SupabaseResource, table: str, ingested: dict) -> Output:
+    """Refresh sensor_rollups for the source id range each endpoint of an ingest output advanced over"""
+    # Fan-out runs report one result per endpoint; single-endpoint runs are one result
+    results = ingested["endpoints"].values() if "endpoints" in ingested else [ingested]
+    refreshed = {}
+    started = time.perf_counter()
+    for result in results:
+        if result.get("status") == "failed" or not result.get("ingested_count"):
+            continue
+        endpoint_name = result["endpoint"]
+        stats = supabase.refresh_rollups(table, endpoint_name, result["starting_id"], result["last_id"])
+        context.log.info(
+            f"[{endpoint_name}] Rolled up {stats['raw_rows']} raw rows into {stats['rollup_rows']} buckets "
+            f"across {stats['hours']} hour(s)"
+        )
+        refreshed[endpoint_name] = stats
+
+    summary = {
+        "endpoints": refreshed,
+        "raw_rows": sum(stats["raw_rows"] for stats in refreshed.values()),
+        "rollup_rows": sum(stats["rollup_rows"] for stats in refreshed.values()),
+    }
+    if not refreshed:
+        context.log.info("No new rows to roll up")
+    return Output(summary, metadata={
+        "raw_rows": summary["raw_rows"],
+        "rollup_rows": summary["rollup_rows"],
+        "endpoint_count": len(refreshed),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    })
 
 
 @asset
 def ingest_file_data(
     context: AssetExecutionContext,
     supabase: SupabaseResource
-) -> dict:
+) -> Output[dict]:
     """
     Ingest file metadata from file endpoint to Supabase with batch processing for backfill support
     """
     endpoint_name = context.run.tags.get('endpoint_name', 'Unknown')
+    ingest = _ingest_remote_file_endpoint if context.run.tags.get('file_source') == 'remote' else _ingest_file_endpoint
+    return _ingest_with_metrics(
+        context.log, 'file', endpoint_name,
+        lambda metrics: ingest(context, supabase, endpoint_name, metrics)
+    )
+
+
+def _ingest_file_endpoint(context: AssetExecutionContext, supabase: SupabaseResource, endpoint_name: str,
+                          metrics: 'IngestMetrics') -> dict:
+    """Ingest new folders from the file endpoint, resuming from its ingest_state high-water mark"""
     max_folders_per_run = int(context.run.tags.get('max_chunks_per_run', '50'))  # For files, this is folders per run
+    reconcile_interval = float(context.run.tags.get('reconcile_interval_seconds', '3600'))
+    extract_workers = int(context.run.tags.get('extract_workers', '8'))
+    # Set by file_event_sensor: ingest the folders of these file_events ids instead of scanning
+    event_range = context.run.tags.get('file_event_range')
 
     context.log.info(f"Starting file ingestion from endpoint: {endpoint_name}")
     context.log.info(f"Configuration: max_folders_per_run={max_folders_per_run}")
 
     try:
-        data_dir = Path("/data")
+        data_dir = Path(FILE_DATA_DIR)
 
         if not data_dir.exists():
             context.log.warning(f"Data directory {data_dir} does not exist")
             return {"ingested_count": 0, "endpoint": endpoint_name}
 
-        # Get already ingested folders
-        query = """
-            SELECT folder_path
-            FROM file_metadata
-            WHERE endpoint_name = %s
-        """
-        result = supabase.execute_query(query, (endpoint_name,))
-        ingested_folders = {r['folder_path'] for r in result}
-
-        # Find new folders (excluding .git and other hidden folders)
-        new_folders = [
-            f for f in data_dir.iterdir()
-            if f.is_dir() and not f.name.startswith('.') and str(f) not in ingested_folders
-        ]
-
-        if not new_folders:
-            context.log.info("No new folders to ingest")
-            return {"ingested_count": 0, "endpoint": endpoint_name}
+        checkpoint = supabase.get_checkpoint('file_metadata', endpoint_name) or {}
+        last_folder = checkpoint.get('last_folder')
+        last_reconciled_at = checkpoint.get('last_reconciled_at')
+        reconcile = event_range is None and (
+            last_reconciled_at is None
+            or (datetime.now() - last_reconciled_at).total_seconds() >= reconcile_interval
+        )
+
+        if event_range:
+            # Folders the file watcher reported complete; data_dir is not listed at all
+            after_id, up_to_id = (int(i) for i in event_range.split('-'))
+            context.log.info(f"Ingesting folders from file events {after_id + 1}-{up_to_id}")
+            with metrics.timer('query'):
+                result = supabase.execute_query(
+                    "SELECT folder_name FROM file_events WHERE endpoint_name = %s AND id > %s AND id <= %s",
+                    (endpoint_name, after_id, up_to_id)
+                )
+            new_folders = named_folders(str(data_dir), (r['folder_name'] for r in result))
+        elif reconcile:
+            # Occasional full sweep: compare every folder on disk with what has been ingested,
+            # which also catches folders that don't follow the YYYYMMDD_HHMMSS naming
+            context.log.info("Running full reconciliation sweep")
+            query = """
+                SELECT folder_path
+                FROM file_metadata
+                WHERE endpoint_name = %s
+            """
+            with metrics.timer('query'):
+                result = supabase.execute_query(query, (endpoint_name,))
+            ingested_folders = {r['folder_path'] for r in result}
+            with metrics.timer('scan'):
+                new_folders = [
+                    entry for entry in scan_all_folders(str(data_dir))
+                    if entry.path not in ingested_folders
+                ]
+        else:
+            # Incremental: only timestamp-named folders above the high-water mark
+            context.log.info(f"Scanning for folders after high-water mark: {last_folder}")
+            with metrics.timer('scan'):
+                new_folders = scan_new_folders(str(data_dir), after=last_folder)
 
         # Limit to max_folders_per_run to avoid overwhelming the system
         total_new_folders = len(new_folders)
         folders_to_process = new_folders[:max_folders_per_run]
+        remaining_folders = total_new_folders - len(folders_to_process)
+
+        # A sweep only counts as done once everything it found has been ingested
+        watermarks = {'last_folder': newest_timestamp_folder(f.name for f in folders_to_process)}
+        if reconcile and remaining_folders == 0:
+            watermarks['last_reconciled_at'] = datetime.now()
+
+        if not new_folders:
+            if any(value is not None for value in watermarks.values()):
+                supabase.save_checkpoint('file_metadata', endpoint_name, **watermarks)
+            context.log.info("No new folders to ingest")
+            return {"ingested_count": 0, "endpoint": endpoint_name}
 
         context.log.info(f"Found {total_new_folders} new folders, processing {len(folders_to_process)} in this run")
 
-        # Prepare metadata for insertion
-        columns = ['endpoint_name', 'folder_path', 'xml_file', 'kmz_file', 'image_count', 'created_at']
+        # Prepare metadata for insertion; folders are listed and their XML/KMZ parsed
+        # concurrently so per-folder filesystem latency overlaps
+        columns = ['endpoint_name', 'folder_path', 'created_at'] + EXTRACTED_COLUMNS
+        chunk_started = time.perf_counter()
+        records = extract_folders([folder.path for folder in folders_to_process], max_workers=extract_workers)
+        metrics.record_fetch(time.perf_counter() - chunk_started)
         values = []
 
-        for folder in folders_to_process:
-            xml_file = None
-            kmz_file = None
-            image_count = 0
-
-            for file in folder.iterdir():
-                if file.suffix == '.xml':
-                    xml_file = file.name
-                elif file.suffix == '.kmz':
-                    kmz_file = file.name
-                elif file.suffix in ['.jpg', '.jpeg', '.png']:
-                    image_count += 1
+        for folder, record in zip(folders_to_process, records):
+            for error in record['errors']:
+                context.log.warning(f"Could not parse {folder.name}/{error}")
 
             # Parse timestamp from folder name (format: YYYYMMDD_HHMMSS)
             try:
                 created_at = datetime.strptime(folder.name, "%Y%m%d_%H%M%S")
-            except:
+            except ValueError:
                 created_at = datetime.fromtimestamp(folder.stat().st_mtime)
 
-            values.append((
-                endpoint_name,
-                str(folder),
-                xml_file,
-                kmz_file,
-                image_count,
-                created_at
-            ))
-
-        # Insert into Supabase
-        rows_inserted = supabase.insert_batch('file_metadata', columns, values)
+            values.append(
+                (endpoint_name, folder.path, created_at) + tuple(record[column] for column in EXTRACTED_COLUMNS)
+            )
 
-        remaining_folders = total_new_folders - len(folders_to_process)
+        # Insert into Supabase and advance the high-water mark in the same transaction
+        sink_timings = {}
+        rows_inserted = supabase.insert_batch(
+            'file_metadata', columns, values,
+            checkpoint={'endpoint_name': endpoint_name, **watermarks},
+            timings=sink_timings
+        )
+        metrics.record_chunk(
+            rows_inserted, estimate_batch_bytes(values), time.perf_counter() - chunk_started, sink=sink_timings
+        )
 
         context.log.info(f"Successfully ingested {rows_inserted} folder metadata from {endpoint_name}")
         if remaining_folders > 0:
@@ -277,9 +667,98 @@ def ingest_file_data(
             "ingested_count": rows_inserted,
             "endpoint": endpoint_name,
             "total_new_folders": total_new_folders,
-            "remaining_folders": remaining_folders
+            "remaining_folders": remaining_folders,
+            "reconciled": reconcile,
+            "folder_paths": [folder.path for folder in folders_to_process],
         }
 
     except Exception as e:
         context.log.error(f"Error ingesting files from endpoint {endpoint_name}: {str(e)}")
         raise
+
+
+def _ingest_remote_file_endpoint(context: AssetExecutionContext, supabase: SupabaseResource, endpoint_name: str,
+                                 metrics: 'IngestMetrics') -> dict:
+    """Sync folder metadata from a remote file endpoint's /manifest, resuming after its last_folder high-water mark"""
+    from .manifest import fetch_manifest, manifest_record
+
+    config = EndpointConfig.from_tags(context.run.tags, 'file')
+    base_url = f"http://{config.host}:{config.port}"
+    last_folder = (supabase.get_checkpoint('file_metadata', endpoint_name) or {}).get('last_folder')
+    context.log.info(f"Fetching manifest from {base_url} after high-water mark: {last_folder}")
+
+    # One page of up to max_chunks_per_run folders per run, like a local scan
+    chunk_started = time.perf_counter()
+    page = fetch_manifest(config.host, config.port, after=last_folder, limit=config.max_chunks_per_run)
+    metrics.record_fetch(time.perf_counter() - chunk_started)
+    if not page.folders:
+        context.log.info("No new folders to ingest")
+        return {"ingested_count": 0, "endpoint": endpoint_name}
+
+    columns = ['endpoint_name', 'folder_path', 'created_at'] + EXTRACTED_COLUMNS
+    values = []
+    for folder in page.folders:
+        record = manifest_record(folder)
+        for error in record['errors']:
+            context.log.warning(f"Could not parse {folder['folder']}/{error}")
+        values.append(
+            (endpoint_name, f"{base_url}/{folder['folder']}/", datetime.strptime(folder['folder'], "%Y%m%d_%H%M%S"))
+            + tuple(record[column] for column in EXTRACTED_COLUMNS)
+        )
+
+    sink_timings = {}
+    rows_inserted = supabase.insert_batch(
+        'file_metadata', columns, values,
+        checkpoint={'endpoint_name': endpoint_name, 'last_folder': page.cursor},
+        timings=sink_timings
+    )
+    metrics.record_chunk(
+        rows_inserted, estimate_batch_bytes(values), time.perf_counter() - chunk_started, sink=sink_timings
+    )
+    context.log.info(f"Successfully ingested {rows_inserted} folder metadata from {base_url}"
+                     + (" - more folders remain for the next run" if page.more else " - caught up!"))
+    return {
+        "ingested_count": rows_inserted,
+        "endpoint": endpoint_name,
+        "total_new_folders": len(page.folders),
+        "more_folders": page.more,
+    }
+
+
+@asset(
+    ins={"ingested": AssetIn("ingest_file_data")},
+    required_resource_keys={"supabase"},
+    description="Content hashes and deduplicated thumbnails of the images in the folders the upstream file ingest run loaded",
+)
+def file_images(context: AssetExecutionContext, ingested: dict) -> Output[dict]:
+    """Record the images of newly ingested folders in file_images, hashing only new or changed files"""
+    from .images import process_images
+
+    endpoint_name = ingested["endpoint"]
+    log = _EndpointLog(context.log, endpoint_name)
+    # Remote (manifest) endpoints report no folder_paths: their images are not on this host
+    folder_paths = ingested.get("folder_paths") or []
+    started = time.perf_counter()
+    stats = process_images(context.resources.supabase, endpoint_name, folder_paths, log)
+    if stats["images"]:
+        log.info(
+            f"{stats['images']} image(s) in {len(folder_paths)} folder(s): {stats['cached']} unchanged, "
+            f"{stats['hashed']} hashed, {stats['duplicates']} duplicate(s), {stats['thumbnailed']} new thumbnail(s)"
+        )
+    else:
+        log.info("No new images")
+    return Output({"endpoint": endpoint_name, **stats}, metadata={
+        **stats,
+        "folder_count": len(folder_paths),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    })
+
+
+# One ingest and one backfill asset per connector, plus its rollup asset if the table is rolled up
+INGEST_ASSETS = {endpoint_type: build_ingest_asset(connector) for endpoint_type, connector in CONNECTORS.items()}
+BACKFILL_ASSETS = {endpoint_type: build_backfill_asset(connector) for endpoint_type, connector in CONNECTORS.items()}
+ROLLUP_ASSETS = {
+    endpoint_type: build_rollup_asset(connector)
+    for endpoint_type, connector in CONNECTORS.items()
+    if connector.rollup_asset_name
+}
@@ -0,0 +1,337 @@
+"""
+Asyncio ingestion engine for large fleets of slow database endpoints.
+
+The thread-based paths in resources.py block a thread per endpoint on
+psycopg2/mysql-connector sockets. Here every endpoint is a coroutine on one
+event loop: sources are read with asyncpg and aiomysql, chunks are written
+to Supabase through a small asyncpg pool, and a semaphore bounds how many
+endpoints are in flight at once. Hundreds of idle, high-latency endpoints
+then cost one process and a handful of Supabase connections instead of a
+thread and a connection each.
+
+Chunks move as MeasurementBatch arrays and are loaded with the same binary
+COPY, staging merge and ingest_state checkpoint as SupabaseResource.
+asyncpg and aiomysql are imported on first connect, and NumPy (columnar)
+once a run starts, so loading the code location does not import them.
+"""
+import asyncio
+import contextlib
+import io
+import time
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from dagster import ConfigurableResource
+
+from .batching import AdaptiveBatchSizer
+from .config import EndpointConfig
+from .connectors import CONNECTORS
+from .resources import CONFLICT_KEYS, SupabaseResource
+
+if TYPE_CHECKING:
+    from .columnar import MeasurementBatch
+    from .metrics import IngestMetrics
+
+
+class AsyncMySQLSource:
+    """Keyset-paginated reads of a MySQL endpoint's measurements table"""
+
+    table = CONNECTORS['mysql'].table
+    channels = CONNECTORS['mysql'].channels
+
+    def __init__(self, config: EndpointConfig, user: str, password: str, timeout: float):
+        self.config = config
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self._conn = None
+        # Same casts as MySQLEndpointResource.stream_measurement_batches: plain ints and floats off the wire
+        select = ["id", "TIMESTAMPDIFF(MICROSECOND, '1970-01-01 00:00:00', timestamp)"] + [
+            f"CAST({c} AS DOUBLE)" for c in self.channels
+        ]
+        self._query = f"SELECT {', '.join(select)} FROM measurements WHERE id > %s ORDER BY id LIMIT %s"
+
+    async def connect(self):
+        import aiomysql
+
+        # Autocommit so every page reads a fresh snapshot instead of the first query's
+        self._conn = await aiomysql.connect(
+            host=self.config.host, port=self.config.port, user=self.user, password=self.password,
+            db=self.config.database, connect_timeout=self.timeout, autocommit=True,
+        )
+
+    async def fetch(self, after_id: int, size: int) -> 'MeasurementBatch':
+        from .columnar import MeasurementBatch
+
+        async with self._conn.cursor() as cursor:
+            await asyncio.wait_for(cursor.execute(self._query, (after_id, size)), self.timeout)
+            rows = await cursor.fetchall()
+        return MeasurementBatch.from_rows(rows, self.channels)
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+class AsyncPostgresSource:
+    """Keyset-paginated binary COPY reads of a PostgreSQL endpoint's measurements table"""
+
+    table = CONNECTORS['postgres'].table
+    channels = CONNECTORS['postgres'].channels
+
+    def __init__(self, config: EndpointConfig, user: str, password: str, timeout: float):
+        self.config = config
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self._conn = None
+        select = ["id::int8", "timestamp"] + [f"COALESCE({c}::float8, 'NaN')" for c in self.channels]
+        self._query = f"SELECT {', '.join(select)} FROM measurements WHERE id > $1 ORDER BY id LIMIT $2"
+
+    async def connect(self):
+        import asyncpg
+
+        self._conn = await asyncpg.connect(
+            host=self.config.host, port=self.config.port, user=self.user, password=self.password,
+            database=self.config.database, timeout=self.timeout, command_timeout=self.timeout,
+        )
+
+    async def fetch(self, after_id: int, size: int) -> 'MeasurementBatch':
+        from .columnar import MeasurementBatch
+
+        buffer = io.BytesIO()
+        await self._conn.copy_from_query(self._query, after_id, size, output=buffer, format='binary')
+        return MeasurementBatch.from_pg_binary(buffer.getvalue(), self.channels)
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+
+
+SOURCES = {
+    'mysql': AsyncMySQLSource,
+    'postgres': AsyncPostgresSource,
+}
+
+
+class AsyncSupabaseWriter:
+    """Loads MeasurementBatch chunks into Supabase over a shared asyncpg pool"""
+
+    def __init__(self, supabase: SupabaseResource, pool_size: int, timeout: float):
+        self.supabase = supabase
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pool = None
+
+    async def open(self):
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(
+            host=self.supabase.host, port=self.supabase.port, user=self.supabase.user,
+            password=self.supabase.password, database=self.supabase.database,
+            min_size=1, max_size=self.pool_size, command_timeout=self.timeout,
+        )
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+
+    async def get_watermark(self, table: str, endpoint_name: str) -> int:
+        """Last committed source id, as SupabaseResource.get_watermark"""
+        async with self._pool.acquire() as conn:
+            last_id = await conn.fetchval(
+                "SELECT last_source_id FROM ingest_state WHERE target_table = $1 AND endpoint_name = $2",
+                table, endpoint_name
+            )
+            if last_id is None:
+                last_id = await conn.fetchval(f"SELECT MAX(source_id) FROM {table} WHERE endpoint_name = $1", endpoint_name)
+        return last_id or 0
+
+    async def insert_batch(self, table: str, batch: 'MeasurementBatch', timings: dict = None) -> int:
+        """Stage, merge and checkpoint one chunk in a single transaction; returns rows inserted"""
+        from .columnar import batch_columns, merge_staged_batch_sql, staging_table_sql
+
+        started = time.perf_counter()
+        async with self._pool.acquire() as conn:
+            checked_out = time.perf_counter()
+            async with conn.transaction():
+                staging = f"_stage_{table}_columnar"
+                await conn.execute(staging_table_sql(staging, batch.channels))
+                await conn.copy_to_table(
+                    staging, source=io.BytesIO(batch.to_pg_binary()),
+                    columns=batch_columns(batch.channels), format='binary',
+                )
+                conflict_columns = CONFLICT_KEYS.get(table) if self.supabase.load_mode == 'upsert' else None
+                status = await conn.execute(merge_staged_batch_sql(staging, table, batch.channels, conflict_columns))
+                rows_inserted = int(status.split()[-1])
+                # Watermarks only move forward, as in SupabaseResource._save_checkpoint
+                await conn.execute(
+                    """
+                    INSERT INTO ingest_state (target_table, endpoint_name, rows_ingested, last_source_id)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (target_table, endpoint_name) DO UPDATE SET
+                        rows_ingested = ingest_state.rows_ingested + EXCLUDED.rows_ingested,
+                        updated_at = CURRENT_TIMESTAMP,
+                        last_source_id = GREATEST(ingest_state.last_source_id, EXCLUDED.last_source_id)
+                    """,
+                    table, batch.endpoint_name, rows_inserted, batch.last_id
+                )
+                loaded = time.perf_counter()
+            if timings is not None:
+                timings.update(
+                    checkout_seconds=checked_out - started,
+                    load_seconds=loaded - checked_out,
+                    commit_seconds=time.perf_counter() - loaded,
+                )
+        return rows_inserted
+
+    async def save_chunk_size(self, endpoint_id: Optional[int], chunk_size: int):
+        if endpoint_id is None:
+            return
+        async with self._pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE ingest_control SET chunk_size = $1, updated_at = CURRENT_TIMESTAMP WHERE id = $2",
+                chunk_size, endpoint_id
+            )
+
+
+async def ingest_endpoint(writer: AsyncSupabaseWriter, source, config: EndpointConfig, log,
+                          metrics: 'IngestMetrics') -> dict:
+    """
+    Ingest one endpoint from its checkpoint, as _ingest_database_endpoint does on
+    threads: up to max_chunks_per_run chunks, adaptive sizing and the time
+    budget, with the next page fetched while the current one is written.
+    """
+    endpoint_name = config.name
+    table = source.table
+    last_id = starting_id = await writer.get_watermark(table, endpoint_name)
+
+    sizer = None
+    if config.adaptive_chunking:
+        sizer = AdaptiveBatchSizer(
+            config.chunk_size, config.min_chunk_size, config.max_chunk_size,
+            time_budget_seconds=config.run_time_budget_seconds
+        )
+
+    async def fetch(after_id: int, size: int) -> 'MeasurementBatch':
+        fetch_started = time.perf_counter()
+        batch = await source.fetch(after_id, size)
+        metrics.record_fetch(time.perf_counter() - fetch_started)
+        return batch
+
+    with metrics.timer('connect'):
+        await source.connect()
+    total_ingested = chunks_processed = 0
+    requested = sizer.size if sizer else config.chunk_size
+    pending = asyncio.ensure_future(fetch(last_id, requested))
+    try:
+        chunk_started = time.perf_counter()
+        while True:
+            wait_started = time.perf_counter()
+            batch = await pending
+            batch_requested = requested
+            pending = None
+            queue_wait = time.perf_counter() - wait_started
+            if not len(batch):
+                break
+
+            invalid = batch.validate()
+            if invalid:
+                log.warning(f"Loading out-of-range values as NULL: {invalid}")
+            batch = batch.for_endpoint(endpoint_name)
+
+            # A short page means the source ran dry
+            more = len(batch) == batch_requested and chunks_processed + 1 < config.max_chunks_per_run
+            if more and config.pipeline_depth > 0:
+                # Fetch the next page (keyed on the fetched, not the committed, id) while this one loads
+                requested = sizer.size if sizer else config.chunk_size
+                pending = asyncio.ensure_future(fetch(batch.last_id, requested))
+
+            sink_timings = {}
+            total_ingested += await writer.insert_batch(table, batch, timings=sink_timings)
+            chunks_processed += 1
+            last_id = batch.last_id
+
+            chunk_seconds = time.perf_counter() - chunk_started
+            chunk_started = time.perf_counter()
+            metrics.record_chunk(len(batch), batch.nbytes, chunk_seconds, queue_wait, sink_timings)
+            if sizer:
+                sizer.record(len(batch), chunk_seconds, batch.nbytes, requested=batch_requested)
+
+            if not more:
+                break
+            if sizer and not sizer.within_budget():
+                log.info(f"Run time budget of {config.run_time_budget_seconds}s reached after {chunks_processed} chunks")
+                break
+            if pending is None:
+                requested = sizer.size if sizer else config.chunk_size
+                pending = asyncio.ensure_future(fetch(last_id, requested))
+    finally:
+        # Let an abandoned prefetch finish unwinding before its connection is closed
+        if pending is not None:
+            pending.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await pending
+        await source.close()
+
+    if sizer and sizer.size != config.chunk_size:
+        await writer.save_chunk_size(config.endpoint_id, sizer.size)
+
+    if total_ingested:
+        log.info(f"Ingested {total_ingested} measurements in {chunks_processed} chunks (ids {starting_id} -> {last_id})")
+    return {
+        "ingested_count": total_ingested,
+        "chunks_processed": chunks_processed,
+        "endpoint": endpoint_name,
+        "endpoint_type": config.endpoint_type,
+        "starting_id": starting_id,
+        "last_id": last_id,
+        "chunk_size": sizer.size if sizer else config.chunk_size,
+    }
+
+
+class AsyncIngestResource(ConfigurableResource):
+    """Runs many database endpoints concurrently on one event loop"""
+
+    # Endpoints ingesting at the same time; most of them are waiting on the network
+    max_concurrency: int = 200
+    # asyncpg connections to Supabase shared by every endpoint in the run
+    writer_pool_size: int = 10
+    # Seconds allowed for a source connect or query before the endpoint is failed
+    source_timeout: float = 30.0
+    source_user: str = "sensoruser"
+    source_password: str = "sensorpass"
+
+    def run(self, supabase: SupabaseResource, configs: List[EndpointConfig],
+            make_log: Callable[[EndpointConfig], object]) -> List[dict]:
+        """Ingest every config and return one result per endpoint, failures included"""
+        return asyncio.run(self._run(supabase, configs, make_log))
+
+    async def _run(self, supabase: SupabaseResource, configs: List[EndpointConfig], make_log) -> List[dict]:
+        from .metrics import IngestMetrics
+
+        writer = AsyncSupabaseWriter(supabase, self.writer_pool_size, self.source_timeout)
+        await writer.open()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(config: EndpointConfig) -> dict:
+            async with semaphore:
+                log = make_log(config)
+                metrics = IngestMetrics(config.endpoint_type, config.name)
+                source = SOURCES[config.endpoint_type](config, self.source_user, self.source_password, self.source_timeout)
+                started = time.perf_counter()
+                try:
+                    result = await ingest_endpoint(writer, source, config, log, metrics)
+                    result["status"] = "success"
+                except Exception as e:
+                    result = {
+                        "endpoint": config.name, "endpoint_type": config.endpoint_type,
+                        "status": "failed", "error": str(e) or type(e).__name__, "ingested_count": 0,
+                    }
+                result["duration_seconds"] = round(time.perf_counter() - started, 3)
+                result["metrics"] = metrics
+                return result
+
+        try:
+            return await asyncio.gather(*(run_one(config) for config in configs))
+        finally:
+            await writer.close()
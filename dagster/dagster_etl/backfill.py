@@ -0,0 +1,32 @@
+from dagster import DynamicPartitionsDefinition
+from typing import List, Tuple
+from .connectors import CONNECTORS
+
+# One dynamic partition set per connector, one partition per (endpoint, source id range);
+# keys are "<endpoint_id>:<after_id>-<up_to_id>"
+BACKFILL_PARTITIONS = {
+    endpoint_type: DynamicPartitionsDefinition(name=connector.backfill_partitions_name)
+    for endpoint_type, connector in CONNECTORS.items()
+}
+
+
+def partition_key(endpoint_id: int, after_id: int, up_to_id: int) -> str:
+    """Partition key for the source ids in (after_id, up_to_id] of one endpoint"""
+    return f"{endpoint_id}:{after_id}-{up_to_id}"
+
+
+def parse_partition_key(key: str) -> Tuple[int, int, int]:
+    """Inverse of partition_key: (endpoint_id, after_id, up_to_id)"""
+    endpoint_id, id_range = key.split(':', 1)
+    after_id, up_to_id = id_range.split('-', 1)
+    return int(endpoint_id), int(after_id), int(up_to_id)
+
+
+def plan_ranges(after_id: int, up_to_id: int, rows_per_partition: int) -> List[Tuple[int, int]]:
+    """Split (after_id, up_to_id] into consecutive, non-overlapping id ranges"""
+    if rows_per_partition < 1:
+        raise ValueError(f"rows_per_partition must be positive, got {rows_per_partition}")
+    return [
+        (start, min(start + rows_per_partition, up_to_id))
+        for start in range(after_id, up_to_id, rows_per_partition)
+    ]
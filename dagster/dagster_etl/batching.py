@@ -0,0 +1,95 @@
+import sys
+import time
+from typing import Optional, Sequence
+
+
+def estimate_batch_bytes(rows: Sequence[tuple]) -> int:
+    """Rough in-memory size of a batch of tuples, extrapolated from its first row"""
+    if hasattr(rows, 'nbytes'):
+        # Array-backed batches know their exact size
+        return rows.nbytes
+    if not rows:
+        return 0
+    first = rows[0]
+    row_bytes = sys.getsizeof(first) + sum(sys.getsizeof(value) for value in first)
+    return row_bytes * len(rows)
+
+
+class AdaptiveBatchSizer:
+    """
+    Chooses the next chunk size from measured throughput.
+
+    Each recorded chunk updates a smoothed rows/sec estimate; the next size is
+    whatever that throughput moves in ``target_chunk_seconds``, changed by at
+    most 2x per chunk and clamped to ``[floor, ceiling]`` and to the memory
+    budget. ``within_budget()`` tells the caller whether another chunk of the
+    current size still fits in the run's time budget.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        floor: int,
+        ceiling: int,
+        target_chunk_seconds: float = 2.0,
+        time_budget_seconds: Optional[float] = None,
+        max_batch_bytes: int = 64 * 1024 * 1024,
+        smoothing: float = 0.5,
+    ):
+        if floor < 1 or ceiling < floor:
+            raise ValueError(f"Invalid chunk size bounds: floor={floor}, ceiling={ceiling}")
+        self.floor = floor
+        self.ceiling = ceiling
+        self.target_chunk_seconds = target_chunk_seconds
+        self.time_budget_seconds = time_budget_seconds
+        self.max_batch_bytes = max_batch_bytes
+        self.smoothing = smoothing
+
+        self.rows_per_second = None
+        self.bytes_per_row = None
+        self.last_chunk_seconds = None
+        self.size = self._clamp(initial)
+        self._started = time.monotonic()
+
+    def next_size(self) -> int:
+        """Current chunk size; usable as a callable batch_size for stream_measurements"""
+        return self.size
+
+    def record(self, rows: int, seconds: float, batch_bytes: int = None, requested: int = None):
+        """
+        Feed back one chunk's row count, end-to-end latency and memory footprint.
+
+        ``requested`` is the size the chunk was fetched at, which differs from
+        the current size when chunks are prefetched; it defaults to the current size.
+        """
+        self.last_chunk_seconds = seconds
+        if batch_bytes and rows:
+            self.bytes_per_row = batch_bytes / rows
+
+        # A short chunk means the source ran dry, which says nothing about throughput
+        if rows < (self.size if requested is None else requested) or seconds <= 0:
+            return
+
+        observed = rows / seconds
+        if self.rows_per_second is None:
+            self.rows_per_second = observed
+        else:
+            self.rows_per_second = self.smoothing * observed + (1 - self.smoothing) * self.rows_per_second
+
+        ideal = self.rows_per_second * self.target_chunk_seconds
+        ideal = min(max(ideal, self.size / 2), self.size * 2)
+        self.size = self._clamp(int(ideal))
+
+    def within_budget(self) -> bool:
+        """Whether another chunk at the current size is expected to finish inside the time budget"""
+        if self.time_budget_seconds is None:
+            return True
+        elapsed = time.monotonic() - self._started
+        expected = self.size / self.rows_per_second if self.rows_per_second else (self.last_chunk_seconds or 0)
+        return elapsed + expected <= self.time_budget_seconds
+
+    def _clamp(self, size: int) -> int:
+        ceiling = self.ceiling
+        if self.bytes_per_row:
+            ceiling = min(ceiling, max(self.floor, int(self.max_batch_bytes / self.bytes_per_row)))
+        return max(self.floor, min(size, ceiling))
@@ -0,0 +1,184 @@
+import csv
+import io
+import queue
+import threading
+import zlib
+from itertools import islice
+from typing import Iterable, Sequence
+
+import psycopg2
+from psycopg2 import errors, extras
+
+from .partitions import PARTITIONED_TABLES, source_key_merge_sql
+
+# Errors meaning COPY itself is not permitted on the target (views, RLS-protected
+# tables, roles without COPY rights) rather than that the data is bad
+COPY_UNSUPPORTED_ERRORS = (
+    errors.InsufficientPrivilege,
+    errors.FeatureNotSupported,
+    errors.WrongObjectType,
+)
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class CsvRowStream:
+    """
+    File-like object that serializes rows to CSV lazily as COPY reads it.
+
+    Rows are written with ``csv.writer.writerows`` a slice at a time, so the
+    per-row formatting happens in C and only one slice is held in memory.
+    """
+
+    def __init__(self, rows: Iterable[Sequence], rows_per_fill: int = 1000):
+        self._rows = iter(rows)
+        self._rows_per_fill = rows_per_fill
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+        self.rows_read = 0
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._pending) < size:
+            batch = list(islice(self._rows, self._rows_per_fill))
+            if not batch:
+                break
+            self._writer.writerows(batch)
+            self.rows_read += len(batch)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+        if size < 0 or size >= len(self._pending):
+            data, self._pending = self._pending, ''
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        # psycopg2 only calls read() for COPY FROM, but file-likes are expected to have both
+        return self.read(size)
+
+
+class CopyOutPipe:
+    """
+    File-like target for ``COPY ... TO STDOUT`` run on another thread, read as a stream.
+
+    psycopg2 writes COPY output one row at a time; rows are gathered into
+    blocks of about COPY_BUFFER_SIZE bytes and handed to the reader through
+    a bounded queue, so a COPY of any size holds at most ``max_blocks``
+    blocks in memory and stalls while the reader is behind. ``read_block``
+    returns None at the end of the COPY and re-raises its error, if any.
+    Closing the pipe makes the next write fail, which aborts the COPY.
+    """
+
+    def __init__(self, max_blocks: int = 8):
+        self._queue = queue.Queue(max_blocks)
+        self._pending = bytearray()
+        self._closed = threading.Event()
+        self._error = None
+
+    def copy(self, cursor, sql: str):
+        """Run a COPY TO STDOUT into the pipe (the body of the writer thread)"""
+        try:
+            cursor.copy_expert(sql, self, size=COPY_BUFFER_SIZE)
+            if self._pending:
+                self._put(bytes(self._pending))
+        except Exception as e:
+            self._error = e
+        finally:
+            try:
+                self._put(None)
+            except BrokenPipeError:
+                pass
+
+    def write(self, data) -> int:
+        self._pending += data
+        if len(self._pending) >= COPY_BUFFER_SIZE:
+            self._put(bytes(self._pending))
+            self._pending.clear()
+        return len(data)
+
+    def read_block(self):
+        block = self._queue.get()
+        if block is None and self._error is not None:
+            raise self._error
+        return block
+
+    def close(self):
+        self._closed.set()
+
+    def _put(self, block):
+        while True:
+            if self._closed.is_set():
+                raise BrokenPipeError("COPY reader closed the pipe")
+            try:
+                self._queue.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+def copy_rows(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """Stream rows into table with COPY FROM STDIN and return the number loaded"""
+    stream = CsvRowStream(rows)
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cursor.copy_expert(sql, stream, size=COPY_BUFFER_SIZE)
+    # The server's "COPY n" tag is authoritative; fall back to what we streamed
+    return cursor.rowcount if cursor.rowcount >= 0 else stream.rows_read
+
+
+def insert_values(cursor, table: str, columns: Sequence[str], rows: Sequence[Sequence],
+                  page_size: int = 1000) -> int:
+    """Insert rows with multi-row INSERT ... VALUES statements"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+    extras.execute_values(cursor, sql, rows, page_size=page_size)
+    return len(rows)
+
+
+def upsert_values(cursor, table: str, columns: Sequence[str], rows: Sequence[Sequence],
+                  conflict_columns: Sequence[str], page_size: int = 1000) -> int:
+    """Insert rows with multi-row INSERT ... VALUES, overwriting the other columns of rows whose conflict key exists"""
+    updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in columns if column not in conflict_columns)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {updates}"
+    )
+    extras.execute_values(cursor, sql, rows, page_size=page_size)
+    return len(rows)
+
+
+def insert_executemany(cursor, table: str, columns: Sequence[str], rows: Sequence[Sequence]) -> int:
+    """Insert rows one statement per row (the original insert path, kept for benchmarks)"""
+    placeholders = ', '.join(['%s'] * len(columns))
+    cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+
+def create_staging_table(cursor, table: str, columns: Sequence[str]) -> str:
+    """
+    Create (once per connection) an empty temp table shaped like table's columns.
+
+    Rows loaded into it are discarded at commit, while the table itself lives
+    as long as the pooled connection, so steady-state upserts pay no DDL.
+    """
+    staging = f"_stage_{table}_{zlib.crc32(','.join(columns).encode()):08x}"
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS "
+        f"AS SELECT {', '.join(columns)} FROM {table} WITH NO DATA"
+    )
+    return staging
+
+
+def merge_staged(cursor, staging: str, table: str, columns: Sequence[str], conflict_columns: Sequence[str]) -> int:
+    """Move staged rows into table, skipping rows whose conflict key already exists; returns rows inserted"""
+    if table in PARTITIONED_TABLES:
+        # The partitioned tables' conflict keys include timestamp; source keys are checked separately
+        cursor.execute(source_key_merge_sql(staging, table, columns))
+        return cursor.rowcount
+    column_list = ', '.join(columns)
+    cursor.execute(
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING"
+    )
+    return cursor.rowcount
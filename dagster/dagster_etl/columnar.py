@@ -0,0 +1,225 @@
+"""
+Array-backed chunks of sensor rows.
+
+A MeasurementBatch holds a chunk as one int64 id array, one datetime64[us]
+timestamp array and a (channels x rows) float64 matrix, instead of a list of
+per-row tuples of Decimal and datetime objects. PostgreSQL sources fill it
+straight from a binary COPY, and the Supabase loader writes it with a binary
+COPY built from the arrays, so no Python object is created per value on
+either side.
+"""
+import io
+import struct
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .partitions import PARTITIONED_TABLES, source_key_merge_sql
+
+# PostgreSQL binary COPY framing and its timestamp epoch (2000-01-01) in Unix microseconds
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+PG_EPOCH_OFFSET_US = 946_684_800_000_000
+
+# DECIMAL(10, 6) holds |v| <= 9999.999999; anything that would round past it cannot be stored
+DECIMAL_10_6_LIMIT = 10_000.0
+
+
+class MeasurementBatch:
+    """One chunk of measurements as column arrays, in source id order"""
+
+    __slots__ = ("ids", "timestamps", "values", "channels", "endpoint_name")
+
+    def __init__(self, ids: np.ndarray, timestamps: np.ndarray, values: np.ndarray, channels: Sequence[str],
+                 endpoint_name: Optional[str] = None):
+        self.ids = ids
+        self.timestamps = timestamps
+        self.values = values
+        self.channels = tuple(channels)
+        self.endpoint_name = endpoint_name
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple], channels: Sequence[str]) -> "MeasurementBatch":
+        """Build from driver tuples (id, timestamp, *channels); timestamps may be datetimes or epoch microseconds"""
+        if not rows:
+            return cls.empty(channels)
+        columns = list(zip(*rows))
+        ids = np.array(columns[0], dtype=np.int64)
+        if isinstance(columns[1][0], int):
+            timestamps = np.array(columns[1], dtype=np.int64).view("datetime64[us]")
+        else:
+            timestamps = np.array(columns[1], dtype="datetime64[us]")
+        # None (SQL NULL) becomes NaN
+        values = np.array(columns[2:], dtype=np.float64)
+        return cls(ids, timestamps, values, channels)
+
+    @classmethod
+    def from_pg_binary(cls, data: bytes, channels: Sequence[str]) -> "MeasurementBatch":
+        """
+        Parse ``COPY (SELECT id::int8, timestamp, <channel>::float8 ...) TO STDOUT (FORMAT binary)``.
+
+        Every field must be non-NULL (COALESCE channels to 'NaN'), so each row
+        has the same width and the whole payload is one structured-array view.
+        """
+        body = memoryview(data)[len(PGCOPY_HEADER):len(data) - len(PGCOPY_TRAILER)]
+        return cls.from_pg_records(np.frombuffer(body, dtype=measurement_row_dtype(channels)), channels)
+
+    @classmethod
+    def from_pg_records(cls, rows: np.ndarray, channels: Sequence[str]) -> "MeasurementBatch":
+        """Build from binary COPY rows viewed as a measurement_row_dtype record array"""
+        return cls(
+            rows["id"].astype(np.int64),
+            (rows["timestamp"].astype(np.int64) + PG_EPOCH_OFFSET_US).view("datetime64[us]"),
+            np.array([rows[c] for c in channels], dtype=np.float64),
+            channels,
+        )
+
+    @classmethod
+    def empty(cls, channels: Sequence[str]) -> "MeasurementBatch":
+        return cls(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[us]"),
+            np.empty((len(channels), 0), dtype=np.float64), channels,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def last_id(self) -> int:
+        return int(self.ids[-1])
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.timestamps.nbytes + self.values.nbytes
+
+    def for_endpoint(self, endpoint_name: str) -> "MeasurementBatch":
+        """The same arrays tagged with the endpoint they are loaded for"""
+        return MeasurementBatch(self.ids, self.timestamps, self.values, self.channels, endpoint_name)
+
+    def validate(self) -> Dict[str, int]:
+        """
+        Replace values that cannot be stored as DECIMAL(10, 6) (NaN, inf, or
+        out of range after rounding to 6 places) with NaN, which loads as NULL.
+        Returns the number of bad values per channel, omitting clean channels.
+        """
+        with np.errstate(invalid="ignore"):
+            bad = ~(np.abs(np.round(self.values, 6)) < DECIMAL_10_6_LIMIT)
+        if not bad.any():
+            return {}
+        # SQL NULLs arrive as NaN already; only count values that were actually present
+        out_of_range = bad & ~np.isnan(self.values)
+        self.values[bad] = np.nan
+        counts = out_of_range.sum(axis=1)
+        return {channel: int(n) for channel, n in zip(self.channels, counts) if n}
+
+    def to_pg_binary(self) -> bytes:
+        """Binary COPY payload for (source_id, timestamp, *channels, endpoint_name); NULLs travel as NaN"""
+        name = (self.endpoint_name or "").encode()
+        fields = (
+            [("source_id", ">i8"), ("timestamp", ">i8")]
+            + [(c, ">f8") for c in self.channels]
+            + [("endpoint_name", f"S{len(name)}" if name else "V0")]
+        )
+        rows = np.empty(len(self), dtype=_pg_row_dtype(fields))
+        rows["field_count"] = len(fields)
+        for field, kind in fields:
+            rows[f"{field}_length"] = np.dtype(kind).itemsize
+        rows["source_id"] = self.ids
+        rows["timestamp"] = self.timestamps.view(np.int64) - PG_EPOCH_OFFSET_US
+        for channel, column in zip(self.channels, self.values):
+            rows[channel] = column
+        if name:
+            rows["endpoint_name"] = name
+        return PGCOPY_HEADER + rows.tobytes() + PGCOPY_TRAILER
+
+    def to_rows(self) -> List[tuple]:
+        """Per-row tuples (id, timestamp, *channels[, endpoint_name]) for loaders without binary COPY"""
+        columns = [
+            self.ids.tolist(),
+            self.timestamps.astype(object).tolist(),
+            *([None if v != v else v for v in column] for column in self.values.tolist()),
+        ]
+        if self.endpoint_name is not None:
+            columns.append([self.endpoint_name] * len(self))
+        return list(zip(*columns))
+
+
+class PgBinaryRowReader:
+    """
+    Cuts a streamed binary COPY of (id, timestamp, *channels) rows into MeasurementBatches.
+
+    COPY output is fed in as it arrives; ``take(n)`` returns the first n
+    complete rows once they are buffered. Rows are fixed-width (see
+    from_pg_binary), so the trailer is never mistaken for a row.
+    """
+
+    def __init__(self, channels: Sequence[str]):
+        self.channels = tuple(channels)
+        self._row_size = measurement_row_dtype(channels).itemsize
+        self._buffer = bytearray()
+        self._header_seen = False
+
+    def feed(self, data: bytes):
+        self._buffer += data
+        if not self._header_seen and len(self._buffer) >= len(PGCOPY_HEADER):
+            del self._buffer[:len(PGCOPY_HEADER)]
+            self._header_seen = True
+
+    @property
+    def rows_available(self) -> int:
+        return len(self._buffer) // self._row_size if self._header_seen else 0
+
+    def take(self, n: int) -> MeasurementBatch:
+        """The next min(n, rows_available) rows"""
+        size = min(n, self.rows_available) * self._row_size
+        rows = np.frombuffer(bytes(self._buffer[:size]), dtype=measurement_row_dtype(self.channels))
+        del self._buffer[:size]
+        return MeasurementBatch.from_pg_records(rows, self.channels)
+
+
+def measurement_row_dtype(channels: Sequence[str]) -> np.dtype:
+    """Record layout of a binary COPY row of (id::int8, timestamp, <channel>::float8 ...)"""
+    return _pg_row_dtype([("id", ">i8"), ("timestamp", ">i8")] + [(c, ">f8") for c in channels])
+
+
+def _pg_row_dtype(fields: List[tuple]) -> np.dtype:
+    # Each binary COPY row is an int16 field count, then an int32 length before every field
+    layout = [("field_count", ">i2")]
+    for field, kind in fields:
+        layout += [(f"{field}_length", ">i4"), (field, kind)]
+    return np.dtype(layout)
+
+
+def batch_columns(channels: Sequence[str]) -> List[str]:
+    """Column order of to_pg_binary payloads"""
+    return ["source_id", "timestamp", *channels, "endpoint_name"]
+
+
+def staging_table_sql(staging: str, channels: Sequence[str]) -> str:
+    """DDL for a per-connection float8 staging table that binary batches are copied into"""
+    return (
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+        f"(source_id int8, timestamp timestamp, {', '.join(f'{c} float8' for c in channels)}, endpoint_name text) "
+        f"ON COMMIT DELETE ROWS"
+    )
+
+
+def merge_staged_batch_sql(staging: str, table: str, channels: Sequence[str], conflict_columns: Sequence[str] = None) -> str:
+    """INSERT ... SELECT moving a staged batch into table; NaN becomes NULL in the DECIMAL columns"""
+    select = ['source_id', 'timestamp', *(f"NULLIF({c}, 'NaN')" for c in channels), 'endpoint_name']
+    if conflict_columns and table in PARTITIONED_TABLES:
+        # The partitioned tables' conflict keys include timestamp; source keys are checked separately
+        return source_key_merge_sql(staging, table, batch_columns(channels), select)
+    sql = f"INSERT INTO {table} ({', '.join(batch_columns(channels))}) SELECT {', '.join(select)} FROM {staging}"
+    if conflict_columns:
+        sql += f" ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING"
+    return sql
+
+
+def copy_batch(cursor, table: str, batch: MeasurementBatch) -> int:
+    """Binary COPY a batch into table (source_id, timestamp, *channels, endpoint_name)"""
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(batch_columns(batch.channels))}) FROM STDIN WITH (FORMAT binary)",
+        io.BytesIO(batch.to_pg_binary())
+    )
+    return len(batch)
@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from typing import Optional
+
+# Defaults for endpoints whose run tags or ingest_control columns are missing
+DEFAULT_PORTS = {'mysql': 3306, 'postgres': 5432, 'file': 8000}
+DEFAULT_HOSTS = {'mysql': 'mysql-endpoint', 'postgres': 'postgres-endpoint', 'file': 'file-endpoint'}
+
+# ingest_control columns read by the sensor and by fan-out runs
+CONTROL_COLUMNS = """
+    id, ip_address, port, name, chunk_size, max_chunks_per_run, endpoint_type, database_name,
+    pipeline_depth, adaptive_chunking, min_chunk_size, max_chunk_size, run_time_budget_seconds, file_source
+"""
+
+
+@dataclass
+class EndpointConfig:
+    """Ingestion settings for one ingest_control endpoint"""
+
+    endpoint_type: str
+    name: str
+    host: str
+    port: int
+    database: str = 'sensors'
+    endpoint_id: Optional[int] = None
+    chunk_size: int = 50
+    max_chunks_per_run: int = 20
+    pipeline_depth: int = 2
+    adaptive_chunking: bool = False
+    min_chunk_size: Optional[int] = None
+    max_chunk_size: Optional[int] = None
+    run_time_budget_seconds: float = 60.0
+    # File endpoints: 'local' reads FILE_DATA_DIR, 'remote' syncs through the endpoint's /manifest API
+    file_source: str = 'local'
+
+    def __post_init__(self):
+        # Without explicit bounds the adaptive sizer is pinned to chunk_size
+        if self.min_chunk_size is None:
+            self.min_chunk_size = self.chunk_size
+        if self.max_chunk_size is None:
+            self.max_chunk_size = self.chunk_size
+
+    @classmethod
+    def from_control_row(cls, row: dict) -> "EndpointConfig":
+        """Build a config from an ingest_control row (as returned by execute_query)"""
+        endpoint_type = row['endpoint_type']
+        optional = {
+            key: row[key]
+            for key in ('pipeline_depth', 'min_chunk_size', 'max_chunk_size', 'run_time_budget_seconds', 'file_source')
+            if row.get(key) is not None
+        }
+        return cls(
+            endpoint_type=endpoint_type,
+            name=row['name'],
+            host=row['ip_address'] or DEFAULT_HOSTS.get(endpoint_type),
+            port=int(row['port'] or DEFAULT_PORTS.get(endpoint_type, 0)),
+            database=row.get('database_name') or 'sensors',
+            endpoint_id=row['id'],
+            chunk_size=row['chunk_size'] or 50,
+            max_chunks_per_run=row['max_chunks_per_run'] or 20,
+            adaptive_chunking=bool(row.get('adaptive_chunking')),
+            **optional
+        )
+
+    @classmethod
+    def from_tags(cls, tags, endpoint_type: str) -> "EndpointConfig":
+        """Build a config from the run tags written by endpoint_monitor_sensor"""
+        return cls(
+            endpoint_type=endpoint_type,
+            name=tags.get('endpoint_name', 'Unknown'),
+            host=tags.get('endpoint_host', DEFAULT_HOSTS.get(endpoint_type)),
+            port=int(tags.get('endpoint_port', str(DEFAULT_PORTS.get(endpoint_type, 0)))),
+            database=tags.get('endpoint_db', 'sensors'),
+            endpoint_id=int(tags['endpoint_id']) if tags.get('endpoint_id') else None,
+            chunk_size=int(tags.get('chunk_size', '50')),
+            max_chunks_per_run=int(tags.get('max_chunks_per_run', '20')),
+            pipeline_depth=int(tags.get('pipeline_depth', '2')),
+            adaptive_chunking=tags.get('adaptive_chunking', 'false') == 'true',
+            min_chunk_size=int(tags['min_chunk_size']) if tags.get('min_chunk_size') else None,
+            max_chunk_size=int(tags['max_chunk_size']) if tags.get('max_chunk_size') else None,
+            run_time_budget_seconds=float(tags.get('run_time_budget_seconds', '60')),
+            file_source=tags.get('file_source', 'local'),
+        )
+
+    def to_tags(self) -> dict:
+        """Run tags for a single-endpoint run (inverse of from_tags)"""
+        tags = {
+            "endpoint_id": str(self.endpoint_id) if self.endpoint_id is not None else None,
+            "endpoint_name": self.name,
+            "endpoint_host": self.host,
+            "endpoint_port": str(self.port),
+            "endpoint_type": self.endpoint_type,
+            "endpoint_db": self.database,
+            "chunk_size": str(self.chunk_size),
+            "max_chunks_per_run": str(self.max_chunks_per_run),
+            "pipeline_depth": str(self.pipeline_depth),
+            "adaptive_chunking": str(self.adaptive_chunking).lower(),
+            "min_chunk_size": str(self.min_chunk_size),
+            "max_chunk_size": str(self.max_chunk_size),
+            "run_time_budget_seconds": str(self.run_time_budget_seconds),
+            "file_source": self.file_source if self.endpoint_type == 'file' else None,
+        }
+        return {key: value for key, value in tags.items() if value is not None}
@@ -0,0 +1,78 @@
+"""
+Declarative connectors for the database endpoint types.
+
+A SourceConnector states once, per ingest_control endpoint_type, everything
+the shared ingest engine in assets.py needs: the Supabase table its rows
+land in, the columns its source yields (the keyset cursor column first,
+then the timestamp and the channels), and the resource that reads it. The
+fetch strategy itself (keyset pagination on the cursor column, binary COPY
+for PostgreSQL, numeric casts for MySQL) is that resource's get_max_id,
+stream_measurements and stream_measurement_batches.
+
+The ingest, backfill and rollup assets, the backfill partitions and jobs,
+and the sensor's routing are all generated from CONNECTORS. Adding a
+database source type is a resource with those three methods plus one entry
+here.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .resources import MYSQL_MEASUREMENT_COLUMNS, POSTGRES_MEASUREMENT_COLUMNS
+
+
+@dataclass(frozen=True)
+class SourceConnector:
+    """How one database endpoint type is read, and where its rows go"""
+
+    endpoint_type: str
+    # Human-readable source name for logs and asset descriptions
+    label: str
+    table: str
+    source_columns: Tuple[str, ...]
+    resource_key: str
+    # sensor_rollups asset refreshed after each ingest run, if the table is rolled up
+    rollup_asset_name: Optional[str] = None
+
+    @property
+    def cursor_column(self) -> str:
+        return self.source_columns[0]
+
+    @property
+    def channels(self) -> Tuple[str, ...]:
+        return self.source_columns[2:]
+
+    @property
+    def ingest_asset_name(self) -> str:
+        return f"ingest_{self.endpoint_type}_data"
+
+    @property
+    def backfill_asset_name(self) -> str:
+        return f"backfill_{self.endpoint_type}_data"
+
+    @property
+    def backfill_job_name(self) -> str:
+        return f"{self.endpoint_type}_backfill_job"
+
+    @property
+    def backfill_partitions_name(self) -> str:
+        return f"{self.endpoint_type}_backfill"
+
+
+CONNECTORS = {
+    'mysql': SourceConnector(
+        endpoint_type='mysql',
+        label='MySQL',
+        table='accelerometer_data',
+        source_columns=MYSQL_MEASUREMENT_COLUMNS,
+        resource_key='mysql_endpoint',
+        rollup_asset_name='accelerometer_rollups',
+    ),
+    'postgres': SourceConnector(
+        endpoint_type='postgres',
+        label='PostgreSQL',
+        table='accel_mag_data',
+        source_columns=POSTGRES_MEASUREMENT_COLUMNS,
+        resource_key='postgres_endpoint',
+        rollup_asset_name='accel_mag_rollups',
+    ),
+}
@@ -0,0 +1,189 @@
+"""
+Event-driven discovery of completed file endpoint folders.
+
+With INGEST_FILE_DISCOVERY=events, ``python -m dagster_etl.file_events``
+(the file-watcher service) watches FILE_DATA_DIR with inotify through
+watchdog instead of the sensor listing it every tick. The data root is
+watched non-recursively for new YYYYMMDD_HHMMSS folders; each new folder
+gets a watch of its own until it is complete, so the number of inotify
+watches is the number of folders still being written, not the size of the
+tree.
+
+A folder is complete once it holds its measurement XML, its KMZ and at
+least FILE_EVENT_MIN_IMAGES images, and nothing in it has changed for
+FILE_EVENT_QUIET_SECONDS. Completeness is checked by listing the folder,
+so files written before its watch was added are still seen. A folder that
+stays incomplete is reported anyway after FILE_EVENT_MAX_WAIT_SECONDS.
+Completed folders are appended to the file_events table under the
+endpoint's name (FILE_EVENT_ENDPOINT, its ingest_control name), which
+file_event_sensor reads from its cursor to start that endpoint's
+ingest_file_data runs. Run one watcher per local file endpoint.
+"""
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from .filesystem import FOLDER_NAME_PATTERN, IMAGE_SUFFIXES
+
+FILE_DATA_DIR = os.getenv("FILE_DATA_DIR", "/data")
+FILE_EVENT_ENDPOINT = os.getenv("FILE_EVENT_ENDPOINT", "File-based Camera System")
+QUIET_SECONDS = float(os.getenv("FILE_EVENT_QUIET_SECONDS", "1.0"))
+MAX_WAIT_SECONDS = float(os.getenv("FILE_EVENT_MAX_WAIT_SECONDS", "60"))
+MIN_IMAGES = int(os.getenv("FILE_EVENT_MIN_IMAGES", "2"))
+RETRY_SECONDS = 10.0
+
+
+class FolderDebouncer:
+    """Tracks folders being written and reports those that have gone quiet"""
+
+    def __init__(self, quiet_seconds: float = QUIET_SECONDS):
+        self.quiet_seconds = quiet_seconds
+        # Folder name -> (first seen, last changed), monotonic seconds
+        self.pending: Dict[str, Tuple[float, float]] = {}
+
+    def touch(self, name: str, now: float = None):
+        now = time.monotonic() if now is None else now
+        first, _last = self.pending.get(name, (now, now))
+        self.pending[name] = (first, now)
+
+    def due(self, now: float = None) -> List[Tuple[str, float]]:
+        """(name, seconds since first seen) of folders unchanged for quiet_seconds, oldest name first"""
+        now = time.monotonic() if now is None else now
+        return sorted(
+            (name, now - first) for name, (first, last) in self.pending.items()
+            if now - last >= self.quiet_seconds
+        )
+
+    def timeout(self, now: float = None) -> float:
+        """Seconds until the next folder may be due (quiet_seconds if none is pending)"""
+        now = time.monotonic() if now is None else now
+        if not self.pending:
+            return self.quiet_seconds
+        return max(0.0, min(last for _first, last in self.pending.values()) + self.quiet_seconds - now)
+
+    def forget(self, name: str):
+        self.pending.pop(name, None)
+
+
+def folder_complete(path: str, min_images: int = MIN_IMAGES) -> bool:
+    """Whether a folder holds an XML, a KMZ and at least min_images images"""
+    xml = kmz = False
+    images = 0
+    try:
+        with os.scandir(path) as files:
+            for file in files:
+                suffix = os.path.splitext(file.name)[1].lower()
+                xml = xml or suffix == '.xml'
+                kmz = kmz or suffix == '.kmz'
+                images += suffix in IMAGE_SUFFIXES
+    except FileNotFoundError:
+        return False
+    return xml and kmz and images >= min_images
+
+
+class FolderWatcher:
+    """Watches a data root and appends completed folders to file_events"""
+
+    def __init__(self, supabase, endpoint_name: str = FILE_EVENT_ENDPOINT, data_dir: str = FILE_DATA_DIR, log=None):
+        self.supabase = supabase
+        self.endpoint_name = endpoint_name
+        self.data_dir = os.path.abspath(data_dir)
+        self.log = log or logging.getLogger("dagster_etl.file_events")
+        self.debouncer = FolderDebouncer()
+        self.reported = 0
+        self._events = queue.Queue()
+        self._watches = {}
+        # Completed folders not yet written to file_events (Supabase was unreachable)
+        self._unsent: List[str] = []
+        self._retry_at = 0.0
+
+    def run(self, stop: threading.Event):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        events = self._events
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                events.put(event)
+
+        self._handler = Handler()
+        self._observer = Observer()
+        self._observer.schedule(self._handler, self.data_dir, recursive=False)
+        self._observer.start()
+        self.log.info(f"Watching {self.data_dir} for completed folders of {self.endpoint_name}")
+        try:
+            while not stop.is_set():
+                try:
+                    self._handle(self._events.get(timeout=min(self.debouncer.timeout(), 1.0)))
+                    while True:
+                        self._handle(self._events.get_nowait())
+                except queue.Empty:
+                    pass
+                self._complete_due()
+                if self._unsent and time.monotonic() >= self._retry_at:
+                    self._report()
+        finally:
+            self._observer.stop()
+            self._observer.join()
+
+    def _handle(self, event):
+        relative = os.path.relpath(event.src_path, self.data_dir)
+        name = relative.split(os.sep, 1)[0]
+        if not FOLDER_NAME_PATTERN.match(name):
+            return
+        if relative == name and event.is_directory and event.event_type == 'created' and name not in self._watches:
+            # A new folder: watch it until it is complete
+            path = os.path.join(self.data_dir, name)
+            self._watches[name] = self._observer.schedule(self._handler, path, recursive=False)
+        if name in self._watches:
+            self.debouncer.touch(name)
+
+    def _complete_due(self):
+        for name, waited in self.debouncer.due():
+            complete = folder_complete(os.path.join(self.data_dir, name))
+            if not complete and waited < MAX_WAIT_SECONDS:
+                # Quiet but incomplete: keep waiting for the remaining files
+                self.debouncer.touch(name)
+                continue
+            if not complete:
+                self.log.warning(f"Folder {name} still incomplete after {waited:.0f}s; reporting it anyway")
+            self.debouncer.forget(name)
+            watch = self._watches.pop(name, None)
+            if watch is not None:
+                self._observer.unschedule(watch)
+            self._unsent.append(name)
+
+    def _report(self):
+        try:
+            self.supabase.execute_query(
+                f"INSERT INTO file_events (endpoint_name, folder_name) VALUES {', '.join(['(%s, %s)'] * len(self._unsent))}",
+                tuple(value for name in self._unsent for value in (self.endpoint_name, name))
+            )
+        except Exception as e:
+            self.log.warning(f"Could not record {len(self._unsent)} completed folder(s), retrying in {RETRY_SECONDS:.0f}s: {e}")
+            self._retry_at = time.monotonic() + RETRY_SECONDS
+            return
+        self.reported += len(self._unsent)
+        self.log.info(f"Completed folder(s): {', '.join(self._unsent)}")
+        self._unsent = []
+
+
+def main():
+    """Entry point of the file-watcher service"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # The resource instances (and environment) the Dagster definitions are built with
+    from . import RESOURCES
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    FolderWatcher(RESOURCES["supabase"]).run(stop)
+
+
+if __name__ == '__main__':
+    main()
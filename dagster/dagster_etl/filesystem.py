@@ -0,0 +1,171 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+# Folders written by the file endpoint are named YYYYMMDD_HHMMSS, so name order is time order
+FOLDER_NAME_PATTERN = re.compile(r'^\d{8}_\d{6}$')
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+
+# file_metadata columns filled by extract_folder, in insert order
+EXTRACTED_COLUMNS = [
+    'xml_file', 'kmz_file', 'image_count',
+    'measured_at', 'latitude', 'longitude', 'altitude',
+    'kml_latitude', 'kml_longitude', 'kml_altitude',
+]
+
+
+def scan_new_folders(data_dir: str, after: Optional[str] = None, settle_seconds: float = 2.0) -> List[os.DirEntry]:
+    """
+    Timestamp-named folders newer than ``after``, oldest first.
+
+    Entries are filtered on their name before anything else, so folders at or
+    below the high-water mark cost one string comparison and no stat call.
+    Scanning stops before the first folder modified within the last
+    ``settle_seconds``, which may still be being written, so the high-water
+    mark never moves past a half-written folder.
+    """
+    with os.scandir(data_dir) as entries:
+        candidates = [
+            entry for entry in entries
+            if FOLDER_NAME_PATTERN.match(entry.name)
+            and (after is None or entry.name > after)
+            and entry.is_dir()
+        ]
+    candidates.sort(key=lambda entry: entry.name)
+    return _settled(candidates, settle_seconds)
+
+
+def scan_all_folders(data_dir: str, settle_seconds: float = 2.0) -> List[os.DirEntry]:
+    """Every non-hidden folder under data_dir, oldest name first (used for reconciliation sweeps)"""
+    with os.scandir(data_dir) as entries:
+        folders = [entry for entry in entries if not entry.name.startswith('.') and entry.is_dir()]
+    folders.sort(key=lambda entry: entry.name)
+    return [entry for entry in folders if _is_settled(entry, settle_seconds)]
+
+
+class NamedFolder:
+    """A folder under data_dir known by name, usable where scan results' os.DirEntry objects are"""
+
+    __slots__ = ('name', 'path')
+
+    def __init__(self, data_dir: str, name: str):
+        self.name = name
+        self.path = os.path.join(data_dir, name)
+
+    def stat(self) -> os.stat_result:
+        return os.stat(self.path)
+
+
+def named_folders(data_dir: str, names: Iterable[str]) -> List[NamedFolder]:
+    """The given folders that exist under data_dir, oldest name first, without listing data_dir"""
+    folders = [NamedFolder(data_dir, name) for name in sorted(set(names))]
+    return [folder for folder in folders if os.path.isdir(folder.path)]
+
+
+def newest_timestamp_folder(names: Iterable[str]) -> Optional[str]:
+    """Highest timestamp-named folder among names, or None"""
+    return max((name for name in names if FOLDER_NAME_PATTERN.match(name)), default=None)
+
+
+def extract_folder(path: str) -> dict:
+    """
+    List one folder and parse its measurement XML and KMZ location.
+
+    Returns a dict keyed by EXTRACTED_COLUMNS plus ``errors``, a list of
+    files that could not be parsed (their columns are left as None).
+    """
+    import xml.etree.ElementTree as ET
+    import zipfile
+
+    record = dict.fromkeys(EXTRACTED_COLUMNS)
+    record['image_count'] = 0
+    record['errors'] = []
+
+    with os.scandir(path) as files:
+        for file in files:
+            suffix = os.path.splitext(file.name)[1].lower()
+            if suffix == '.xml':
+                record['xml_file'] = file.name
+            elif suffix == '.kmz':
+                record['kmz_file'] = file.name
+            elif suffix in IMAGE_SUFFIXES:
+                record['image_count'] += 1
+
+    if record['xml_file']:
+        try:
+            record.update(parse_measurement_xml(os.path.join(path, record['xml_file'])))
+        except (ET.ParseError, ValueError, OSError) as e:
+            record['errors'].append(f"{record['xml_file']}: {e}")
+
+    if record['kmz_file']:
+        try:
+            record.update(parse_kmz_location(os.path.join(path, record['kmz_file'])))
+        except (ET.ParseError, ValueError, OSError, zipfile.BadZipFile) as e:
+            record['errors'].append(f"{record['kmz_file']}: {e}")
+
+    return record
+
+
+def extract_folders(paths: List[str], max_workers: int = 8) -> List[dict]:
+    """Run extract_folder over many folders concurrently, preserving input order"""
+    if max_workers <= 1 or len(paths) <= 1:
+        return [extract_folder(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extract_folder") as pool:
+        return list(pool.map(extract_folder, paths))
+
+
+def parse_measurement_xml(path: str) -> dict:
+    """Read timestamp, latitude, longitude and altitude from a measurement.xml"""
+    import xml.etree.ElementTree as ET
+
+    root = ET.parse(path).getroot()
+    timestamp = root.findtext('timestamp')
+    return {
+        'measured_at': datetime.fromisoformat(timestamp) if timestamp else None,
+        'latitude': _float(root.findtext('latitude')),
+        'longitude': _float(root.findtext('longitude')),
+        'altitude': _float(root.findtext('altitude')),
+    }
+
+
+def parse_kmz_location(path: str) -> dict:
+    """Read the first Placemark point (lon,lat[,alt]) from the KML inside a KMZ"""
+    import xml.etree.ElementTree as ET
+    import zipfile
+
+    with zipfile.ZipFile(path) as kmz:
+        kml_name = next((name for name in kmz.namelist() if name.lower().endswith('.kml')), None)
+        if kml_name is None:
+            raise ValueError("no .kml document in archive")
+        root = ET.fromstring(kmz.read(kml_name))
+
+    # Match on the local name so any KML namespace version works
+    coordinates = next((el.text for el in root.iter() if el.tag.rsplit('}', 1)[-1] == 'coordinates'), None)
+    if not coordinates:
+        raise ValueError("no coordinates element")
+    parts = coordinates.strip().split()[0].split(',')
+    return {
+        'kml_longitude': float(parts[0]),
+        'kml_latitude': float(parts[1]),
+        'kml_altitude': float(parts[2]) if len(parts) > 2 else None,
+    }
+
+
+def _float(text: Optional[str]) -> Optional[float]:
+    return float(text) if text not in (None, '') else None
+
+
+def _settled(entries: List[os.DirEntry], settle_seconds: float) -> List[os.DirEntry]:
+    for index, entry in enumerate(entries):
+        if not _is_settled(entry, settle_seconds):
+            return entries[:index]
+    return entries
+
+
+def _is_settled(entry: os.DirEntry, settle_seconds: float) -> bool:
+    # DirEntry caches its stat result, so repeated checks don't hit the filesystem again
+    return time.time() - entry.stat().st_mtime >= settle_seconds
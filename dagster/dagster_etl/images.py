@@ -0,0 +1,165 @@
+"""
+Content hashes and thumbnails of file endpoint images.
+
+Every image in an ingested folder is hashed (SHA-256 of its bytes), so
+identical captures are recognised across folders and endpoints, and gets a
+JPEG thumbnail stored content-addressed as
+INGEST_THUMBNAIL_DIR/<hash[:2]>/<hash>.jpg: all copies of an image share one
+thumbnail, which is generated once. Results go to the file_images table,
+which doubles as the hash cache: an image whose size and mtime match its row
+is not read again, unless its thumbnail could not be made.
+
+Hashing and thumbnailing are CPU-bound, so both run in a process pool.
+Pillow is imported inside the workers only.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from .filesystem import IMAGE_SUFFIXES
+
+FILE_DATA_DIR = os.getenv("FILE_DATA_DIR", "/data")
+# A dot directory, so folder scans of FILE_DATA_DIR never see it
+THUMBNAIL_DIR = os.getenv("INGEST_THUMBNAIL_DIR", os.path.join(FILE_DATA_DIR, ".thumbnails"))
+THUMBNAIL_SIZE = int(os.getenv("INGEST_THUMBNAIL_SIZE", "160"))
+THUMBNAIL_QUALITY = int(os.getenv("INGEST_THUMBNAIL_QUALITY", "80"))
+# 0 = one worker per CPU
+IMAGE_WORKERS = int(os.getenv("INGEST_IMAGE_WORKERS", "0")) or os.cpu_count() or 1
+
+# file_images columns, in insert order
+IMAGE_COLUMNS = [
+    'endpoint_name', 'folder_path', 'file_name', 'file_size', 'file_mtime_ns',
+    'content_hash', 'width', 'height', 'thumbnail_path',
+]
+
+HASH_READ_SIZE = 1024 * 1024
+
+
+def list_images(folder_path: str) -> List[Tuple[str, int, int]]:
+    """(file name, size, mtime in ns) of the images in a folder, by name"""
+    try:
+        with os.scandir(folder_path) as files:
+            images = [
+                (file.name, stat.st_size, stat.st_mtime_ns)
+                for file in files
+                if os.path.splitext(file.name)[1].lower() in IMAGE_SUFFIXES
+                for stat in (file.stat(),)
+            ]
+    except FileNotFoundError:
+        return []
+    return sorted(images)
+
+
+def hash_file(path: str) -> Optional[str]:
+    """Hex SHA-256 of a file's contents, or None if it has gone"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(HASH_READ_SIZE):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def thumbnail_path(content_hash: str, thumbnail_dir: str = THUMBNAIL_DIR) -> str:
+    return os.path.join(thumbnail_dir, content_hash[:2], f"{content_hash}.jpg")
+
+
+def make_thumbnail(task: Tuple[str, str, str]) -> dict:
+    """
+    Write the thumbnail of one image, given (source path, content hash, thumbnail dir).
+
+    Returns the image's width and height and the thumbnail's path, or an
+    error message if the image could not be decoded. An existing thumbnail
+    (written by an earlier run) is kept.
+    """
+    from PIL import Image
+
+    source, content_hash, thumbnail_dir = task
+    target = thumbnail_path(content_hash, thumbnail_dir)
+    try:
+        with Image.open(source) as image:
+            width, height = image.size
+            if not os.path.exists(target):
+                # JPEG decoders scale down by up to 8x while decoding
+                image.draft('RGB', (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                thumbnail = image.convert('RGB')
+                thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # Write aside and rename, so a thumbnail is never seen half-written
+                partial = f"{target}.{os.getpid()}.tmp"
+                thumbnail.save(partial, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+                os.replace(partial, target)
+    except Exception as e:
+        return {"thumbnail_path": None, "width": None, "height": None, "error": str(e)}
+    return {"thumbnail_path": target, "width": width, "height": height, "error": None}
+
+
+def process_images(supabase, endpoint_name: str, folder_paths: List[str], log,
+                   max_workers: int = IMAGE_WORKERS, thumbnail_dir: str = THUMBNAIL_DIR) -> dict:
+    """
+    Hash and thumbnail the new or changed images of an endpoint's folders and record them in file_images.
+
+    Images whose size and mtime match their file_images row are skipped
+    without being read, unless that row has no thumbnail. Hashes that already have a thumbnail (from any
+    folder or endpoint) reuse it, and each remaining hash is thumbnailed
+    from its first image only. Duplicates counts images sharing a hash with
+    another image of this run.
+    """
+    stats = {"images": 0, "cached": 0, "hashed": 0, "duplicates": 0, "thumbnailed": 0, "failed": 0}
+    if not folder_paths:
+        return stats
+
+    cached = supabase.get_image_records(endpoint_name, folder_paths)
+    images, changed = 0, []
+    for folder_path in folder_paths:
+        for file_name, size, mtime_ns in list_images(folder_path):
+            images += 1
+            if cached.get((folder_path, file_name)) != (size, mtime_ns):
+                changed.append((folder_path, file_name, size, mtime_ns))
+
+    stats.update(images=images, cached=images - len(changed))
+    if not changed:
+        return stats
+
+    paths = [os.path.join(folder_path, file_name) for folder_path, file_name, _size, _mtime in changed]
+    # A single image is not worth starting worker processes for
+    pool = ProcessPoolExecutor(min(max_workers, len(changed))) if max_workers > 1 and len(changed) > 1 else None
+    pool_map = pool.map if pool else map
+    try:
+        digests = list(pool_map(hash_file, paths))
+        known = supabase.get_thumbnails({digest for digest in digests if digest})
+
+        # One thumbnail per hash not seen before, made from its first image
+        first_paths = {}
+        for path, digest in zip(paths, digests):
+            if digest and digest not in known:
+                first_paths.setdefault(digest, path)
+        tasks = [(path, digest, thumbnail_dir) for digest, path in first_paths.items()]
+        for (path, digest, _dir), thumbnail in zip(tasks, pool_map(make_thumbnail, tasks)):
+            if thumbnail["error"]:
+                log.warning(f"Could not make a thumbnail of {path}: {thumbnail['error']}")
+                stats["failed"] += 1
+            else:
+                stats["thumbnailed"] += 1
+            known[digest] = thumbnail
+    finally:
+        if pool:
+            pool.shutdown()
+
+    values = []
+    for (folder_path, file_name, size, mtime_ns), digest in zip(changed, digests):
+        if digest is None:
+            continue  # Deleted since the folder was listed
+        thumbnail = known[digest]
+        values.append((
+            endpoint_name, folder_path, file_name, size, mtime_ns,
+            digest, thumbnail["width"], thumbnail["height"], thumbnail["thumbnail_path"],
+        ))
+    supabase.save_image_records(values)
+
+    stats["hashed"] = len(values)
+    stats["duplicates"] = len(values) - len({digest for digest in digests if digest})
+    return stats
@@ -1,9 +1,25 @@
 from dagster import define_asset_job, AssetSelection
-from .assets import ingest_mysql_data, ingest_postgres_data, ingest_file_data
+from .assets import BACKFILL_ASSETS, INGEST_ASSETS, ROLLUP_ASSETS, file_images, ingest_async_data, ingest_file_data
+from .backfill import BACKFILL_PARTITIONS
+from .connectors import CONNECTORS
 
-# Define the ETL job that can run any of the ingestion assets
+# Define the ETL job that can run any of the ingestion assets; the sensors' runs select from it
 etl_job = define_asset_job(
     name="etl_job",
-    selection=AssetSelection.assets(ingest_mysql_data, ingest_postgres_data, ingest_file_data),
+    selection=AssetSelection.assets(
+        *INGEST_ASSETS.values(), ingest_file_data, file_images, ingest_async_data, *ROLLUP_ASSETS.values()
+    ),
     description="ETL job for ingesting data from various endpoints to Supabase"
 )
+
+# Partitioned backfill jobs, one per connector; each run loads one planned source id range
+BACKFILL_JOBS = {
+    endpoint_type: define_asset_job(
+        name=connector.backfill_job_name,
+        selection=AssetSelection.assets(BACKFILL_ASSETS[endpoint_type]),
+        partitions_def=BACKFILL_PARTITIONS[endpoint_type],
+        tags={"ingest_backfill": endpoint_type},
+        description=f"Backfill one source id range of a {connector.label} endpoint"
+    )
+    for endpoint_type, connector in CONNECTORS.items()
+}
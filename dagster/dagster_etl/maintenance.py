@@ -0,0 +1,48 @@
+from dagster import op, job, ScheduleDefinition, DefaultScheduleStatus, OpExecutionContext
+from .partitions import PARTITION_INTERVALS, PARTITIONED_TABLES
+from .resources import SupabaseResource
+import os
+
+# Partition layout of the raw sensor tables: one partition per INGEST_PARTITION_INTERVAL
+# ('day', 'week' or 'month'), created INGEST_PARTITION_PREMAKE intervals ahead; partitions
+# older than INGEST_RETENTION_DAYS are dropped (0 keeps raw data forever; rollups are kept)
+PARTITION_INTERVAL = os.getenv("INGEST_PARTITION_INTERVAL", "month")
+PARTITION_PREMAKE = int(os.getenv("INGEST_PARTITION_PREMAKE", "2"))
+RETENTION_DAYS = int(os.getenv("INGEST_RETENTION_DAYS", "0"))
+
+
+@op
+def maintain_storage_partitions(context: OpExecutionContext, supabase: SupabaseResource) -> dict:
+    """
+    Create upcoming time partitions, move default-partition rows into partitions, and drop expired ones
+    """
+    if PARTITION_INTERVAL not in PARTITION_INTERVALS:
+        raise ValueError(f"INGEST_PARTITION_INTERVAL must be one of {PARTITION_INTERVALS}, got {PARTITION_INTERVAL!r}")
+
+    results = {}
+    for table in PARTITIONED_TABLES:
+        result = supabase.maintain_partitions(
+            table, interval=PARTITION_INTERVAL, premake=PARTITION_PREMAKE, retention_days=RETENTION_DAYS
+        )
+        if result["created"]:
+            context.log.info(
+                f"{table}: created {len(result['created'])} {PARTITION_INTERVAL} partition(s) "
+                f"({', '.join(result['created'])}), moved {result['moved_rows']} rows out of the default partition"
+            )
+        if result["dropped"]:
+            context.log.info(f"{table}: dropped expired partitions {', '.join(result['dropped'])}")
+        results[table] = result
+    return results
+
+
+@job(description="Create, fill and retire the time partitions of the raw sensor tables")
+def storage_maintenance_job():
+    maintain_storage_partitions()
+
+
+# Hourly, so backfilled history moves out of the default partition soon after it lands
+storage_maintenance_schedule = ScheduleDefinition(
+    job=storage_maintenance_job,
+    cron_schedule="15 * * * *",
+    default_status=DefaultScheduleStatus.RUNNING,
+)
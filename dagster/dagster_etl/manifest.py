@@ -0,0 +1,91 @@
+"""
+Client for the file endpoint's /manifest API, used by file endpoints with
+file_source = 'remote'.
+
+One GET returns every settled folder created after a cursor (the newest
+folder already ingested), with its file names and sizes, image count and
+parsed XML and KMZ fields, streamed as gzip-compressed NDJSON. A remote
+camera system's folder metadata therefore syncs in one round trip per
+page, instead of one request per directory listing and file. Pages carry a
+weak ETag, so the sensor's change check costs a 304 while nothing is new.
+"""
+import http.client
+import json
+import os
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator, List, Optional
+from urllib.parse import urlencode
+
+from .filesystem import EXTRACTED_COLUMNS
+
+MANIFEST_TIMEOUT = float(os.getenv("INGEST_MANIFEST_TIMEOUT", "30"))
+
+
+@dataclass
+class ManifestPage:
+    """One /manifest response"""
+
+    folders: List[dict] = field(default_factory=list)
+    # The `after` for the next page: the newest folder listed (or the request's own cursor)
+    cursor: Optional[str] = None
+    more: bool = False
+    etag: Optional[str] = None
+    not_modified: bool = False
+
+
+def fetch_manifest(host: str, port: int, after: Optional[str] = None, limit: int = 1000,
+                   etag: Optional[str] = None, timeout: float = MANIFEST_TIMEOUT) -> ManifestPage:
+    """Fetch one manifest page of the folders named after ``after``, oldest first"""
+    params = {'limit': limit}
+    if after:
+        params['after'] = after
+    headers = {'Accept-Encoding': 'gzip'}
+    if etag:
+        headers['If-None-Match'] = etag
+
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('GET', f"/manifest?{urlencode(params)}", headers=headers)
+        response = conn.getresponse()
+        page = ManifestPage(
+            cursor=response.getheader('X-Manifest-Cursor') or after,
+            more=response.getheader('X-Manifest-More') == 'true',
+            etag=response.getheader('ETag'),
+        )
+        if response.status == 304:
+            page.not_modified = True
+            return page
+        if response.status != 200:
+            raise RuntimeError(f"GET /manifest from {host}:{port} returned {response.status} {response.reason}")
+        page.folders = [json.loads(line) for line in _lines(response) if line.strip()]
+        return page
+    finally:
+        conn.close()
+
+
+def manifest_record(folder: dict) -> dict:
+    """A manifest entry as the EXTRACTED_COLUMNS dict extract_folder returns for local folders"""
+    record = {column: folder.get(column) for column in EXTRACTED_COLUMNS}
+    record['image_count'] = record['image_count'] or 0
+    if record['measured_at']:
+        record['measured_at'] = datetime.fromisoformat(record['measured_at'])
+    record['errors'] = folder.get('errors', [])
+    return record
+
+
+def _lines(response) -> Iterator[bytes]:
+    """NDJSON lines of a (possibly gzipped) response body, decoded as it streams in"""
+    decoder = zlib.decompressobj(31) if response.getheader('Content-Encoding') == 'gzip' else None
+    buffer = b''
+    while True:
+        data = response.read(64 * 1024)
+        if not data:
+            break
+        buffer += decoder.decompress(data) if decoder else data
+        *lines, buffer = buffer.split(b'\n')
+        yield from lines
+    if decoder:
+        buffer += decoder.flush()
+    yield from buffer.split(b'\n')
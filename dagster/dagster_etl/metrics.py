@@ -0,0 +1,273 @@
+"""
+Per-chunk instrumentation for the ingest hot path.
+
+An IngestMetrics collects, for one endpoint in one run, where the time went:
+connection setup on the source (``connect``) and sink (``checkout``), the
+source query and fetches (folder scan and extraction for the file endpoint),
+time the loader sat waiting on the prefetch queue, and the sink load and
+commit. The totals are attached to the asset materialization as metadata,
+and can also be exported in Prometheus text format from a local HTTP
+endpoint (INGEST_METRICS_PORT) or written for the node_exporter textfile
+collector (INGEST_METRICS_TEXTFILE_DIR).
+"""
+import os
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+METRICS_PORT = os.getenv("INGEST_METRICS_PORT")
+METRICS_TEXTFILE_DIR = os.getenv("INGEST_METRICS_TEXTFILE_DIR")
+
+# Phases grouped by what a slow run is waiting on
+PHASE_GROUPS = {
+    "connection_setup": ("connect", "checkout"),
+    "source": ("query", "scan", "fetch"),
+    "sink": ("load", "commit"),
+}
+
+# Only the most recent chunks are kept in materialization metadata
+MAX_CHUNKS_IN_METADATA = 100
+
+
+@dataclass
+class ChunkMetrics:
+    """Timings for one fetched-and-loaded chunk"""
+
+    chunk: int
+    rows: int
+    bytes: int
+    seconds: float
+    fetch_seconds: float
+    queue_wait_seconds: float
+    checkout_seconds: float
+    load_seconds: float
+    commit_seconds: float
+    retries: int
+
+
+class IngestMetrics:
+    """
+    Timings for one endpoint's ingestion run.
+
+    The source stream calls ``record_fetch`` from whichever thread iterates
+    it (the prefetch thread when pipelining), and the loader calls
+    ``record_chunk`` once per committed chunk; fetches are matched to chunks
+    in order.
+    """
+
+    def __init__(self, endpoint_type: str, endpoint_name: str):
+        self.endpoint_type = endpoint_type
+        self.endpoint_name = endpoint_name
+        self.phases: Dict[str, float] = {}
+        self.chunks: List[ChunkMetrics] = []
+        self.rows = 0
+        self.bytes = 0
+        self.retries = 0
+        self._fetches = deque()
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        """Add seconds to a phase total"""
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, phase: str):
+        """Time a with-block into a phase total"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - started)
+
+    def record_fetch(self, seconds: float):
+        """Record one source fetch; called by the thread iterating the stream"""
+        self.add("fetch", seconds)
+        self._fetches.append(seconds)
+
+    def record_chunk(self, rows: int, batch_bytes: int, seconds: float, queue_wait_seconds: float = 0.0,
+                     sink: Optional[dict] = None) -> ChunkMetrics:
+        """Record a committed chunk; ``sink`` is the timings dict filled in by insert_batch"""
+        sink = sink or {}
+        fetch_seconds = self._fetches.popleft() if self._fetches else 0.0
+        self.add("queue_wait", queue_wait_seconds)
+        for phase in ("checkout", "load", "commit"):
+            self.add(phase, sink.get(f"{phase}_seconds", 0.0))
+
+        chunk = ChunkMetrics(
+            chunk=len(self.chunks) + 1,
+            rows=rows,
+            bytes=batch_bytes,
+            seconds=seconds,
+            fetch_seconds=fetch_seconds,
+            queue_wait_seconds=queue_wait_seconds,
+            checkout_seconds=sink.get("checkout_seconds", 0.0),
+            load_seconds=sink.get("load_seconds", 0.0),
+            commit_seconds=sink.get("commit_seconds", 0.0),
+            retries=sink.get("retries", 0),
+        )
+        self.chunks.append(chunk)
+        self.rows += rows
+        self.bytes += batch_bytes
+        self.retries += chunk.retries
+        return chunk
+
+    def bottleneck(self) -> Optional[str]:
+        """The phase group (connection_setup, source or sink) that took the most time"""
+        totals = {
+            group: sum(self.phases.get(phase, 0.0) for phase in phases)
+            for group, phases in PHASE_GROUPS.items()
+        }
+        group, seconds = max(totals.items(), key=lambda item: item[1])
+        return group if seconds > 0 else None
+
+    def summary(self) -> dict:
+        """Run totals as plain values"""
+        latencies = sorted(chunk.seconds for chunk in self.chunks)
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            p50, p95 = quantiles[49], quantiles[94]
+        else:
+            p50 = p95 = latencies[0] if latencies else 0.0
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "chunks": len(self.chunks),
+            "retries": self.retries,
+            **{f"{phase}_seconds": round(seconds, 4) for phase, seconds in sorted(self.phases.items())},
+            "chunk_p50_ms": round(p50 * 1000, 2),
+            "chunk_p95_ms": round(p95 * 1000, 2),
+            "bottleneck": self.bottleneck(),
+        }
+
+    def to_metadata(self) -> dict:
+        """Materialization metadata: the summary plus the most recent per-chunk records"""
+        metadata = {f"metrics/{key}": value for key, value in self.summary().items() if value is not None}
+        metadata["metrics/recent_chunks"] = [
+            {key: round(value, 4) if isinstance(value, float) else value for key, value in asdict(chunk).items()}
+            for chunk in self.chunks[-MAX_CHUNKS_IN_METADATA:]
+        ]
+        return metadata
+
+    def publish(self):
+        """Add this run to the process-wide Prometheus registry"""
+        labels = (("endpoint_type", self.endpoint_type), ("endpoint", self.endpoint_name))
+        with _registry_lock:
+            _inc("ingest_rows_total", labels, self.rows)
+            _inc("ingest_bytes_total", labels, self.bytes)
+            _inc("ingest_chunks_total", labels, len(self.chunks))
+            _inc("ingest_retries_total", labels, self.retries)
+            for phase, seconds in self.phases.items():
+                _inc("ingest_phase_seconds_total", labels + (("phase", phase),), seconds)
+                _registry[("ingest_last_run_phase_seconds", labels + (("phase", phase),))] = seconds
+            _registry[("ingest_last_run_rows", labels)] = self.rows
+            _registry[("ingest_last_run_timestamp_seconds", labels)] = time.time()
+
+
+def timed(metrics: Optional[IngestMetrics], phase: str):
+    """metrics.timer(phase), or a no-op when there is no metrics object"""
+    return metrics.timer(phase) if metrics is not None else nullcontext()
+
+
+# Process-wide registry rendered in Prometheus text format
+
+_METRIC_TYPES = {
+    "ingest_rows_total": ("counter", "Rows loaded into Supabase"),
+    "ingest_bytes_total": ("counter", "Approximate in-memory bytes of the loaded chunks"),
+    "ingest_chunks_total": ("counter", "Chunks committed"),
+    "ingest_retries_total": ("counter", "Dead pooled connections replaced and COPY fallbacks"),
+    "ingest_phase_seconds_total": ("counter", "Seconds spent per ingest phase"),
+    "ingest_last_run_phase_seconds": ("gauge", "Seconds spent per ingest phase in the last run"),
+    "ingest_last_run_rows": ("gauge", "Rows loaded by the last run"),
+    "ingest_last_run_timestamp_seconds": ("gauge", "Unix time the last run finished"),
+}
+
+_registry: Dict[Tuple[str, tuple], float] = {}
+_registry_lock = threading.Lock()
+_server = None
+
+
+def _inc(name: str, labels: tuple, value: float):
+    _registry[(name, labels)] = _registry.get((name, labels), 0) + value
+
+
+def render_prometheus(endpoint_name: Optional[str] = None) -> str:
+    """The registry in Prometheus text format, optionally limited to one endpoint"""
+    with _registry_lock:
+        samples = sorted(_registry.items())
+    lines = []
+    current = None
+    for (name, labels), value in samples:
+        if endpoint_name is not None and dict(labels).get("endpoint") != endpoint_name:
+            continue
+        if name != current:
+            kind, help_text = _METRIC_TYPES[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            current = name
+        label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+        lines.append(f"{name}{{{label_text}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def start_metrics_server(port: int):
+    """Serve /metrics on a daemon thread; only the first call in a process starts it"""
+    # http.server is only imported by the processes that actually serve metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    global _server
+    with _registry_lock:
+        if _server is not None:
+            return _server
+        _server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name="ingest_metrics", daemon=True).start()
+    return _server
+
+
+def write_textfile(directory: str, metrics: IngestMetrics) -> str:
+    """Atomically write one endpoint's series to <directory>/ingest_<type>_<name>.prom"""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", metrics.endpoint_name)
+    path = os.path.join(directory, f"ingest_{metrics.endpoint_type}_{slug}.prom")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus(metrics.endpoint_name))
+    os.replace(tmp_path, path)
+    return path
+
+
+def export(metrics: IngestMetrics, log=None):
+    """Publish a finished run and export it wherever the environment asks"""
+    metrics.publish()
+    try:
+        if METRICS_PORT:
+            start_metrics_server(int(METRICS_PORT))
+        if METRICS_TEXTFILE_DIR:
+            write_textfile(METRICS_TEXTFILE_DIR, metrics)
+    except OSError as e:
+        # Metrics export must never fail an ingestion run (e.g. port already taken by another run)
+        if log is not None:
+            log.warning(f"Could not export ingest metrics: {e}")
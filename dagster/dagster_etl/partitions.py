@@ -0,0 +1,156 @@
+"""
+Time partitions of the raw sensor tables.
+
+accelerometer_data and accel_mag_data are range-partitioned on timestamp,
+with a DEFAULT partition catching rows no partition covers yet (historical
+backfills, or data from before the first maintenance run). The storage
+maintenance job keeps partitions created ahead of the clock, splits rows out
+of the default partition into their own partitions, and drops partitions
+past the retention window. These helpers run inside the caller's transaction.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple
+
+# Raw tables stored as RANGE (timestamp) partitions; each has a <table>_default partition
+PARTITIONED_TABLES = ('accelerometer_data', 'accel_mag_data')
+
+# Unique indexes on a partitioned table must include the partition column, so a source
+# row reloaded with a changed timestamp would not conflict with its first copy. Upserts
+# into PARTITIONED_TABLES claim each row's (endpoint_name, source_id) here first instead
+SOURCE_KEY_TABLE = 'sensor_source_keys'
+
+PARTITION_INTERVALS = ('day', 'week', 'month')
+
+_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def interval_start(ts: datetime, interval: str) -> datetime:
+    """Start of the partition interval containing ts (weeks start on Monday, like date_trunc)"""
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'day':
+        return day
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown partition interval {interval!r}; expected one of {PARTITION_INTERVALS}")
+
+
+def next_start(start: datetime, interval: str) -> datetime:
+    """Start of the interval after the one beginning at start"""
+    if interval == 'day':
+        return start + timedelta(days=1)
+    if interval == 'week':
+        return start + timedelta(weeks=1)
+    if interval == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    raise ValueError(f"Unknown partition interval {interval!r}; expected one of {PARTITION_INTERVALS}")
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def default_partition(table: str) -> str:
+    return f"{table}_default"
+
+
+def list_partitions(cursor, table: str) -> List[Tuple[str, datetime, datetime]]:
+    """(name, start, end) of the table's range partitions, oldest first; the default partition is left out"""
+    cursor.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        """,
+        (table,)
+    )
+    partitions = []
+    for name, bound in cursor.fetchall():
+        match = _BOUND_PATTERN.search(bound)
+        if match:
+            partitions.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def default_partition_intervals(cursor, table: str, interval: str) -> List[datetime]:
+    """Starts of the intervals that have rows sitting in the default partition"""
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc(%s, timestamp) FROM {default_partition(table)} ORDER BY 1",
+        (interval,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(cursor, table: str, start: datetime, end: datetime) -> int:
+    """
+    Add the partition [start, end) and move any default-partition rows in that
+    range into it; returns the number of rows moved.
+
+    The partition is filled as a plain table and then attached, so its
+    indexes are built once over the moved rows instead of row by row.
+    """
+    name = partition_name(table, start)
+    default = default_partition(table)
+    # Attaching validates the default partition holds no rows in range; keep inserts out until then
+    cursor.execute(f"LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {default} WHERE timestamp >= %s AND timestamp < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        (start, end)
+    )
+    moved = cursor.rowcount
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+    return moved
+
+
+def drop_expired(cursor, table: str, cutoff: datetime) -> List[str]:
+    """Drop partitions that end at or before cutoff and purge older default-partition rows and source keys"""
+    dropped = []
+    # Source keys can only go where no row is left: a partition straddling the cutoff keeps all of its rows
+    purge_before = cutoff
+    for name, start, end in list_partitions(cursor, table):
+        if end <= cutoff:
+            cursor.execute(f"DROP TABLE {name}")
+            dropped.append(name)
+        else:
+            purge_before = min(purge_before, start)
+    cursor.execute(f"DELETE FROM {default_partition(table)} WHERE timestamp < %s", (cutoff,))
+    cursor.execute(
+        f"DELETE FROM {SOURCE_KEY_TABLE} WHERE source_table = %s AND timestamp < %s", (table, purge_before)
+    )
+    return dropped
+
+
+def source_key_merge_sql(staging: str, table: str, columns: Sequence[str], select: Sequence[str] = None) -> str:
+    """
+    INSERT ... SELECT moving staged rows into a partitioned table, once per (endpoint_name, source_id).
+
+    The staged rows' source keys are inserted into SOURCE_KEY_TABLE with ON
+    CONFLICT DO NOTHING in the same statement, and only the rows whose key
+    was new are moved. A row that is already loaded is skipped even if its
+    timestamp (and so its partition) has changed since. ``select`` gives
+    the expression for each column (default: the staged column itself).
+    """
+    select = list(select or columns)
+    return f"""
+        WITH claimed AS (
+            INSERT INTO {SOURCE_KEY_TABLE} (source_table, endpoint_name, source_id, timestamp)
+            SELECT DISTINCT ON (endpoint_name, source_id) '{table}', endpoint_name, source_id, timestamp
+            FROM {staging}
+            ORDER BY endpoint_name, source_id, timestamp
+            ON CONFLICT DO NOTHING
+            RETURNING endpoint_name, source_id, timestamp
+        )
+        INSERT INTO {table} ({', '.join(columns)})
+        SELECT {', '.join(select)}
+        FROM {staging} JOIN claimed USING (endpoint_name, source_id, timestamp)
+        ON CONFLICT (endpoint_name, source_id, timestamp) DO NOTHING
+    """
@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from typing import Iterable
+
+_DONE = object()
+
+
+class _Failure:
+    """Wraps an exception raised by the producer so the consumer can re-raise it"""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class Prefetcher:
+    """
+    Iterate ``source`` on a background thread, keeping up to ``depth`` items ready.
+
+    The bounded queue gives backpressure: the producer blocks once ``depth``
+    items are waiting, so at most ``depth + 1`` batches are held in memory.
+    Producer errors are re-raised in the consumer, and ``close()`` (or
+    leaving a ``closing()`` block) stops the producer and closes ``source``
+    on the thread that was iterating it.
+    """
+
+    def __init__(self, source: Iterable, depth: int = 2, name: str = "prefetch", join_timeout: float = 30.0):
+        if depth < 1:
+            raise ValueError(f"Prefetch depth must be at least 1, got {depth}")
+        self._source = source
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, name=name, daemon=True)
+        self._join_timeout = join_timeout
+        self._started = False
+        self._finished = False
+        # Time the consumer spent blocked waiting for the producer
+        self.wait_seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        if not self._started:
+            self._started = True
+            self._thread.start()
+
+        started = time.perf_counter()
+        item = self._queue.get()
+        self.wait_seconds += time.perf_counter() - started
+
+        if item is _DONE:
+            self.close()
+            raise StopIteration
+        if isinstance(item, _Failure):
+            self.close()
+            raise item.exc
+        return item
+
+    def close(self):
+        """Stop the producer thread and wait for it to release the source"""
+        self._finished = True
+        self._stop.set()
+        if self._started:
+            self._thread.join(self._join_timeout)
+
+    def _produce(self):
+        iterator = iter(self._source)
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    return
+            self._put(_DONE)
+        except BaseException as e:
+            self._put(_Failure(e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    def _put(self, item) -> bool:
+        # Poll so a consumer that stopped reading can still shut the producer down
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,220 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of long-lived DB-API connections.
+
+    Connections are health checked on checkout once they have been idle for
+    longer than ``health_check_interval`` seconds, and idle connections above
+    ``min_size`` are closed after ``idle_timeout`` seconds.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 5,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 30.0,
+        checkout_timeout: float = 30.0,
+    ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = deque()  # (connection, last_used) pairs, most recently used on the right
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self.stats = {"connects": 0, "checkouts": 0, "reconnects": 0, "evictions": 0}
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Check a healthy connection out of the pool, opening one if needed"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                self._evict_idle()
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No connection available after {timeout}s (max_size={self.max_size})")
+                self._cond.wait(remaining)
+
+        # Open or validate outside the lock so slow handshakes don't block other threads
+        self._local.reconnected = False
+        try:
+            if conn is None:
+                conn = self._open()
+            elif not self._is_healthy(conn, last_used):
+                self._close_quietly(conn)
+                self._count("reconnects")
+                self._local.reconnected = True
+                conn = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        self._count("checkouts")
+        return conn
+
+    def last_checkout_reconnected(self) -> bool:
+        """Whether this thread's most recent checkout had to replace a dead connection"""
+        return getattr(self._local, 'reconnected', False)
+
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool, or close it if it is unusable"""
+        if not discard:
+            discard = not self._reset(conn)
+
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks out a connection and always returns it"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            # Roll back whatever the caller left half-done; a failed rollback means the connection is dead
+            discard = False
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            self.release(conn, discard=discard)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._close_quietly(conn)
+            self._cond.notify_all()
+
+    def _open(self):
+        conn = self._connect()
+        self._count("connects")
+        return conn
+
+    def _count(self, stat: str):
+        # Checkouts open and validate connections outside the lock, so concurrent ones race on the counters
+        with self._cond:
+            self.stats[stat] += 1
+
+    def _evict_idle(self):
+        # Oldest connections sit on the left; keep at least min_size warm
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self.stats["evictions"] += 1
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if getattr(conn, "closed", 0):
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(conn) -> bool:
+        if getattr(conn, "closed", 0):
+            return False
+        try:
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools: Dict[Hashable, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key: Hashable, factory: Callable[[], ConnectionPool]) -> ConnectionPool:
+    """
+    Return the process-wide pool for ``key``, creating it on first use.
+
+    Pools are keyed by PID as well so a forked run worker never reuses its
+    parent's sockets.
+    """
+    key = (os.getpid(), key)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = factory()
+        return pool
+
+
+@atexit.register
+def close_all_pools():
+    """Close every pool owned by this process"""
+    with _pools_lock:
+        for (pid, _), pool in list(_pools.items()):
+            if pid == os.getpid():
+                pool.close()
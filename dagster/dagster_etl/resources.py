@@ -1,8 +1,39 @@
+import io
 import os
-import psycopg2
-import mysql.connector
+import threading
+import time
+from contextlib import contextmanager
 from dagster import ConfigurableResource
-from typing import Dict, Any
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Dict, Any, Optional, Union
+from .config import CONTROL_COLUMNS
+from .partitions import (
+    PARTITIONED_TABLES, SOURCE_KEY_TABLE, create_partition, default_partition_intervals, drop_expired, interval_start,
+    list_partitions, next_start,
+)
+from .pool import ConnectionPool, get_pool
+
+# psycopg2, NumPy (columnar, rollups) and the loaders are imported by the methods that use
+# them, so loading the code location and sensor ticks don't pay for them
+if TYPE_CHECKING:
+    from .columnar import MeasurementBatch
+    from .metrics import IngestMetrics
+
+# Column order of the tuples yielded by the endpoint resources' stream_measurements
+MYSQL_MEASUREMENT_COLUMNS = ('id', 'timestamp', 'accel_x', 'accel_y', 'accel_z')
+POSTGRES_MEASUREMENT_COLUMNS = ('id', 'timestamp', 'accel_x', 'accel_y', 'accel_z', 'mag_x', 'mag_y', 'mag_z')
+
+# Unique keys that make a reloaded row a no-op in 'upsert' load mode. Unique keys on the
+# time-partitioned tables must include the partition column, timestamp; their upserts also
+# claim (endpoint_name, source_id) in SOURCE_KEY_TABLE, so each source row loads once
+CONFLICT_KEYS = {
+    'accelerometer_data': ('endpoint_name', 'source_id', 'timestamp'),
+    'accel_mag_data': ('endpoint_name', 'source_id', 'timestamp'),
+    'file_metadata': ('endpoint_name', 'folder_path'),
+}
+
+# Tables where COPY was refused once; they use multi-row VALUES for the rest of the process
+_copy_unsupported_tables = set()
 
 
 class SupabaseResource(ConfigurableResource):
@@ -14,8 +45,26 @@ class SupabaseResource(ConfigurableResource):
     password: str = "postgres"
     database: str = "postgres"
 
+    # Connection pool settings; the pool is shared by every resource instance
+    # with the same connection parameters for the life of the process
+    pool_min_size: int = 1
+    pool_max_size: int = 5
+    pool_idle_timeout: float = 300.0
+    pool_health_check_interval: float = 30.0
+
+    # How insert_batch loads rows: 'copy' (COPY FROM STDIN, falling back to
+    # 'values' where COPY is not allowed), 'values' or 'executemany'
+    bulk_load_method: str = "copy"
+
+    # 'upsert' stages each batch in a temp table and merges it with ON CONFLICT DO
+    # NOTHING on CONFLICT_KEYS, so retried chunks and overlapping backfills load
+    # each row once; 'insert' loads straight into the table
+    load_mode: str = "upsert"
+
     def get_connection(self):
-        """Get a database connection"""
+        """Get a new, unpooled database connection"""
+        import psycopg2
+
         return psycopg2.connect(
             host=self.host,
             port=self.port,
@@ -24,10 +73,28 @@ class SupabaseResource(ConfigurableResource):
             database=self.database
         )
 
+    def get_pool(self) -> ConnectionPool:
+        """Get the process-wide connection pool for this database"""
+        return get_pool(
+            ("supabase", self.host, self.port, self.user, self.database),
+            lambda: ConnectionPool(
+                self.get_connection,
+                min_size=self.pool_min_size,
+                max_size=self.pool_max_size,
+                idle_timeout=self.pool_idle_timeout,
+                health_check_interval=self.pool_health_check_interval,
+            )
+        )
+
+    @contextmanager
+    def connection(self):
+        """Check a pooled connection out for the duration of a with-block"""
+        with self.get_pool().connection() as conn:
+            yield conn
+
     def execute_query(self, query: str, params: tuple = None):
         """Execute a query and return results"""
-        conn = self.get_connection()
-        try:
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
             if query.strip().upper().startswith('SELECT'):
@@ -37,24 +104,388 @@ class SupabaseResource(ConfigurableResource):
             else:
                 conn.commit()
                 return cursor.rowcount
-        finally:
-            conn.close()
 
-    def insert_batch(self, table: str, columns: list, values: list):
-        """Insert a batch of records"""
+    def insert_batch(self, table: str, columns: list, values: list, checkpoint: dict = None,
+                     timings: dict = None, replace_range: tuple = None):
+        """
+        Insert a batch of records and return the exact number of rows loaded
+        (in upsert mode, rows whose key was already present are not counted).
+
+        If ``checkpoint`` is given (``endpoint_name`` plus watermark columns
+        such as ``last_source_id``) the endpoint's ingest_state row is updated
+        in the same transaction, so the watermark never runs ahead of the data.
+        If ``replace_range`` is given as ``(endpoint_name, after_id, up_to_id)``
+        the endpoint's rows with source ids in that range are deleted first,
+        so loading the same range again replaces it instead of duplicating it.
+        If ``timings`` is given it is filled with checkout/load/commit seconds
+        and ``retries`` (a dead pooled connection replaced, or a COPY fallback).
+        """
         if not values:
             return 0
 
-        conn = self.get_connection()
-        try:
+        started = time.perf_counter()
+        copy_refusals = len(_copy_unsupported_tables)
+        with self.connection() as conn:
+            checked_out = time.perf_counter()
             cursor = conn.cursor()
-            placeholders = ', '.join(['%s'] * len(columns))
-            query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
-            cursor.executemany(query, values)
+            if replace_range:
+                self._delete_source_range(cursor, table, *replace_range)
+            rows_inserted = self._load_rows(cursor, table, columns, values)
+            if checkpoint:
+                self._save_checkpoint(cursor, table, rows_inserted, **checkpoint)
+            loaded = time.perf_counter()
             conn.commit()
-            return cursor.rowcount
-        finally:
-            conn.close()
+
+        if timings is not None:
+            timings.update(
+                checkout_seconds=checked_out - started,
+                load_seconds=loaded - checked_out,
+                commit_seconds=time.perf_counter() - loaded,
+                retries=int(self.get_pool().last_checkout_reconnected())
+                + (len(_copy_unsupported_tables) - copy_refusals),
+            )
+        return rows_inserted
+
+    def get_checkpoint(self, table: str, endpoint_name: str):
+        """Return the endpoint's ingest_state row for table, or None if it has none"""
+        result = self.execute_query(
+            "SELECT * FROM ingest_state WHERE target_table = %s AND endpoint_name = %s",
+            (table, endpoint_name)
+        )
+        return result[0] if result else None
+
+    def save_checkpoint(self, table: str, endpoint_name: str, **watermarks):
+        """Advance an endpoint's checkpoint without loading any rows"""
+        with self.connection() as conn:
+            self._save_checkpoint(conn.cursor(), table, 0, endpoint_name, **watermarks)
+            conn.commit()
+
+    def get_checkpoints(self) -> dict:
+        """Every ingest_state row keyed by (target_table, endpoint_name), in one query"""
+        rows = self.execute_query(
+            "SELECT target_table, endpoint_name, last_source_id, last_folder FROM ingest_state"
+        )
+        return {(row['target_table'], row['endpoint_name']): row for row in rows}
+
+    def get_watermark(self, table: str, endpoint_name: str) -> int:
+        """Return the last source id loaded into table for an endpoint (0 if none)"""
+        checkpoint = self.get_checkpoint(table, endpoint_name)
+        if checkpoint:
+            return checkpoint['last_source_id'] or 0
+
+        # No checkpoint yet (new endpoint, or data loaded before ingest_state existed);
+        # the first committed chunk creates one, so this scan only happens once
+        result = self.execute_query(
+            f"SELECT MAX(source_id) as last_id FROM {table} WHERE endpoint_name = %s",
+            (endpoint_name,)
+        )
+        return result[0]['last_id'] if result and result[0]['last_id'] else 0
+
+    def get_endpoints(self, endpoint_ids: list) -> list:
+        """Fetch ingest_control rows by id (used by fan-out runs)"""
+        query = f"SELECT {CONTROL_COLUMNS} FROM ingest_control WHERE id = ANY(%s) ORDER BY id"
+        return self.execute_query(query, (list(endpoint_ids),))
+
+    def save_chunk_size(self, endpoint_id: str, endpoint_name: str, chunk_size: int):
+        """Write a learned chunk size back to the endpoint's ingest_control row"""
+        if endpoint_id:
+            query, params = "UPDATE ingest_control SET chunk_size = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s", (chunk_size, int(endpoint_id))
+        else:
+            query, params = "UPDATE ingest_control SET chunk_size = %s, updated_at = CURRENT_TIMESTAMP WHERE name = %s", (chunk_size, endpoint_name)
+        return self.execute_query(query, params)
+
+    def plan_backfill(self, table: str, endpoint_name: str, keys: list, up_to_id: int):
+        """
+        Record planned backfill partitions and move the endpoint's watermark past them, in one transaction.
+
+        Each range stays in backfill_ranges until a partition run has loaded
+        it, so backfill_planner_sensor can request it again if its run fails
+        or is never launched.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT INTO backfill_ranges (target_table, endpoint_name, partition_key) VALUES (%s, %s, %s) "
+                "ON CONFLICT (target_table, partition_key) DO NOTHING",
+                [(table, endpoint_name, key) for key in keys]
+            )
+            self._save_checkpoint(cursor, table, 0, endpoint_name, last_source_id=up_to_id)
+            conn.commit()
+
+    def get_pending_backfills(self) -> list:
+        """Planned backfill ranges not loaded yet, oldest first"""
+        return self.execute_query(
+            "SELECT target_table, endpoint_name, partition_key, attempts FROM backfill_ranges ORDER BY planned_at, partition_key"
+        )
+
+    def retry_backfill(self, table: str, key: str) -> int:
+        """Count another run request for a planned range; returns its attempts so far"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE backfill_ranges SET attempts = attempts + 1 WHERE target_table = %s AND partition_key = %s "
+                "RETURNING attempts",
+                (table, key)
+            )
+            row = cursor.fetchone()
+            conn.commit()
+        return row[0] if row else 0
+
+    def complete_backfill(self, table: str, key: str):
+        """Drop a planned range once its partition run has loaded it"""
+        return self.execute_query(
+            "DELETE FROM backfill_ranges WHERE target_table = %s AND partition_key = %s", (table, key)
+        )
+
+    def maintain_partitions(self, table: str, interval: str = "month", premake: int = 2,
+                            retention_days: int = 0) -> dict:
+        """
+        Bring a time-partitioned table's partitions up to date.
+
+        Creates partitions for the current interval and the next ``premake``,
+        splits rows that landed in the default partition into partitions of
+        their own, and, if ``retention_days`` is set, drops partitions that
+        ended before the retention window. Each partition is created or
+        dropped in its own transaction.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            existing = list_partitions(cursor, table)
+            backlog = default_partition_intervals(cursor, table, interval)
+
+        # Expired backlog is purged below rather than given a partition first
+        cutoff = datetime.now() - timedelta(days=retention_days) if retention_days > 0 else None
+        wanted = {start for start in backlog if cutoff is None or next_start(start, interval) > cutoff}
+        start = interval_start(datetime.now(), interval)
+        for _ in range(premake + 1):
+            wanted.add(start)
+            start = next_start(start, interval)
+
+        created, moved_rows = [], 0
+        for start in sorted(wanted):
+            end = next_start(start, interval)
+            # Partitions made under a different interval setting are left as they are
+            if any(start < other_end and other_start < end for _, other_start, other_end in existing):
+                continue
+            with self.connection() as conn:
+                moved_rows += create_partition(conn.cursor(), table, start, end)
+                conn.commit()
+            created.append(f"{start:%Y-%m-%d}")
+
+        dropped = []
+        if cutoff is not None:
+            with self.connection() as conn:
+                dropped = drop_expired(conn.cursor(), table, cutoff)
+                conn.commit()
+
+        return {"created": created, "moved_rows": moved_rows, "dropped": dropped}
+
+    def refresh_rollups(self, table: str, endpoint_name: str, after_id: int, up_to_id: int) -> dict:
+        """
+        Recompute sensor_rollups for the buckets touched by an endpoint's source ids in (after_id, up_to_id].
+
+        Each touched hour is refreshed in its own transaction: the raw rows of
+        the touched minutes are binary-copied out and aggregated into 1s and
+        1m buckets, which replace the stored ones, then the hour's 1h buckets
+        are rebuilt from its 1m buckets. A per-endpoint advisory lock keeps a
+        concurrent backfill from interleaving with an incremental refresh.
+        """
+        from .rollups import RAW_RESOLUTIONS, ROLLUP_CHANNELS, ROLLUP_COLUMNS, ROLLUP_TABLE, minute_window, rollup_rows
+
+        channels = ROLLUP_CHANNELS[table]
+        hours = self.execute_query(
+            f"""
+            SELECT date_trunc('hour', timestamp) AS hour, MIN(timestamp) AS first, MAX(timestamp) AS last
+            FROM {table}
+            WHERE endpoint_name = %s AND source_id > %s AND source_id <= %s
+            GROUP BY 1
+            ORDER BY 1
+            """,
+            (endpoint_name, after_id, up_to_id)
+        )
+
+        raw_rows = rollup_rows_written = 0
+        for hour in hours:
+            start, end = minute_window(hour['first'], hour['last'])
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"{ROLLUP_TABLE}:{table}:{endpoint_name}",))
+                batch = self._fetch_window(cursor, table, channels, endpoint_name, start, end)
+                rows = rollup_rows(batch, table, endpoint_name)
+                cursor.execute(
+                    f"""
+                    DELETE FROM {ROLLUP_TABLE}
+                    WHERE source_table = %s AND endpoint_name = %s AND resolution IN %s
+                      AND bucket_start >= %s AND bucket_start < %s
+                    """,
+                    (table, endpoint_name, tuple(RAW_RESOLUTIONS), start, end)
+                )
+                if rows:
+                    self._bulk_load(cursor, ROLLUP_TABLE, ROLLUP_COLUMNS, rows)
+                self._rebuild_hour(cursor, table, endpoint_name, hour['hour'])
+                conn.commit()
+            raw_rows += len(batch)
+            rollup_rows_written += len(rows)
+
+        return {"hours": len(hours), "raw_rows": raw_rows, "rollup_rows": rollup_rows_written}
+
+    def get_image_records(self, endpoint_name: str, folder_paths: list) -> dict:
+        """
+        (file_size, file_mtime_ns) of the file_images rows of an endpoint's folders, keyed by (folder_path, file_name).
+
+        Rows without a thumbnail are left out, so images that failed to thumbnail are retried.
+        """
+        rows = self.execute_query(
+            "SELECT folder_path, file_name, file_size, file_mtime_ns FROM file_images "
+            "WHERE endpoint_name = %s AND folder_path = ANY(%s) AND thumbnail_path IS NOT NULL",
+            (endpoint_name, list(folder_paths))
+        )
+        return {(row['folder_path'], row['file_name']): (row['file_size'], row['file_mtime_ns']) for row in rows}
+
+    def get_thumbnails(self, content_hashes) -> dict:
+        """The thumbnail (path, width, height) already made for each of these content hashes, from any endpoint"""
+        if not content_hashes:
+            return {}
+        rows = self.execute_query(
+            "SELECT DISTINCT ON (content_hash) content_hash, thumbnail_path, width, height FROM file_images "
+            "WHERE content_hash = ANY(%s) AND thumbnail_path IS NOT NULL",
+            (list(content_hashes),)
+        )
+        return {row.pop('content_hash'): row for row in rows}
+
+    def save_image_records(self, values: list) -> int:
+        """Insert or update file_images rows (tuples in IMAGE_COLUMNS order)"""
+        from .bulk_load import upsert_values
+        from .images import IMAGE_COLUMNS
+
+        if not values:
+            return 0
+        with self.connection() as conn:
+            rows = upsert_values(conn.cursor(), 'file_images', IMAGE_COLUMNS, values,
+                                 ('endpoint_name', 'folder_path', 'file_name'))
+            conn.commit()
+        return rows
+
+    @staticmethod
+    def _fetch_window(cursor, table: str, channels: tuple, endpoint_name: str, start, end) -> 'MeasurementBatch':
+        """An endpoint's raw rows with start <= timestamp < end as a MeasurementBatch, via binary COPY"""
+        from .columnar import MeasurementBatch
+
+        select = cursor.mogrify(
+            f"""
+            SELECT id::int8, timestamp, {', '.join(f"COALESCE({c}::float8, 'NaN')" for c in channels)}
+            FROM {table}
+            WHERE endpoint_name = %s AND timestamp >= %s AND timestamp < %s
+            """,
+            (endpoint_name, start, end)
+        ).decode()
+        buffer = io.BytesIO()
+        cursor.copy_expert(f"COPY ({select}) TO STDOUT WITH (FORMAT binary)", buffer)
+        return MeasurementBatch.from_pg_binary(buffer.getvalue(), channels)
+
+    @staticmethod
+    def _rebuild_hour(cursor, table: str, endpoint_name: str, hour):
+        """Replace one hour's 1h buckets with the merge of its 1m buckets"""
+        from .rollups import ROLLUP_COLUMNS, ROLLUP_TABLE
+
+        cursor.execute(
+            f"DELETE FROM {ROLLUP_TABLE} WHERE source_table = %s AND endpoint_name = %s AND resolution = '1h' AND bucket_start = %s",
+            (table, endpoint_name, hour)
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {ROLLUP_TABLE} ({', '.join(ROLLUP_COLUMNS)})
+            SELECT source_table, endpoint_name, '1h', %s, axis,
+                   SUM(sample_count), MIN(min_value), MAX(max_value), SUM(sum_value), SUM(sum_squares)
+            FROM {ROLLUP_TABLE}
+            WHERE source_table = %s AND endpoint_name = %s AND resolution = '1m'
+              AND bucket_start >= %s AND bucket_start < %s + INTERVAL '1 hour'
+            GROUP BY source_table, endpoint_name, axis
+            """,
+            (hour, table, endpoint_name, hour, hour)
+        )
+
+    @staticmethod
+    def _save_checkpoint(cursor, table: str, rows_inserted: int, endpoint_name: str, **watermarks):
+        """Upsert the endpoint's ingest_state row inside the caller's transaction"""
+        columns = ['target_table', 'endpoint_name', 'rows_ingested'] + list(watermarks)
+        # Watermarks only move forward, even if an older chunk commits last
+        updates = ''.join(
+            f", {column} = GREATEST(ingest_state.{column}, EXCLUDED.{column})" for column in watermarks
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO ingest_state ({', '.join(columns)})
+            VALUES ({', '.join(['%s'] * len(columns))})
+            ON CONFLICT (target_table, endpoint_name) DO UPDATE SET
+                rows_ingested = ingest_state.rows_ingested + EXCLUDED.rows_ingested,
+                updated_at = CURRENT_TIMESTAMP{updates}
+            """,
+            (table, endpoint_name, rows_inserted, *watermarks.values())
+        )
+
+    @staticmethod
+    def _delete_source_range(cursor, table: str, endpoint_name: str, after_id: int, up_to_id: int):
+        """Delete an endpoint's rows with after_id < source_id <= up_to_id inside the caller's transaction"""
+        cursor.execute(
+            f"DELETE FROM {table} WHERE endpoint_name = %s AND source_id > %s AND source_id <= %s",
+            (endpoint_name, after_id, up_to_id)
+        )
+        if table in PARTITIONED_TABLES:
+            # Release the range's source keys so the reloaded rows can claim them again
+            cursor.execute(
+                f"DELETE FROM {SOURCE_KEY_TABLE} "
+                "WHERE source_table = %s AND endpoint_name = %s AND source_id > %s AND source_id <= %s",
+                (table, endpoint_name, after_id, up_to_id)
+            )
+
+    def _load_rows(self, cursor, table: str, columns: list, values: list) -> int:
+        """Load rows inside the caller's transaction and return how many were new"""
+        from .bulk_load import create_staging_table, merge_staged
+        from .columnar import MeasurementBatch
+
+        if isinstance(values, MeasurementBatch):
+            return self._load_batch(cursor, table, values)
+        conflict_columns = CONFLICT_KEYS.get(table)
+        if self.load_mode == 'upsert' and conflict_columns:
+            staging = create_staging_table(cursor, table, columns)
+            self._bulk_load(cursor, staging, columns, values)
+            return merge_staged(cursor, staging, table, columns, conflict_columns)
+        return self._bulk_load(cursor, table, columns, values)
+
+    def _load_batch(self, cursor, table: str, batch: 'MeasurementBatch') -> int:
+        """Binary COPY a MeasurementBatch into a float8 staging table, then cast it into table"""
+        from .columnar import copy_batch, merge_staged_batch_sql, staging_table_sql
+
+        staging = f"_stage_{table}_columnar"
+        cursor.execute(staging_table_sql(staging, batch.channels))
+        copy_batch(cursor, staging, batch)
+        # NaN marks values validate() rejected (or NULL at the source); DECIMAL columns get NULL
+        conflict_columns = CONFLICT_KEYS.get(table) if self.load_mode == 'upsert' else None
+        cursor.execute(merge_staged_batch_sql(staging, table, batch.channels, conflict_columns))
+        return cursor.rowcount
+
+    def _bulk_load(self, cursor, table: str, columns: list, values: list) -> int:
+        """Load rows into table using the configured bulk load method"""
+        from .bulk_load import COPY_UNSUPPORTED_ERRORS, copy_rows, insert_executemany, insert_values
+
+        method = self.bulk_load_method
+        if method == 'executemany':
+            return insert_executemany(cursor, table, columns, values)
+        if method == 'values' or table in _copy_unsupported_tables:
+            return insert_values(cursor, table, columns, values)
+
+        cursor.execute("SAVEPOINT bulk_load")
+        try:
+            rows_loaded = copy_rows(cursor, table, columns, values)
+        except COPY_UNSUPPORTED_ERRORS:
+            cursor.execute("ROLLBACK TO SAVEPOINT bulk_load")
+            if not isinstance(values, (list, tuple)):
+                raise
+            _copy_unsupported_tables.add(table)
+            return insert_values(cursor, table, columns, values)
+        cursor.execute("RELEASE SAVEPOINT bulk_load")
+        return rows_loaded
 
 
 class MySQLEndpointResource(ConfigurableResource):
@@ -62,6 +493,9 @@ class MySQLEndpointResource(ConfigurableResource):
 
     def get_connection(self, host: str, port: int, database: str, user: str = 'sensoruser', password: str = 'sensorpass'):
         """Get a MySQL connection"""
+        # Imported here so runs and sensor ticks that never touch MySQL don't pay for the driver
+        import mysql.connector
+
         return mysql.connector.connect(
             host=host,
             port=port,
@@ -70,20 +504,104 @@ class MySQLEndpointResource(ConfigurableResource):
             database=database
         )
 
-    def fetch_measurements(self, host: str, port: int, database: str, chunk_size: int, last_id: int = 0):
-        """Fetch measurements from MySQL endpoint"""
+    def get_max_id(self, host: str, port: int, database: str) -> int:
+        """Highest measurement id at the endpoint (0 if it has none)"""
         conn = self.get_connection(host, port, database)
         try:
-            cursor = conn.cursor(dictionary=True)
-            query = """
-                SELECT id, timestamp, accel_x, accel_y, accel_z
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(id) FROM measurements")
+            row = cursor.fetchone()
+            return row[0] or 0
+        finally:
+            conn.close()
+
+    def stream_measurements(self, host: str, port: int, database: str, last_id: int = 0,
+                            batch_size: Union[int, Callable[[], int]] = 50, max_rows: int = None,
+                            metrics: Optional['IngestMetrics'] = None, max_id: int = None):
+        """
+        Stream measurements after last_id as lists of tuples (MYSQL_MEASUREMENT_COLUMNS order).
+
+        Uses one connection and one unbuffered cursor for the whole stream, so
+        rows are pulled off the socket batch by batch instead of re-querying.
+        ``batch_size`` may be a callable to resize batches as the stream runs,
+        ``max_id`` bounds the stream to ids <= max_id (backfill partitions),
+        and ``metrics`` receives the connect, query and per-fetch timings.
+        """
+        from .metrics import timed
+
+        with timed(metrics, 'connect'):
+            conn = self.get_connection(host, port, database)
+        try:
+            cursor = conn.cursor(buffered=False)
+            query = f"""
+                SELECT {', '.join(MYSQL_MEASUREMENT_COLUMNS)}
                 FROM measurements
-                WHERE id > %s
+                WHERE id > %s{' AND id <= %s' if max_id is not None else ''}
                 ORDER BY id
-                LIMIT %s
             """
-            cursor.execute(query, (last_id, chunk_size))
-            return cursor.fetchall()
+            params = (last_id,) if max_id is None else (last_id, max_id)
+            if max_rows:
+                query += " LIMIT %s"
+                params += (max_rows,)
+            with timed(metrics, 'query'):
+                cursor.execute(query, params)
+
+            while True:
+                size = batch_size() if callable(batch_size) else batch_size
+                fetch_started = time.perf_counter()
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                if metrics is not None:
+                    metrics.record_fetch(time.perf_counter() - fetch_started)
+                yield rows
+        finally:
+            conn.close()
+
+    def stream_measurement_batches(self, host: str, port: int, database: str, last_id: int = 0,
+                                   batch_size: Union[int, Callable[[], int]] = 50, max_rows: int = None,
+                                   metrics: Optional['IngestMetrics'] = None, max_id: int = None):
+        """
+        Like stream_measurements, but yields MeasurementBatch arrays.
+
+        DECIMAL channels are cast to DOUBLE and timestamps to epoch microseconds
+        in SQL, so the driver returns plain ints and floats (no Decimal or
+        datetime objects) that NumPy converts a column at a time.
+        """
+        from .columnar import MeasurementBatch
+        from .metrics import timed
+
+        channels = MYSQL_MEASUREMENT_COLUMNS[2:]
+        select = ["id", "TIMESTAMPDIFF(MICROSECOND, '1970-01-01 00:00:00', timestamp)"] + [
+            f"CAST({c} AS DOUBLE)" for c in channels
+        ]
+        with timed(metrics, 'connect'):
+            conn = self.get_connection(host, port, database)
+        try:
+            cursor = conn.cursor(buffered=False)
+            query = f"""
+                SELECT {', '.join(select)}
+                FROM measurements
+                WHERE id > %s{' AND id <= %s' if max_id is not None else ''}
+                ORDER BY id
+            """
+            params = (last_id,) if max_id is None else (last_id, max_id)
+            if max_rows:
+                query += " LIMIT %s"
+                params += (max_rows,)
+            with timed(metrics, 'query'):
+                cursor.execute(query, params)
+
+            while True:
+                size = batch_size() if callable(batch_size) else batch_size
+                fetch_started = time.perf_counter()
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                batch = MeasurementBatch.from_rows(rows, channels)
+                if metrics is not None:
+                    metrics.record_fetch(time.perf_counter() - fetch_started)
+                yield batch
         finally:
             conn.close()
 
@@ -93,6 +611,8 @@ class PostgresEndpointResource(ConfigurableResource):
 
     def get_connection(self, host: str, port: int, database: str, user: str = 'sensoruser', password: str = 'sensorpass'):
         """Get a PostgreSQL connection"""
+        import psycopg2
+
         return psycopg2.connect(
             host=host,
             port=port,
@@ -101,21 +621,126 @@ class PostgresEndpointResource(ConfigurableResource):
             database=database
         )
 
-    def fetch_measurements(self, host: str, port: int, database: str, chunk_size: int, last_id: int = 0):
-        """Fetch measurements from PostgreSQL endpoint"""
+    def get_max_id(self, host: str, port: int, database: str) -> int:
+        """Highest measurement id at the endpoint (0 if it has none)"""
         conn = self.get_connection(host, port, database)
         try:
             cursor = conn.cursor()
-            query = """
-                SELECT id, timestamp, accel_x, accel_y, accel_z, mag_x, mag_y, mag_z
+            cursor.execute("SELECT MAX(id) FROM measurements")
+            row = cursor.fetchone()
+            return row[0] or 0
+        finally:
+            conn.close()
+
+    def stream_measurements(self, host: str, port: int, database: str, last_id: int = 0,
+                            batch_size: Union[int, Callable[[], int]] = 50, max_rows: int = None,
+                            metrics: Optional['IngestMetrics'] = None, max_id: int = None):
+        """
+        Stream measurements after last_id as lists of tuples (POSTGRES_MEASUREMENT_COLUMNS order).
+
+        Uses one connection and one named (server-side) cursor for the whole
+        stream, so memory stays flat regardless of how large the backlog is.
+        ``batch_size`` may be a callable to resize batches as the stream runs,
+        ``max_id`` bounds the stream to ids <= max_id (backfill partitions),
+        and ``metrics`` receives the connect, query and per-fetch timings.
+        """
+        from .metrics import timed
+
+        with timed(metrics, 'connect'):
+            conn = self.get_connection(host, port, database)
+        try:
+            conn.set_session(readonly=True)
+            cursor = conn.cursor(name='stream_measurements')
+            query = f"""
+                SELECT {', '.join(POSTGRES_MEASUREMENT_COLUMNS)}
                 FROM measurements
-                WHERE id > %s
+                WHERE id > %s{' AND id <= %s' if max_id is not None else ''}
                 ORDER BY id
-                LIMIT %s
             """
-            cursor.execute(query, (last_id, chunk_size))
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            return [dict(zip(columns, row)) for row in rows]
+            params = (last_id,) if max_id is None else (last_id, max_id)
+            if max_rows:
+                query += " LIMIT %s"
+                params += (max_rows,)
+            # A named cursor only DECLAREs here; most of the scan cost lands in the first fetch
+            with timed(metrics, 'query'):
+                cursor.execute(query, params)
+
+            while True:
+                size = batch_size() if callable(batch_size) else batch_size
+                fetch_started = time.perf_counter()
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                if metrics is not None:
+                    metrics.record_fetch(time.perf_counter() - fetch_started)
+                yield rows
+        finally:
+            conn.close()
+
+    def stream_measurement_batches(self, host: str, port: int, database: str, last_id: int = 0,
+                                   batch_size: Union[int, Callable[[], int]] = 50, max_rows: int = None,
+                                   metrics: Optional['IngestMetrics'] = None, max_id: int = None):
+        """
+        Like stream_measurements, but yields MeasurementBatch arrays.
+
+        The whole range is read by one ``COPY (SELECT ...) TO STDOUT`` in
+        binary format, run on a helper thread on a single connection. Its
+        output is cut into ``batch_size``-row batches as it arrives, each
+        parsed by NumPy as a fixed-width record array; no Python object is
+        created per value. The pipe between the two is bounded, so memory
+        stays flat however large the range is.
+        """
+        from .bulk_load import CopyOutPipe
+        from .columnar import PgBinaryRowReader
+        from .metrics import timed
+
+        channels = POSTGRES_MEASUREMENT_COLUMNS[2:]
+        # Binary rows are only fixed-width without NULLs, so NULL channels travel as NaN
+        select = ["id::int8", "timestamp"] + [f"COALESCE({c}::float8, 'NaN')" for c in channels]
+        with timed(metrics, 'connect'):
+            conn = self.get_connection(host, port, database)
+        pipe = CopyOutPipe()
+        copier = None
+        try:
+            conn.set_session(readonly=True, autocommit=True)
+            cursor = conn.cursor()
+            query = f"SELECT {', '.join(select)} FROM measurements WHERE id > %s"
+            params = (last_id,)
+            if max_id is not None:
+                query += " AND id <= %s"
+                params += (max_id,)
+            query += " ORDER BY id"
+            if max_rows:
+                query += " LIMIT %s"
+                params += (max_rows,)
+            copier = threading.Thread(
+                target=pipe.copy,
+                args=(cursor, f"COPY ({cursor.mogrify(query, params).decode()}) TO STDOUT WITH (FORMAT binary)"),
+                name="stream_measurement_batches", daemon=True
+            )
+            copier.start()
+
+            reader = PgBinaryRowReader(channels)
+            finished = False
+            while True:
+                size = batch_size() if callable(batch_size) else batch_size
+                fetch_started = time.perf_counter()
+                while not finished and reader.rows_available < size:
+                    block = pipe.read_block()
+                    if block is None:
+                        finished = True
+                    else:
+                        reader.feed(block)
+                if not reader.rows_available:
+                    break
+                batch = reader.take(size)
+                if metrics is not None:
+                    metrics.record_fetch(time.perf_counter() - fetch_started)
+                yield batch
         finally:
+            pipe.close()
+            if copier is not None:
+                # Stops a COPY the consumer abandoned part-way
+                conn.cancel()
+                copier.join()
             conn.close()
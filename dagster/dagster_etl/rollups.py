@@ -0,0 +1,114 @@
+"""
+Downsampled rollups of the accelerometer and magnetometer tables.
+
+sensor_rollups holds, per endpoint, axis and 1s/1m/1h bucket, the sample
+count, min, max, sum and sum of squares (mean and RMS are generated columns),
+so dashboards can read a few rows per bucket instead of every raw row.
+
+Rollups are refreshed for the rows a run just loaded: the minutes those rows
+fall in are re-read from the raw table and aggregated with NumPy into 1s and
+1m buckets, which replace the stored ones, and each touched hour is rebuilt
+from its 1m buckets in SQL. Buckets are recomputed rather than incremented, so
+a retried run or a re-run backfill partition never counts a row twice.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .columnar import MeasurementBatch
+
+ROLLUP_TABLE = "sensor_rollups"
+
+# Channels rolled up per raw table, in MeasurementBatch value order
+ROLLUP_CHANNELS = {
+    'accelerometer_data': ('accel_x', 'accel_y', 'accel_z'),
+    'accel_mag_data': ('accel_x', 'accel_y', 'accel_z', 'mag_x', 'mag_y', 'mag_z'),
+}
+
+# Bucket widths computed from raw rows; '1h' is rebuilt from the '1m' buckets
+RAW_RESOLUTIONS = {
+    '1s': 1_000_000,
+    '1m': 60_000_000,
+}
+
+ROLLUP_COLUMNS = [
+    'source_table', 'endpoint_name', 'resolution', 'bucket_start', 'axis',
+    'sample_count', 'min_value', 'max_value', 'sum_value', 'sum_squares',
+]
+
+
+@dataclass
+class BucketStats:
+    """Per-bucket aggregates of a batch at one resolution; arrays are (channels x buckets)"""
+
+    resolution: str
+    bucket_starts: np.ndarray
+    counts: np.ndarray
+    mins: np.ndarray
+    maxs: np.ndarray
+    sums: np.ndarray
+    sum_squares: np.ndarray
+
+    def to_rows(self, source_table: str, endpoint_name: str, channels: Sequence[str]) -> List[tuple]:
+        """sensor_rollups rows (ROLLUP_COLUMNS order), skipping buckets where an axis had no values"""
+        starts = self.bucket_starts.astype("datetime64[us]").astype(object)
+        rows = []
+        for i, axis in enumerate(channels):
+            present = self.counts[i] > 0
+            rows.extend(
+                (source_table, endpoint_name, self.resolution, start, axis, count, low, high, total, squares)
+                for start, count, low, high, total, squares in zip(
+                    starts[present].tolist(),
+                    self.counts[i][present].tolist(),
+                    self.mins[i][present].tolist(),
+                    self.maxs[i][present].tolist(),
+                    self.sums[i][present].tolist(),
+                    self.sum_squares[i][present].tolist(),
+                )
+            )
+        return rows
+
+
+def aggregate(batch: MeasurementBatch, resolution: str) -> BucketStats:
+    """Bucket a batch by timestamp and reduce every channel in one pass per statistic"""
+    width = RAW_RESOLUTIONS[resolution]
+    micros = batch.timestamps.view(np.int64)
+    buckets = micros - micros % width
+    order = np.argsort(buckets, kind="stable")
+    buckets = buckets[order]
+    values = batch.values[:, order]
+
+    # Offsets where a new bucket starts; reduceat folds each run of equal buckets
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[:1] - 1)) if len(buckets) else np.empty(0, dtype=np.intp)
+    if not len(starts):
+        empty = np.empty((len(batch.channels), 0))
+        return BucketStats(resolution, buckets, empty.astype(np.int64), empty, empty, empty, empty)
+
+    present = ~np.isnan(values)
+    zeroed = np.where(present, values, 0.0)
+    return BucketStats(
+        resolution=resolution,
+        bucket_starts=buckets[starts],
+        counts=np.add.reduceat(present.astype(np.int64), starts, axis=1),
+        # fmin/fmax skip NaN (NULL) values; a bucket with none left stays NaN and is dropped by its zero count
+        mins=np.fmin.reduceat(values, starts, axis=1),
+        maxs=np.fmax.reduceat(values, starts, axis=1),
+        sums=np.add.reduceat(zeroed, starts, axis=1),
+        sum_squares=np.add.reduceat(zeroed * zeroed, starts, axis=1),
+    )
+
+
+def rollup_rows(batch: MeasurementBatch, source_table: str, endpoint_name: str) -> List[tuple]:
+    """sensor_rollups rows for every raw resolution of a batch"""
+    rows = []
+    for resolution in RAW_RESOLUTIONS:
+        rows.extend(aggregate(batch, resolution).to_rows(source_table, endpoint_name, batch.channels))
+    return rows
+
+
+def minute_window(first: datetime, last: datetime) -> Tuple[datetime, datetime]:
+    """Whole minutes covering [first, last], so every touched 1s and 1m bucket is recomputed in full"""
+    start = first.replace(second=0, microsecond=0)
+    return start, last.replace(second=0, microsecond=0) + timedelta(minutes=1)
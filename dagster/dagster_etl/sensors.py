@@ -1,25 +1,214 @@
-from dagster import sensor, RunRequest, SkipReason, SensorEvaluationContext, DefaultSensorStatus
+from dagster import (
+    sensor, RunRequest, SkipReason, SensorEvaluationContext, DefaultSensorStatus,
+    SensorResult, AddDynamicPartitionsRequest, RunsFilter, DagsterRunStatus,
+)
 from .resources import SupabaseResource
-from .assets import ingest_mysql_data, ingest_postgres_data, ingest_file_data
+from .assets import (
+    FILE_DATA_DIR, IMAGES_ENABLED, ROLLUPS_ENABLED, INGEST_ASSETS, ROLLUP_ASSETS, file_images, ingest_file_data,
+    ingest_async_data,
+)
+from .async_engine import SOURCES as ASYNC_SOURCES
+from .backfill import BACKFILL_PARTITIONS, partition_key, plan_ranges
+from .config import CONTROL_COLUMNS, EndpointConfig
+from .connectors import CONNECTORS
+from .jobs import BACKFILL_JOBS
+import json
+import os
+import time
+
+# 'per_endpoint' launches one run per active endpoint; 'fanout' launches one run per
+# endpoint type (in groups of INGEST_FANOUT_BATCH) that ingests them concurrently
+RUN_MODE = os.getenv("INGEST_RUN_MODE", "per_endpoint")
+FANOUT_WORKERS = int(os.getenv("INGEST_FANOUT_WORKERS", "8"))
+FANOUT_BATCH = int(os.getenv("INGEST_FANOUT_BATCH", "100"))
+
+# Endpoint types that can share a fan-out run: every database connector
+FANOUT_TYPES = tuple(CONNECTORS)
+
+# 'threads' ingests with the connectors' blocking resources; 'async' sends every database
+# endpoint the async engine can read to ingest_async_data, INGEST_ASYNC_BATCH per run
+ENGINE = os.getenv("INGEST_ENGINE", "threads")
+ASYNC_BATCH = int(os.getenv("INGEST_ASYNC_BATCH", "500"))
+
+# backfill_planner_sensor splits backlogs of at least INGEST_BACKFILL_MIN_BACKLOG source
+# ids into partitions of INGEST_BACKFILL_PARTITION_ROWS ids, planning at most
+# INGEST_BACKFILL_MAX_PARTITIONS per endpoint per tick
+BACKFILL_MIN_BACKLOG = int(os.getenv("INGEST_BACKFILL_MIN_BACKLOG", "100000"))
+BACKFILL_PARTITION_ROWS = int(os.getenv("INGEST_BACKFILL_PARTITION_ROWS", "50000"))
+BACKFILL_MAX_PARTITIONS = int(os.getenv("INGEST_BACKFILL_MAX_PARTITIONS", "200"))
+# Planned ranges whose run failed or never launched are requested again, up to this many runs in all
+BACKFILL_MAX_ATTEMPTS = int(os.getenv("INGEST_BACKFILL_MAX_ATTEMPTS", "3"))
+
+IN_PROGRESS_STATUSES = [
+    DagsterRunStatus.QUEUED, DagsterRunStatus.NOT_STARTED, DagsterRunStatus.STARTING, DagsterRunStatus.STARTED,
+]
+
+# endpoint_monitor_sensor only requests runs for endpoints that may have new data;
+# file endpoints are re-requested at least every INGEST_FILE_RECHECK_SECONDS so
+# folders that were still settling and reconciliation sweeps are not missed
+CHANGE_DETECTION = os.getenv("INGEST_CHANGE_DETECTION", "true").lower() == "true"
+FILE_RECHECK_SECONDS = float(os.getenv("INGEST_FILE_RECHECK_SECONDS", "300"))
+
+# 'poll' finds new file endpoint folders by listing FILE_DATA_DIR on endpoint_monitor_sensor
+# ticks; 'events' ingests the folders the file-watcher service reports (see file_events.py)
+# through file_event_sensor, at most INGEST_FILE_EVENT_BATCH events per tick
+FILE_DISCOVERY = os.getenv("INGEST_FILE_DISCOVERY", "poll")
+FILE_EVENT_INTERVAL = int(os.getenv("INGEST_FILE_EVENT_INTERVAL", "5"))
+FILE_EVENT_BATCH = int(os.getenv("INGEST_FILE_EVENT_BATCH", "1000"))
+
+TARGET_TABLES = {**{t: connector.table for t, connector in CONNECTORS.items()}, 'file': 'file_metadata'}
+
+# Resources the sensors need: Supabase plus every connector's source resource
+SENSOR_RESOURCE_KEYS = {"supabase", *(connector.resource_key for connector in CONNECTORS.values())}
+
+
+def _asset_selection(endpoint_type: str):
+    """Assets an incremental run of an endpoint type materializes, or None for unknown types"""
+    if endpoint_type == 'file':
+        return [ingest_file_data.key, file_images.key] if IMAGES_ENABLED else [ingest_file_data.key]
+    if endpoint_type not in CONNECTORS:
+        return None
+    # Rollups run in the same run as their ingest so they see exactly the rows it loaded
+    selection = [INGEST_ASSETS[endpoint_type].key]
+    if ROLLUPS_ENABLED and endpoint_type in ROLLUP_ASSETS:
+        selection.append(ROLLUP_ASSETS[endpoint_type].key)
+    return selection
+
+
+def _source_resources(context: SensorEvaluationContext) -> dict:
+    """Each connector's source resource, keyed by endpoint type"""
+    return {t: getattr(context.resources, connector.resource_key) for t, connector in CONNECTORS.items()}
+
+
+def _backfill_partitions_in_flight(context: SensorEvaluationContext) -> set:
+    """Partition keys of queued or running backfill runs"""
+    return {
+        run.tags.get('dagster/partition')
+        for run in context.instance.get_runs(filters=RunsFilter(statuses=IN_PROGRESS_STATUSES))
+        if 'ingest_backfill' in run.tags
+    }
+
+
+def _busy_endpoints(context: SensorEvaluationContext):
+    """Names and ids of endpoints with a queued or running incremental run"""
+    busy_names, busy_ids = set(), set()
+    for run in context.instance.get_runs(filters=RunsFilter(statuses=IN_PROGRESS_STATUSES)):
+        # Backfill partitions only load ranges behind the watermark, so they never block
+        if 'ingest_backfill' in run.tags:
+            continue
+        busy_names.add(run.tags.get('endpoint_name'))
+        busy_ids.update(run.tags.get('endpoint_ids', '').split(','))
+    return busy_names, busy_ids
+
+
+class _ChangeDetector:
+    """
+    Decides whether an endpoint may have data to ingest, from state kept in the sensor cursor.
+
+    Database endpoints cost one ``SELECT MAX(id)`` per tick: while the source's
+    max id is unchanged and was already ingested, nothing else is read. Only
+    when it moves is the endpoint's ingest_state watermark consulted (one query
+    shared by all endpoints). File endpoints compare the data directory's
+    mtime and the ingest_state high-water mark with the previous tick.
+    """
+
+    def __init__(self, context: SensorEvaluationContext, supabase: SupabaseResource, endpoint_resources: dict):
+        self._context = context
+        self._supabase = supabase
+        self._resources = endpoint_resources
+        self._previous = json.loads(context.cursor) if context.cursor else {}
+        self._checkpoints = None
+        self._busy = None
+        self.state = {}
+
+    def has_new_data(self, config: EndpointConfig) -> bool:
+        key = f"{config.endpoint_type}:{config.name}"
+        previous = self._previous.get(key, {})
+        try:
+            if config.endpoint_type == 'file':
+                current, changed = self._check_files(config, previous)
+            else:
+                current, changed = self._check_database(config, previous)
+        except Exception as e:
+            # An unreachable endpoint would only produce a failing run
+            self._context.log.info(f"Skipping {config.name}: change check failed ({str(e)})")
+            self.state[key] = previous
+            return False
+
+        if changed and self._in_flight(config):
+            # Keep the old state so the change is picked up once the run finishes
+            self.state[key] = previous
+            return False
+        self.state[key] = current
+        return changed
+
+    def cursor(self) -> str:
+        return json.dumps(self.state, sort_keys=True)
+
+    def _check_database(self, config: EndpointConfig, previous: dict):
+        source_max = self._resources[config.endpoint_type].get_max_id(config.host, config.port, config.database)
+        if previous.get('caught_up') and previous.get('source_max') == source_max:
+            return previous, False
+
+        checkpoint = self._get_checkpoints().get((TARGET_TABLES[config.endpoint_type], config.name))
+        watermark = (checkpoint or {}).get('last_source_id') or 0
+        caught_up = watermark >= source_max
+        return {'source_max': source_max, 'caught_up': caught_up}, not caught_up
+
+    def _check_files(self, config: EndpointConfig, previous: dict):
+        checkpoint = self._get_checkpoints().get(('file_metadata', config.name))
+        last_folder = (checkpoint or {}).get('last_folder')
+        if config.file_source == 'remote':
+            from .manifest import fetch_manifest
+
+            # The remote manifest only lists settled folders, and answers 304 while its first page is unchanged
+            page = fetch_manifest(config.host, config.port, after=last_folder, limit=1, etag=previous.get('etag'))
+            if page.not_modified:
+                return previous, False
+            return {'etag': page.etag, 'last_folder': last_folder}, bool(page.folders)
+
+        mtime = os.stat(FILE_DATA_DIR).st_mtime_ns
+        now = time.time()
+        # A moved high-water mark means the last run found work, so there may be more
+        changed = (
+            mtime != previous.get('mtime')
+            or last_folder != previous.get('last_folder')
+            or now - previous.get('requested_at', 0) >= FILE_RECHECK_SECONDS
+        )
+        requested_at = now if changed else previous.get('requested_at', 0)
+        return {'mtime': mtime, 'last_folder': last_folder, 'requested_at': requested_at}, changed
+
+    def _get_checkpoints(self) -> dict:
+        if self._checkpoints is None:
+            self._checkpoints = self._supabase.get_checkpoints()
+        return self._checkpoints
+
+    def _in_flight(self, config: EndpointConfig) -> bool:
+        if self._busy is None:
+            self._busy = _busy_endpoints(self._context)
+        busy_names, busy_ids = self._busy
+        return config.name in busy_names or str(config.endpoint_id) in busy_ids
 
 
 @sensor(
     job_name="etl_job",
     default_status=DefaultSensorStatus.RUNNING,
-    minimum_interval_seconds=30
+    minimum_interval_seconds=30,
+    required_resource_keys=SENSOR_RESOURCE_KEYS
 )
-def endpoint_monitor_sensor(context: SensorEvaluationContext, supabase: SupabaseResource):
+def endpoint_monitor_sensor(context: SensorEvaluationContext):
     """
     Sensor that monitors the ingest_control table and triggers ETL jobs for active endpoints
     """
+    supabase = context.resources.supabase
     context.log.info("Checking ingest_control table for active endpoints...")
 
     try:
-        # Query active endpoints
-        query = """
-            SELECT id, ip_address, port, name, chunk_size, max_chunks_per_run, endpoint_type, database_name
+        # Query active endpoints (CDC endpoints are streamed by the cdc-consumer service instead)
+        query = f"""
+            SELECT {CONTROL_COLUMNS}
             FROM ingest_control
-            WHERE active = true
+            WHERE active = true AND ingest_mode = 'poll'
             ORDER BY id
         """
         active_endpoints = supabase.execute_query(query)
@@ -27,42 +216,43 @@ def endpoint_monitor_sensor(context: SensorEvaluationContext, supabase: Supabase
         if not active_endpoints:
             return SkipReason("No active endpoints found")
 
-        context.log.info(f"Found {len(active_endpoints)} active endpoint(s)")
+        context.log.info(f"Found {len(active_endpoints)} active endpoint(s) (run mode: {RUN_MODE})")
 
-        # Generate run requests for each active endpoint
+        # Generate run requests for each active endpoint that may have new data
+        detector = _ChangeDetector(context, supabase, _source_resources(context))
         run_requests = []
+        fanout_groups = {}
+        async_endpoints = []
 
         for endpoint in active_endpoints:
             endpoint_type = endpoint['endpoint_type']
             endpoint_name = endpoint['name']
 
-            # Determine which asset to run based on endpoint type
-            if endpoint_type == 'mysql':
-                asset_selection = [ingest_mysql_data.key]
-            elif endpoint_type == 'postgres':
-                asset_selection = [ingest_postgres_data.key]
-            elif endpoint_type == 'file':
-                asset_selection = [ingest_file_data.key]
-            else:
+            if endpoint_type == 'file' and FILE_DISCOVERY == 'events' and endpoint.get('file_source') != 'remote':
+                # file_event_sensor requests these runs
+                continue
+
+            # Determine which assets to run from the endpoint type's connector
+            asset_selection = _asset_selection(endpoint_type)
+            if asset_selection is None:
                 context.log.warning(f"Unknown endpoint type: {endpoint_type}")
                 continue
 
+            if CHANGE_DETECTION and not detector.has_new_data(EndpointConfig.from_control_row(endpoint)):
+                continue
+
+            if ENGINE == 'async' and endpoint_type in ASYNC_SOURCES:
+                async_endpoints.append(endpoint)
+                continue
+
+            if RUN_MODE == 'fanout' and endpoint_type in FANOUT_TYPES:
+                fanout_groups.setdefault(endpoint_type, (asset_selection, []))[1].append(endpoint)
+                continue
+
             # Create tags for the run
-            tags = {
-                "endpoint_name": endpoint_name,
-                "endpoint_host": endpoint['ip_address'],
-                "endpoint_port": str(endpoint['port']),
-                "endpoint_type": endpoint_type,
-                "chunk_size": str(endpoint['chunk_size']),
-                "max_chunks_per_run": str(endpoint['max_chunks_per_run'])
-            }
-
-            # Add database name for database endpoints
-            if endpoint.get('database_name'):
-                tags["endpoint_db"] = endpoint['database_name']
+            tags = EndpointConfig.from_control_row(endpoint).to_tags()
 
             # Create run request
-            import time
             run_key = f"{endpoint_type}_{endpoint_name}_{int(time.time())}"
 
             run_request = RunRequest(
@@ -74,8 +264,228 @@ def endpoint_monitor_sensor(context: SensorEvaluationContext, supabase: Supabase
             run_requests.append(run_request)
             context.log.info(f"Scheduling ETL for {endpoint_type} endpoint: {endpoint_name}")
 
+        # One run per group of same-type endpoints; the asset looks their settings up by id
+        for endpoint_type, (asset_selection, endpoints) in fanout_groups.items():
+            for start in range(0, len(endpoints), FANOUT_BATCH):
+                group = endpoints[start:start + FANOUT_BATCH]
+                ids = ','.join(str(e['id']) for e in group)
+                run_requests.append(RunRequest(
+                    run_key=f"{endpoint_type}_fanout_{group[0]['id']}-{group[-1]['id']}_{int(time.time())}",
+                    tags={
+                        "endpoint_type": endpoint_type,
+                        "endpoint_ids": ids,
+                        "fanout_workers": str(FANOUT_WORKERS),
+                    },
+                    asset_selection=asset_selection
+                ))
+                context.log.info(f"Scheduling fan-out ETL for {len(group)} {endpoint_type} endpoint(s)")
+
+        # Both database types share async runs; one event loop drives the whole group
+        for start in range(0, len(async_endpoints), ASYNC_BATCH):
+            group = async_endpoints[start:start + ASYNC_BATCH]
+            run_requests.append(RunRequest(
+                run_key=f"async_{group[0]['id']}-{group[-1]['id']}_{int(time.time())}",
+                tags={
+                    "ingest_engine": "async",
+                    "endpoint_ids": ','.join(str(e['id']) for e in group),
+                },
+                asset_selection=[ingest_async_data.key]
+            ))
+            context.log.info(f"Scheduling async ETL for {len(group)} database endpoint(s)")
+
+        context.update_cursor(detector.cursor())
+        if not run_requests:
+            return SkipReason("No endpoint has new data")
         return run_requests
 
     except Exception as e:
         context.log.error(f"Error in endpoint_monitor_sensor: {str(e)}")
         return SkipReason(f"Error: {str(e)}")
+
+
+@sensor(
+    jobs=list(BACKFILL_JOBS.values()),
+    default_status=DefaultSensorStatus.RUNNING,
+    minimum_interval_seconds=300,
+    required_resource_keys=SENSOR_RESOURCE_KEYS
+)
+def backfill_planner_sensor(context: SensorEvaluationContext):
+    """
+    Sensor that splits large database backlogs into partitioned backfill runs
+    """
+    supabase = context.resources.supabase
+    try:
+        query = f"""
+            SELECT {CONTROL_COLUMNS}
+            FROM ingest_control
+            WHERE active = true AND ingest_mode = 'poll' AND endpoint_type = ANY(%s)
+            ORDER BY id
+        """
+        endpoints = supabase.execute_query(query, (list(CONNECTORS),))
+        if not endpoints:
+            return SkipReason("No active database endpoints found")
+
+        # Skip endpoints with an incremental run in flight: it reads from the
+        # watermark this sensor is about to move
+        busy_names, busy_ids = _busy_endpoints(context)
+
+        resources = _source_resources(context)
+        run_requests = []
+        new_partitions = {}
+
+        # Ranges planned earlier whose run failed, or was never launched, are requested again
+        table_types = {connector.table: endpoint_type for endpoint_type, connector in CONNECTORS.items()}
+        in_flight = _backfill_partitions_in_flight(context)
+        for pending in supabase.get_pending_backfills():
+            table, key = pending['target_table'], pending['partition_key']
+            if key in in_flight or table not in table_types:
+                continue
+            if pending['attempts'] >= BACKFILL_MAX_ATTEMPTS:
+                context.log.warning(
+                    f"Backfill partition {key} of {pending['endpoint_name']} is still not loaded after "
+                    f"{pending['attempts']} run(s); re-run it from the Dagster UI"
+                )
+                continue
+            endpoint_type = table_types[table]
+            attempt = supabase.retry_backfill(table, key)
+            new_partitions.setdefault(endpoint_type, []).append(key)
+            run_requests.append(RunRequest(
+                run_key=f"backfill_{endpoint_type}_{key}_attempt{attempt}",
+                job_name=BACKFILL_JOBS[endpoint_type].name,
+                partition_key=key,
+                tags={"endpoint_name": pending['endpoint_name'], "endpoint_type": endpoint_type}
+            ))
+            context.log.info(f"Requesting backfill partition {key} of {pending['endpoint_name']} again (attempt {attempt})")
+
+        for row in endpoints:
+            config = EndpointConfig.from_control_row(row)
+            if config.name in busy_names or str(config.endpoint_id) in busy_ids:
+                continue
+
+            table, job = CONNECTORS[config.endpoint_type].table, BACKFILL_JOBS[config.endpoint_type]
+            watermark = supabase.get_watermark(table, config.name)
+            try:
+                source_max = resources[config.endpoint_type].get_max_id(config.host, config.port, config.database)
+            except Exception as e:
+                context.log.warning(f"Could not read max id from {config.name}: {str(e)}")
+                continue
+
+            if source_max - watermark < BACKFILL_MIN_BACKLOG:
+                continue
+
+            ranges = plan_ranges(watermark, source_max, BACKFILL_PARTITION_ROWS)[:BACKFILL_MAX_PARTITIONS]
+            keys = [partition_key(config.endpoint_id, after_id, up_to_id) for after_id, up_to_id in ranges]
+            # Record the ranges before requesting them: a range whose run never loads it stays pending
+            supabase.plan_backfill(table, config.name, keys, ranges[-1][1])
+            new_partitions.setdefault(config.endpoint_type, []).extend(keys)
+
+            for key in keys:
+                run_requests.append(RunRequest(
+                    run_key=f"backfill_{config.endpoint_type}_{key}",
+                    job_name=job.name,
+                    partition_key=key,
+                    tags={"endpoint_name": config.name, "endpoint_type": config.endpoint_type}
+                ))
+            context.log.info(
+                f"Planned {len(keys)} backfill partition(s) for {config.name}: ids {watermark} -> {ranges[-1][1]} "
+                f"(backlog {source_max - watermark})"
+            )
+
+        if not run_requests:
+            return SkipReason("No endpoint has a backlog large enough to backfill")
+
+        return SensorResult(
+            run_requests=run_requests,
+            dynamic_partitions_requests=[
+                AddDynamicPartitionsRequest(partitions_def_name=BACKFILL_PARTITIONS[endpoint_type].name, partition_keys=keys)
+                for endpoint_type, keys in new_partitions.items()
+            ]
+        )
+
+    except Exception as e:
+        context.log.error(f"Error in backfill_planner_sensor: {str(e)}")
+        return SkipReason(f"Error: {str(e)}")
+
+
+@sensor(
+    job_name="etl_job",
+    default_status=DefaultSensorStatus.RUNNING if FILE_DISCOVERY == 'events' else DefaultSensorStatus.STOPPED,
+    minimum_interval_seconds=FILE_EVENT_INTERVAL,
+    required_resource_keys={"supabase"}
+)
+def file_event_sensor(context: SensorEvaluationContext):
+    """
+    Sensor that ingests the folders the file watcher reported complete
+
+    The cursor holds the last file_events id handed to a run for each
+    endpoint, so each event is requested once, in runs of at most
+    max_chunks_per_run folders. Every INGEST_FILE_RECHECK_SECONDS a plain run
+    is requested as well; its high-water scan (or reconciliation sweep) picks
+    up folders written while the watcher was down.
+    """
+    supabase = context.resources.supabase
+    cursor = json.loads(context.cursor) if context.cursor else {}
+    # Cursors from before events were recorded per endpoint hold a single id
+    last_event_ids = cursor.get('event_ids', {})
+    default_event_id = cursor.get('event_id', 0)
+    try:
+        query = f"""
+            SELECT {CONTROL_COLUMNS}
+            FROM ingest_control
+            WHERE active = true AND ingest_mode = 'poll' AND endpoint_type = 'file' AND file_source = 'local'
+            ORDER BY id
+        """
+        endpoints = [EndpointConfig.from_control_row(row) for row in supabase.execute_query(query)]
+        if not endpoints:
+            return SkipReason("No active file endpoints found")
+
+        run_requests = []
+        # Inactive endpoints keep their position for when they are reactivated
+        event_ids = dict(last_event_ids)
+        for config in endpoints:
+            last_event_id = last_event_ids.get(config.name, default_event_id)
+            ids = [
+                row['id'] for row in supabase.execute_query(
+                    "SELECT id FROM file_events WHERE endpoint_name = %s AND id > %s ORDER BY id LIMIT %s",
+                    (config.name, last_event_id, FILE_EVENT_BATCH)
+                )
+            ]
+            for start in range(0, len(ids), config.max_chunks_per_run):
+                after_id = ids[start - 1] if start else last_event_id
+                up_to_id = ids[min(start + config.max_chunks_per_run, len(ids)) - 1]
+                run_requests.append(RunRequest(
+                    run_key=f"file_events_{config.endpoint_id}_{after_id}-{up_to_id}",
+                    tags={**config.to_tags(), "file_event_range": f"{after_id}-{up_to_id}"},
+                    asset_selection=_asset_selection('file')
+                ))
+            if ids:
+                context.log.info(f"Scheduling ingestion of {len(ids)} completed folder(s) for {config.name}")
+            event_ids[config.name] = ids[-1] if ids else last_event_id
+
+        swept_at = cursor.get('swept_at', 0)
+        if time.time() - swept_at >= FILE_RECHECK_SECONDS:
+            busy_names, busy_ids = _busy_endpoints(context)
+            for config in endpoints:
+                # Events a day old have long been handed to runs
+                supabase.execute_query(
+                    "DELETE FROM file_events WHERE endpoint_name = %s AND id <= %s "
+                    "AND detected_at < CURRENT_TIMESTAMP - INTERVAL '1 day'",
+                    (config.name, event_ids[config.name])
+                )
+                if config.name in busy_names or str(config.endpoint_id) in busy_ids:
+                    continue
+                run_requests.append(RunRequest(
+                    run_key=f"file_{config.name}_{int(time.time())}",
+                    tags=config.to_tags(),
+                    asset_selection=_asset_selection('file')
+                ))
+            swept_at = time.time()
+
+        context.update_cursor(json.dumps({"event_ids": event_ids, "swept_at": swept_at}))
+        if not run_requests:
+            return SkipReason("No completed folders reported")
+        return run_requests
+
+    except Exception as e:
+        context.log.error(f"Error in file_event_sensor: {str(e)}")
+        return SkipReason(f"Error: {str(e)}")
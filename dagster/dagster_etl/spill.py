@@ -0,0 +1,265 @@
+"""
+Local spill buffer for chunks Supabase cannot take right now.
+
+When a chunk fails to load because Supabase is down or out of connections,
+it is appended to a segment file on local disk instead of failing the run,
+and source reading carries on. Each segment holds one chunk as the raw
+arrays of its MeasurementBatch (ids, timestamps, the channel matrix),
+zlib-compressed unless INGEST_SPILL_COMPRESSION is 0, in which case the
+arrays are memory-mapped straight from the file on replay.
+
+Segments live under <root>/<table>/<endpoint>/ and are named after the
+chunk's source id range, zero-padded, so a directory listing is replay
+order and the newest name is the endpoint's spilled watermark. A segment is
+written to a temporary file and renamed into place, so a crash never leaves
+a partial segment behind. Replay loads consecutive segments in one
+transaction with the checkpoint, then deletes them; a crash between commit
+and delete only replays rows the upsert load mode already skips.
+"""
+import json
+import os
+import re
+import struct
+import zlib
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import psycopg2
+
+from .columnar import MeasurementBatch, batch_columns
+from .pool import PoolTimeout
+
+# Errors that mean Supabase is unreachable or saturated, not that the chunk is bad
+SINK_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeout)
+
+SPILL_MODES = ('off', 'fallback', 'always')
+
+_MAGIC = b"SPILL1\n"
+_HEADER_LENGTH = struct.Struct("<I")
+_SEGMENT_PATTERN = re.compile(r"^(\d{20})-(\d{20})\.seg$")
+
+
+class SpillFull(Exception):
+    """The spill buffer reached its size limit"""
+
+
+class SpillBuffer:
+    """Append-only chunk segments on local disk, one directory per (table, endpoint)"""
+
+    def __init__(self, root: str, max_bytes: int = 0, compression: int = 1):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.compression = compression
+        # Bytes held across every segment, read from disk on first use and
+        # kept up to date by append and discard from then on
+        self._bytes: Optional[int] = None
+
+    def _directory(self, table: str, endpoint_name: str) -> Path:
+        return self.root / table / re.sub(r"[^A-Za-z0-9_.-]", "_", endpoint_name)
+
+    def segments(self, table: str, endpoint_name: str) -> List[Path]:
+        """The endpoint's segments in source id order"""
+        directory = self._directory(table, endpoint_name)
+        if not directory.is_dir():
+            return []
+        return sorted(path for path in directory.iterdir() if _SEGMENT_PATTERN.match(path.name))
+
+    def watermark(self, table: str, endpoint_name: str) -> int:
+        """Last source id held in the endpoint's segments (0 if none)"""
+        segments = self.segments(table, endpoint_name)
+        return int(_SEGMENT_PATTERN.match(segments[-1].name).group(2)) if segments else 0
+
+    def size(self) -> int:
+        """Bytes currently held across every segment"""
+        if self._bytes is None:
+            self._bytes = sum(path.stat().st_size for path in self.root.glob("*/*/*.seg"))
+        return self._bytes
+
+    def append(self, table: str, endpoint_name: str, batch: MeasurementBatch) -> Path:
+        """Write a chunk as a new segment and return its path"""
+        held = self.size()
+        if self.max_bytes and held >= self.max_bytes:
+            raise SpillFull(f"Spill buffer {self.root} holds {self.max_bytes} bytes or more; not spilling any further")
+
+        payload = batch.ids.astype("<i8").tobytes() + batch.timestamps.view(np.int64).astype("<i8").tobytes() \
+            + batch.values.astype("<f8").tobytes()
+        if self.compression:
+            payload = zlib.compress(payload, self.compression)
+        header = json.dumps({
+            "endpoint_name": endpoint_name,
+            "channels": list(batch.channels),
+            "rows": len(batch),
+            "compressed": bool(self.compression),
+        }).encode()
+
+        directory = self._directory(table, endpoint_name)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{int(batch.ids[0]):020d}-{batch.last_id:020d}.seg"
+        partial = path.with_suffix(".tmp")
+        try:
+            with open(partial, "wb") as f:
+                f.write(_MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+                # Keep the arrays 8-byte aligned so uncompressed segments can be memory-mapped
+                f.write(b"\0" * (-f.tell() % 8))
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial, path)
+        except BaseException:
+            # A full disk must not leave partial segments taking up what space there is
+            partial.unlink(missing_ok=True)
+            raise
+        self._bytes = held + path.stat().st_size
+        return path
+
+    @staticmethod
+    def read(path: Path) -> MeasurementBatch:
+        """Load a segment back into a MeasurementBatch tagged with its endpoint"""
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a spill segment")
+            (length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+            header = json.loads(f.read(length))
+            offset = f.tell() + (-f.tell() % 8)
+            f.seek(offset)
+            compressed = f.read() if header["compressed"] else None
+
+        rows, channels = header["rows"], header["channels"]
+        if compressed is None:
+            arrays = np.memmap(path, dtype="<i8", mode="r", offset=offset, shape=(2 + len(channels)) * rows)
+        else:
+            arrays = np.frombuffer(zlib.decompress(compressed), dtype="<i8")
+        return MeasurementBatch(
+            arrays[:rows].astype(np.int64, copy=False),
+            arrays[rows:2 * rows].astype(np.int64, copy=False).view("datetime64[us]"),
+            arrays[2 * rows:].view("<f8").astype(np.float64, copy=False).reshape(len(channels), rows),
+            channels,
+            header["endpoint_name"],
+        )
+
+    def discard(self, path: Path):
+        held = self.size()
+        try:
+            freed = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        self._bytes = max(held - freed, 0)
+
+
+def concat(batches: List[MeasurementBatch]) -> MeasurementBatch:
+    """One batch holding the given batches' rows in order"""
+    if len(batches) == 1:
+        return batches[0]
+    return MeasurementBatch(
+        np.concatenate([b.ids for b in batches]),
+        np.concatenate([b.timestamps for b in batches]),
+        np.concatenate([b.values for b in batches], axis=1),
+        batches[0].channels,
+        batches[0].endpoint_name,
+    )
+
+
+class SpillingSink:
+    """
+    Loads an endpoint's chunks into Supabase with their checkpoint, diverting
+    them to the spill buffer when Supabase is unavailable.
+
+    In 'fallback' mode chunks go straight to Supabase until a load fails with
+    one of SINK_ERRORS; from then on (and whenever segments are still pending
+    from an earlier run) chunks are spilled, so they reach Supabase in source
+    order. In 'always' mode every chunk is written ahead to disk and the
+    buffer is drained at the end of the run. With no buffer, load() is a
+    plain insert_batch.
+    """
+
+    def __init__(self, supabase, spill: Optional[SpillBuffer], table: str, channels, endpoint_name: str, log,
+                 write_ahead: bool = False, replay_rows: int = 100_000):
+        self.supabase = supabase
+        self.spill = spill
+        self.table = table
+        self.channels = tuple(channels)
+        self.endpoint_name = endpoint_name
+        self.log = log
+        self.write_ahead = write_ahead
+        self.replay_rows = replay_rows
+        self.healthy = True
+        self.committed_id = 0
+        self.spilled_rows = 0
+        # Rows committed from replayed segments, and the last source id they reached
+        self.replayed_rows = 0
+        self.replayed_id = 0
+
+    def start(self) -> int:
+        """Replay pending segments and return the source id to resume reading after"""
+        if self.spill is None:
+            self.committed_id = self.supabase.get_watermark(self.table, self.endpoint_name)
+            return self.committed_id
+        try:
+            self.committed_id = self.supabase.get_watermark(self.table, self.endpoint_name)
+        except SINK_ERRORS as e:
+            spilled_id = self.spill.watermark(self.table, self.endpoint_name)
+            if not spilled_id:
+                raise
+            self.log.warning(f"Supabase unavailable ({e}); resuming after spilled id {spilled_id}")
+            self.healthy = False
+            return spilled_id
+        self.drain()
+        return max(self.committed_id, self.replayed_id, self.spill.watermark(self.table, self.endpoint_name))
+
+    def load(self, values, last_id: int, timings: dict = None) -> int:
+        """Load one chunk and return the rows committed to Supabase (0 if it was spilled)"""
+        if self.spill is not None and (
+            self.write_ahead or not self.healthy or self.spill.segments(self.table, self.endpoint_name)
+        ):
+            return self._spill(values)
+        try:
+            return self.supabase.insert_batch(
+                self.table, batch_columns(self.channels), values,
+                checkpoint={'endpoint_name': self.endpoint_name, 'last_source_id': last_id},
+                timings=timings
+            )
+        except SINK_ERRORS as e:
+            if self.spill is None:
+                raise
+            self.log.warning(f"Supabase unavailable ({e}); spilling chunks to {self.spill.root}")
+            self.healthy = False
+            return self._spill(values)
+
+    def finish(self):
+        """Replay what this run spilled, if Supabase is up"""
+        if self.spill is not None and self.healthy:
+            self.drain()
+
+    def drain(self):
+        """Replay the endpoint's segments oldest first, several per transaction"""
+        segments = self.spill.segments(self.table, self.endpoint_name)
+        while segments:
+            group, batches = [], []
+            while segments and (not batches or sum(len(b) for b in batches) < self.replay_rows):
+                group.append(segments.pop(0))
+                batches.append(self.spill.read(group[-1]))
+            batch = concat(batches)
+            try:
+                rows_inserted = self.supabase.insert_batch(
+                    self.table, batch_columns(batch.channels), batch,
+                    checkpoint={'endpoint_name': self.endpoint_name, 'last_source_id': batch.last_id}
+                )
+            except SINK_ERRORS as e:
+                self.log.warning(f"Supabase unavailable ({e}); {len(segments) + len(group)} segment(s) left to replay")
+                self.healthy = False
+                break
+            for path in group:
+                self.spill.discard(path)
+            self.replayed_rows += rows_inserted
+            self.replayed_id = batch.last_id
+            self.log.info(f"Replayed {len(batch)} spilled rows from {len(group)} segment(s) (last_id: {batch.last_id})")
+
+    def _spill(self, values) -> int:
+        if not isinstance(values, MeasurementBatch):
+            # Row tuples carry endpoint_name last
+            values = MeasurementBatch.from_rows([row[:-1] for row in values], self.channels)
+        self.spill.append(self.table, self.endpoint_name, values)
+        self.spilled_rows += len(values)
+        return 0
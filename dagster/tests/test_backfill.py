@@ -0,0 +1,42 @@
+"""
+Backfill id-range planning and partition keys.
+"""
+import pytest
+
+from dagster_etl.backfill import parse_partition_key, partition_key, plan_ranges
+
+
+@pytest.mark.parametrize('after_id, up_to_id, rows, expected', [
+    (0, 10, 5, [(0, 5), (5, 10)]),
+    # The last range is cut short at up_to_id
+    (0, 11, 5, [(0, 5), (5, 10), (10, 11)]),
+    (100, 101, 5, [(100, 101)]),
+    (7, 7, 5, []),
+    (10, 3, 5, []),
+    (0, 3, 1, [(0, 1), (1, 2), (2, 3)]),
+])
+def test_plan_ranges(after_id, up_to_id, rows, expected):
+    assert plan_ranges(after_id, up_to_id, rows) == expected
+
+
+@pytest.mark.parametrize('after_id, up_to_id, rows', [(0, 1_000_003, 50_000), (12_345, 99_999, 7), (5, 6, 1_000)])
+def test_ranges_tile_the_backlog_without_gaps_or_overlaps(after_id, up_to_id, rows):
+    ranges = plan_ranges(after_id, up_to_id, rows)
+    assert ranges[0][0] == after_id and ranges[-1][1] == up_to_id
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert start == end
+    assert all(0 < end - start <= rows for start, end in ranges)
+    assert sum(end - start for start, end in ranges) == up_to_id - after_id
+
+
+@pytest.mark.parametrize('rows', [0, -1])
+def test_plan_ranges_rejects_empty_partitions(rows):
+    with pytest.raises(ValueError):
+        plan_ranges(0, 10, rows)
+
+
+@pytest.mark.parametrize('endpoint_id, after_id, up_to_id', [(1, 0, 50_000), (42, 123_456_789, 123_506_789)])
+def test_partition_key_round_trip(endpoint_id, after_id, up_to_id):
+    key = partition_key(endpoint_id, after_id, up_to_id)
+    assert key == f'{endpoint_id}:{after_id}-{up_to_id}'
+    assert parse_partition_key(key) == (endpoint_id, after_id, up_to_id)
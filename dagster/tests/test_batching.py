@@ -0,0 +1,152 @@
+"""
+AdaptiveBatchSizer growth and shrinkage, alone and fed through a Prefetcher.
+"""
+import threading
+from collections import deque
+from contextlib import closing
+
+import pytest
+
+from dagster_etl.batching import AdaptiveBatchSizer, estimate_batch_bytes
+from dagster_etl.pipeline import Prefetcher
+
+
+def test_fast_chunks_grow_at_most_2x_per_chunk():
+    sizer = AdaptiveBatchSizer(100, floor=10, ceiling=10_000, target_chunk_seconds=2.0)
+    sizes = []
+    for _ in range(4):
+        # 10k rows/s would fill a 2s chunk with 20k rows
+        sizer.record(sizer.size, sizer.size / 10_000)
+        sizes.append(sizer.size)
+    assert sizes == [200, 400, 800, 1600]
+
+
+def test_slow_chunks_shrink_at_most_2x_per_chunk_down_to_the_floor():
+    sizer = AdaptiveBatchSizer(1000, floor=200, ceiling=10_000, target_chunk_seconds=2.0)
+    sizer.record(1000, 100.0)
+    assert sizer.size == 500
+    sizer.record(500, 100.0)
+    sizer.record(250, 100.0)
+    assert sizer.size == 200
+
+
+def test_steady_throughput_settles_on_the_target_chunk_time():
+    sizer = AdaptiveBatchSizer(1000, floor=10, ceiling=100_000, target_chunk_seconds=2.0)
+    for _ in range(20):
+        sizer.record(sizer.size, sizer.size / 3_000)
+    assert sizer.size == 6_000
+
+
+def test_initial_size_and_growth_are_clamped_to_the_ceiling():
+    sizer = AdaptiveBatchSizer(50_000, floor=10, ceiling=1_000)
+    assert sizer.size == 1_000
+    sizer.record(1_000, 0.001)
+    assert sizer.size == 1_000
+
+
+def test_memory_budget_caps_the_size():
+    sizer = AdaptiveBatchSizer(1_000, floor=10, ceiling=100_000, max_batch_bytes=1_000_000)
+    # 1 KB per row: only 1000 rows fit in the budget however fast the chunks are
+    sizer.record(1_000, 0.001, batch_bytes=1_000_000)
+    assert sizer.size == 1_000
+
+
+def test_short_chunk_does_not_count_as_throughput():
+    sizer = AdaptiveBatchSizer(1_000, floor=10, ceiling=100_000)
+    sizer.record(3, 1.0)
+    assert sizer.size == 1_000
+    assert sizer.rows_per_second is None
+
+
+def test_chunk_is_judged_against_the_size_it_was_requested_at():
+    sizer = AdaptiveBatchSizer(100, floor=10, ceiling=10_000)
+    sizer.record(100, 0.001)
+    assert sizer.size == 200
+    # A prefetched chunk fetched at the old size of 100 is full, not short
+    sizer.record(100, 0.001, requested=100)
+    assert sizer.size == 400
+    sizer.record(150, 0.001, requested=400)
+    assert sizer.size == 400
+
+
+def test_within_budget_uses_the_measured_throughput():
+    sizer = AdaptiveBatchSizer(1_000, floor=10, ceiling=1_000, time_budget_seconds=30.0)
+    assert sizer.within_budget()
+    # 10 rows/s: the next chunk, halved to 500 rows, would take 50s
+    sizer.record(1_000, 100.0)
+    assert sizer.size == 500
+    assert not sizer.within_budget()
+
+
+def test_invalid_bounds_are_rejected():
+    with pytest.raises(ValueError):
+        AdaptiveBatchSizer(100, floor=0, ceiling=10)
+    with pytest.raises(ValueError):
+        AdaptiveBatchSizer(100, floor=20, ceiling=10)
+
+
+def test_estimate_batch_bytes():
+    assert estimate_batch_bytes([]) == 0
+    assert estimate_batch_bytes([(1, 2.0)] * 10) == 10 * estimate_batch_bytes([(1, 2.0)])
+
+
+def stream(batch_size, total_rows: int):
+    """Yields lists of rows sized by batch_size(), like the endpoint resources' streams"""
+    remaining = total_rows
+    while remaining:
+        rows = [0] * min(batch_size(), remaining)
+        remaining -= len(rows)
+        yield rows
+
+
+def test_prefetched_chunks_keep_growing_the_size():
+    sizer = AdaptiveBatchSizer(100, floor=10, ceiling=1_600, target_chunk_seconds=2.0)
+    requested_sizes = deque()
+    lock = threading.Lock()
+
+    def batch_size() -> int:
+        with lock:
+            requested_sizes.append(sizer.next_size())
+            return requested_sizes[-1]
+
+    seen, sizes = [], []
+    with closing(Prefetcher(stream(batch_size, 20_000), depth=2)) as batches:
+        for rows in batches:
+            seen.append(len(rows))
+            with lock:
+                sizer.record(len(rows), len(rows) / 10_000, requested=requested_sizes.popleft())
+                sizes.append(sizer.size)
+
+    assert sum(seen) == 20_000
+    # Every full chunk counts, even one requested before the sizer last grew
+    assert sizes[:4] == [200, 400, 800, 1_600]
+
+
+def test_prefetcher_keeps_order_and_reraises_producer_errors():
+    def failing():
+        yield 1
+        yield 2
+        raise RuntimeError("source went away")
+
+    batches = Prefetcher(failing(), depth=1)
+    assert next(batches) == 1
+    assert next(batches) == 2
+    with pytest.raises(RuntimeError, match="source went away"):
+        next(batches)
+    with pytest.raises(StopIteration):
+        next(batches)
+
+
+def test_prefetcher_close_closes_the_source():
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield 0
+        finally:
+            closed.set()
+
+    with closing(Prefetcher(endless(), depth=2)) as batches:
+        next(batches)
+    assert closed.wait(5)
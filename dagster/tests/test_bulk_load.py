@@ -0,0 +1,139 @@
+"""
+CSV serialization for COPY FROM STDIN, and the COPY-then-VALUES fallback of SupabaseResource.
+"""
+import csv
+import io
+from types import SimpleNamespace
+
+import pytest
+from psycopg2 import errors
+
+from dagster_etl import resources
+from dagster_etl.bulk_load import CsvRowStream, copy_rows
+from dagster_etl.resources import SupabaseResource
+
+COLUMNS = ['endpoint_name', 'timestamp', 'accel_x']
+
+
+class FakeCursor:
+    """Records every statement; COPY raises copy_error if given, like a view or RLS-protected table"""
+
+    def __init__(self, copy_error: Exception = None):
+        self.copy_error = copy_error
+        self.statements = []
+        self.copied = ''
+        self.rowcount = -1
+        self.connection = SimpleNamespace(encoding='UTF8')
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql.decode() if isinstance(sql, bytes) else sql)
+
+    def mogrify(self, template, args):
+        return template % tuple(repr(arg).encode() for arg in args)
+
+    def copy_expert(self, sql, file, size=8192):
+        self.statements.append(sql)
+        if self.copy_error is not None:
+            raise self.copy_error
+        while True:
+            data = file.read(size)
+            if not data:
+                break
+            self.copied += data
+        self.rowcount = self.copied.count('\n')
+
+
+def test_csv_escapes_quotes_separators_and_newlines():
+    rows = [
+        ('plain', 1, 0.5),
+        ('say "hi"', 2, -1.25),
+        ('a,b', 3, 1e-06),
+        ('line one\nline two', 4, 0.0),
+    ]
+    data = CsvRowStream(rows).read()
+
+    assert data.splitlines()[:3] == ['plain,1,0.5', '"say ""hi""",2,-1.25', '"a,b",3,1e-06']
+    # COPY's CSV parser reads back exactly what was written
+    assert [tuple(row) for row in csv.reader(io.StringIO(data))] == [
+        (name, str(number), str(value)) for name, number, value in rows
+    ]
+
+
+def test_none_is_written_as_an_unquoted_empty_field():
+    # Unquoted empty is COPY's default NULL in CSV format; a quoted "" would load as an empty string
+    assert CsvRowStream([('e', None, 1.0), (None, None, None)]).read() == 'e,,1.0\n,,\n'
+
+
+def test_stream_serves_any_read_size_and_counts_rows():
+    rows = [(f'endpoint-{i}', i, i / 8) for i in range(25)]
+    expected = CsvRowStream(rows).read()
+
+    stream = CsvRowStream(rows, rows_per_fill=4)
+    chunks = iter(lambda: stream.read(7), '')
+    assert ''.join(chunks) == expected
+    assert stream.rows_read == 25
+    assert stream.read() == ''
+
+
+def test_copy_rows_streams_csv_and_returns_the_copy_count():
+    cursor = FakeCursor()
+    loaded = copy_rows(cursor, 'accelerometer_data', COLUMNS, iter([('e', '2024-03-01 12:00:00', 1.5)] * 3))
+
+    assert loaded == 3
+    assert cursor.statements == ["COPY accelerometer_data (endpoint_name, timestamp, accel_x) FROM STDIN WITH (FORMAT csv)"]
+    assert cursor.copied == 'e,2024-03-01 12:00:00,1.5\n' * 3
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    # Tables COPY was refused on are remembered process-wide
+    monkeypatch.setattr(resources, '_copy_unsupported_tables', set())
+    return SupabaseResource(bulk_load_method='copy')
+
+
+ROWS = [('e', '2024-03-01 12:00:00', 1.5), ('e', '2024-03-01 12:00:01', None)]
+
+
+def test_copy_runs_inside_a_savepoint(supabase):
+    cursor = FakeCursor()
+    assert supabase._bulk_load(cursor, 'sensor_view', COLUMNS, ROWS) == 2
+    assert cursor.statements[0] == "SAVEPOINT bulk_load"
+    assert cursor.statements[1].startswith("COPY sensor_view ")
+    assert cursor.statements[2:] == ["RELEASE SAVEPOINT bulk_load"]
+
+
+def test_refused_copy_falls_back_to_values_for_the_rest_of_the_process(supabase):
+    cursor = FakeCursor(copy_error=errors.InsufficientPrivilege("permission denied for view sensor_view"))
+    assert supabase._bulk_load(cursor, 'sensor_view', COLUMNS, ROWS) == 2
+
+    assert cursor.statements[:3] == [
+        "SAVEPOINT bulk_load",
+        "COPY sensor_view (endpoint_name, timestamp, accel_x) FROM STDIN WITH (FORMAT csv)",
+        "ROLLBACK TO SAVEPOINT bulk_load",
+    ]
+    assert cursor.statements[3] == (
+        "INSERT INTO sensor_view (endpoint_name, timestamp, accel_x) VALUES "
+        "('e','2024-03-01 12:00:00',1.5),('e','2024-03-01 12:00:01',None)"
+    )
+
+    # The next batch skips straight to VALUES, without a savepoint
+    cursor = FakeCursor()
+    assert supabase._bulk_load(cursor, 'sensor_view', COLUMNS, ROWS) == 2
+    assert len(cursor.statements) == 1 and cursor.statements[0].startswith("INSERT INTO sensor_view ")
+
+
+def test_refused_copy_of_a_one_shot_iterator_is_reraised(supabase):
+    # Rows COPY already consumed can't be replayed as VALUES
+    cursor = FakeCursor(copy_error=errors.FeatureNotSupported("cannot copy to view"))
+    with pytest.raises(errors.FeatureNotSupported):
+        supabase._bulk_load(cursor, 'sensor_view', COLUMNS, iter(ROWS))
+    assert cursor.statements[-1] == "ROLLBACK TO SAVEPOINT bulk_load"
+    assert 'sensor_view' not in resources._copy_unsupported_tables
+
+
+def test_bad_data_is_not_retried_with_values(supabase):
+    cursor = FakeCursor(copy_error=errors.InvalidTextRepresentation("invalid input syntax for type numeric"))
+    with pytest.raises(errors.InvalidTextRepresentation):
+        supabase._bulk_load(cursor, 'accelerometer_data', COLUMNS, ROWS)
+    assert not any(statement.startswith("INSERT") for statement in cursor.statements)
+    assert 'accelerometer_data' not in resources._copy_unsupported_tables
@@ -0,0 +1,118 @@
+"""
+PgOutputDecoder against pgoutput protocol version 1 messages built byte by byte.
+"""
+import struct
+from datetime import datetime
+
+from dagster_etl.cdc import PgOutputDecoder
+from dagster_etl.resources import POSTGRES_MEASUREMENT_COLUMNS
+
+# 2024-03-01 12:00:00 UTC in microseconds since the PostgreSQL epoch (2000-01-01)
+COMMIT_TIME = 762_609_600_000_000
+UNIX_COMMIT_TIME = 1_709_294_400.0
+
+
+def begin(final_lsn: int = 0x1000, commit_time: int = COMMIT_TIME, xid: int = 7) -> bytes:
+    return b'B' + struct.pack('>QqI', final_lsn, commit_time, xid)
+
+
+def relation(relation_id: int, table: str, columns, namespace: str = 'public') -> bytes:
+    message = b'R' + struct.pack('>I', relation_id) + namespace.encode() + b'\0' + table.encode() + b'\0'
+    # Replica identity 'd' (default), then the column count
+    message += b'd' + struct.pack('>h', len(columns))
+    for column in columns:
+        # Flags (1 = part of the key), name, type oid and type modifier
+        message += struct.pack('>b', int(column == 'id')) + column.encode() + b'\0' + struct.pack('>Ii', 25, -1)
+    return message
+
+
+def insert(relation_id: int, values) -> bytes:
+    message = b'I' + struct.pack('>I', relation_id) + b'N' + struct.pack('>h', len(values))
+    for value in values:
+        if value is None:
+            message += b'n'
+        else:
+            encoded = value.encode()
+            message += b't' + struct.pack('>i', len(encoded)) + encoded
+    return message
+
+
+def commit(end_lsn: int, commit_lsn: int = 0x1000, commit_time: int = COMMIT_TIME) -> bytes:
+    return b'C' + struct.pack('>BQQq', 0, commit_lsn, end_lsn, commit_time)
+
+
+def decoder() -> PgOutputDecoder:
+    return PgOutputDecoder('measurements', POSTGRES_MEASUREMENT_COLUMNS)
+
+
+def test_transaction_of_inserts_becomes_one_change_batch():
+    messages = [
+        begin(),
+        relation(16385, 'measurements', POSTGRES_MEASUREMENT_COLUMNS),
+        insert(16385, ['1', '2024-03-01 11:59:59.5', '0.125', '-1.5', '9.81', '10', '20', '-30']),
+        insert(16385, ['2', '2024-03-01 12:00:00', '0', '0', '0', '1.5', '2.5', '3.5']),
+    ]
+    stream = decoder()
+    assert [stream.feed(message) for message in messages] == [None] * 4
+
+    change = stream.feed(commit(end_lsn=0x2a00))
+    assert change.position == 0x2a00
+    assert change.committed_at == UNIX_COMMIT_TIME
+    assert change.rows == [
+        (1, datetime(2024, 3, 1, 11, 59, 59, 500000), 0.125, -1.5, 9.81, 10.0, 20.0, -30.0),
+        (2, datetime(2024, 3, 1, 12, 0, 0), 0.0, 0.0, 0.0, 1.5, 2.5, 3.5),
+    ]
+
+
+def test_null_channels_decode_as_none():
+    stream = decoder()
+    stream.feed(begin())
+    stream.feed(relation(1, 'measurements', POSTGRES_MEASUREMENT_COLUMNS))
+    stream.feed(insert(1, ['5', '2024-03-01 12:00:00', '1.0', None, '3.0', None, None, '6.0']))
+    change = stream.feed(commit(end_lsn=100))
+    assert change.rows == [(5, datetime(2024, 3, 1, 12, 0, 0), 1.0, None, 3.0, None, None, 6.0)]
+
+
+def test_columns_are_matched_by_name_not_position():
+    # A relation whose columns are in a different order than POSTGRES_MEASUREMENT_COLUMNS
+    columns = ['timestamp', 'mag_z', 'mag_y', 'mag_x', 'accel_z', 'accel_y', 'accel_x', 'id']
+    stream = decoder()
+    stream.feed(begin())
+    stream.feed(relation(9, 'measurements', columns))
+    stream.feed(insert(9, ['2024-03-01 12:00:00', '6', '5', '4', '3', '2', '1', '42']))
+    change = stream.feed(commit(end_lsn=200))
+    assert change.rows == [(42, datetime(2024, 3, 1, 12, 0, 0), 1.0, 2.0, 3.0, 4.0, 5.0, 6.0)]
+
+
+def test_other_tables_and_message_kinds_are_skipped():
+    stream = decoder()
+    stream.feed(begin())
+    stream.feed(relation(1, 'measurements', POSTGRES_MEASUREMENT_COLUMNS))
+    stream.feed(relation(2, 'audit_log', ['id', 'message']))
+    stream.feed(insert(2, ['1', 'ignored']))
+    # Update, delete and truncate of the source table carry no new rows
+    assert stream.feed(b'U' + struct.pack('>I', 1) + b'N' + struct.pack('>h', 0)) is None
+    assert stream.feed(b'D' + struct.pack('>I', 1) + b'K' + struct.pack('>h', 0)) is None
+    assert stream.feed(b'T' + struct.pack('>IbI', 1, 0, 1)) is None
+    # An insert for a relation that was never announced is dropped too
+    stream.feed(insert(3, ['1', '2024-03-01 12:00:00', '1', '2', '3', '4', '5', '6']))
+    change = stream.feed(commit(end_lsn=300))
+    assert change.position == 300
+    assert change.rows == []
+
+
+def test_relations_are_remembered_across_transactions():
+    stream = decoder()
+    stream.feed(begin())
+    stream.feed(relation(1, 'measurements', POSTGRES_MEASUREMENT_COLUMNS))
+    stream.feed(insert(1, ['1', '2024-03-01 12:00:00', '1', '1', '1', '1', '1', '1']))
+    first = stream.feed(commit(end_lsn=10))
+
+    # pgoutput only resends a Relation after the table changes
+    stream.feed(begin(commit_time=COMMIT_TIME + 2_500_000))
+    stream.feed(insert(1, ['2', '2024-03-01 12:00:01', '2', '2', '2', '2', '2', '2']))
+    second = stream.feed(commit(end_lsn=20))
+
+    assert [row[0] for row in first.rows] == [1]
+    assert [row[0] for row in second.rows] == [2]
+    assert second.committed_at == UNIX_COMMIT_TIME + 2.5
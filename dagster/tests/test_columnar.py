@@ -0,0 +1,166 @@
+"""
+Binary COPY encoding and decoding of MeasurementBatch, checked against a
+plain struct-based reading of PostgreSQL's binary COPY format.
+"""
+import struct
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from dagster_etl.columnar import (
+    DECIMAL_10_6_LIMIT, PG_EPOCH_OFFSET_US, PGCOPY_HEADER, PGCOPY_TRAILER, MeasurementBatch, PgBinaryRowReader,
+)
+
+CHANNELS = ('accel_x', 'accel_y', 'accel_z')
+PG_EPOCH = datetime(2000, 1, 1)
+
+
+def pg_binary(rows) -> bytes:
+    """Binary COPY of (id int8, timestamp, *channels float8) rows, as PostgreSQL writes it"""
+    out = [PGCOPY_HEADER]
+    for source_id, timestamp, *values in rows:
+        micros = (timestamp - PG_EPOCH) // timedelta(microseconds=1)
+        out.append(struct.pack(">h", 2 + len(values)))
+        out.append(struct.pack(">iq", 8, source_id) + struct.pack(">iq", 8, micros))
+        out.extend(struct.pack(">id", 8, value) for value in values)
+    out.append(PGCOPY_TRAILER)
+    return b"".join(out)
+
+
+def read_pg_binary(data: bytes) -> list:
+    """Fields of every row of a binary COPY payload, as raw bytes (None for NULL)"""
+    assert data.startswith(b"PGCOPY\n\xff\r\n\x00")
+    (extension,) = struct.unpack_from(">i", data, 15)
+    offset = 19 + extension
+    rows = []
+    while True:
+        (count,) = struct.unpack_from(">h", data, offset)
+        offset += 2
+        if count == -1:
+            assert offset == len(data)
+            return rows
+        fields = []
+        for _ in range(count):
+            (length,) = struct.unpack_from(">i", data, offset)
+            offset += 4
+            if length == -1:
+                fields.append(None)
+            else:
+                fields.append(data[offset:offset + length])
+                offset += length
+        rows.append(fields)
+
+
+def make_batch(values, start_id: int = 1) -> MeasurementBatch:
+    values = np.array(values, dtype=np.float64).reshape(len(CHANNELS), -1)
+    rows = values.shape[1]
+    start = np.datetime64('2024-03-01T12:00:00', 'us').astype(np.int64)
+    timestamps = (start + np.arange(rows, dtype=np.int64) * 1_000).view('datetime64[us]')
+    return MeasurementBatch(np.arange(start_id, start_id + rows, dtype=np.int64), timestamps, values, CHANNELS)
+
+
+def test_from_pg_binary_reads_postgres_rows():
+    rows = [
+        (1, datetime(2024, 3, 1, 12, 0, 0, 123456), 0.5, -1.25, 9.81),
+        (2, datetime(1999, 12, 31, 23, 59, 59), 0.0, float('nan'), -9999.999999),
+    ]
+    batch = MeasurementBatch.from_pg_binary(pg_binary(rows), CHANNELS)
+
+    assert batch.ids.tolist() == [1, 2]
+    assert batch.timestamps.astype(object).tolist() == [rows[0][1], rows[1][1]]
+    assert batch.values[:, 0].tolist() == [0.5, -1.25, 9.81]
+    assert batch.values[0, 1] == 0.0 and np.isnan(batch.values[1, 1]) and batch.values[2, 1] == -9999.999999
+
+
+def test_to_pg_binary_writes_postgres_rows():
+    batch = make_batch([[1.5, float('nan')], [-2.0, 3.25], [0.0, -0.5]], start_id=41).for_endpoint('sensor-7')
+    rows = read_pg_binary(batch.to_pg_binary())
+
+    assert len(rows) == 2
+    for row, source_id, timestamp, values in zip(rows, batch.ids, batch.timestamps, batch.values.T):
+        source_field, timestamp_field, *channel_fields, name_field = row
+        assert struct.unpack(">q", source_field)[0] == source_id
+        assert struct.unpack(">q", timestamp_field)[0] + PG_EPOCH_OFFSET_US == timestamp.astype(np.int64)
+        decoded = [struct.unpack(">d", field)[0] for field in channel_fields]
+        np.testing.assert_array_equal(decoded, values)
+        assert name_field == b'sensor-7'
+
+
+def test_to_pg_binary_without_endpoint_sends_empty_name():
+    rows = read_pg_binary(make_batch([[1.0], [2.0], [3.0]]).to_pg_binary())
+    assert rows[0][-1] == b''
+
+
+def test_round_trip_keeps_ids_timestamps_and_nan():
+    batch = make_batch([[0.1, float('nan'), 3.0], [-4.5, 5.5, float('nan')], [7.0, 8.0, 9.0]])
+    # to_pg_binary carries the endpoint name as a trailing field; drop it to read the rows back
+    rows = [
+        (struct.unpack(">q", source_id)[0], PG_EPOCH + timedelta(microseconds=struct.unpack(">q", timestamp)[0]),
+         *(struct.unpack(">d", field)[0] for field in channels))
+        for source_id, timestamp, *channels, _name in read_pg_binary(batch.to_pg_binary())
+    ]
+    decoded = MeasurementBatch.from_pg_binary(pg_binary(rows), CHANNELS)
+
+    np.testing.assert_array_equal(decoded.ids, batch.ids)
+    np.testing.assert_array_equal(decoded.timestamps, batch.timestamps)
+    np.testing.assert_array_equal(decoded.values, batch.values)
+
+
+def test_to_rows_turns_nan_into_none():
+    batch = make_batch([[1.0, float('nan')], [2.0, 3.0], [float('nan'), 4.0]]).for_endpoint('e')
+    rows = batch.to_rows()
+    assert rows[0][2:] == (1.0, 2.0, None, 'e')
+    assert rows[1][2:] == (None, 3.0, 4.0, 'e')
+
+
+@pytest.mark.parametrize('value, storable', [
+    (0.0, True),
+    (9999.999999, True),
+    (-9999.999999, True),
+    (9999.9999994, True),
+    (9999.9999995, False),
+    (-9999.9999995, False),
+    (DECIMAL_10_6_LIMIT, False),
+    (float('inf'), False),
+    (float('-inf'), False),
+])
+def test_validate_decimal_10_6_bounds(value, storable):
+    batch = make_batch([[value], [1.0], [2.0]])
+    invalid = batch.validate()
+    if storable:
+        assert invalid == {}
+        assert batch.values[0, 0] == value
+    else:
+        assert invalid == {'accel_x': 1}
+        assert np.isnan(batch.values[0, 0])
+    assert batch.values[1:, 0].tolist() == [1.0, 2.0]
+
+
+def test_validate_does_not_count_nulls():
+    batch = make_batch([[float('nan'), 1e6], [1.0, 2.0], [3.0, 4.0]])
+    assert batch.validate() == {'accel_x': 1}
+    assert np.isnan(batch.values[0]).all()
+
+
+def test_row_reader_cuts_a_stream_into_batches():
+    rows = [
+        (source_id, datetime(2024, 1, 1) + timedelta(seconds=source_id), float(source_id), -float(source_id), 0.5)
+        for source_id in range(1, 26)
+    ]
+    payload = pg_binary(rows)
+    reader = PgBinaryRowReader(CHANNELS)
+    batches = []
+    # Odd-sized pieces split the header, rows and the trailer
+    for offset in range(0, len(payload), 37):
+        reader.feed(payload[offset:offset + 37])
+        while reader.rows_available >= 10:
+            batches.append(reader.take(10))
+    batches.append(reader.take(10))
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert reader.rows_available == 0
+    ids = np.concatenate([batch.ids for batch in batches])
+    assert ids.tolist() == list(range(1, 26))
+    values = np.concatenate([batch.values for batch in batches], axis=1)
+    np.testing.assert_array_equal(values[1], -ids.astype(np.float64))
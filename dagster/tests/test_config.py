@@ -0,0 +1,56 @@
+"""
+EndpointConfig parsing of ingest_control rows and run tags.
+"""
+import pytest
+
+from dagster_etl.config import EndpointConfig
+
+CONTROL_ROW = {
+    'id': 7, 'ip_address': '10.0.0.5', 'port': 3307, 'name': 'line-3', 'chunk_size': 500,
+    'max_chunks_per_run': 40, 'endpoint_type': 'mysql', 'database_name': 'plant',
+    'pipeline_depth': 4, 'adaptive_chunking': True, 'min_chunk_size': 100, 'max_chunk_size': 5000,
+    'run_time_budget_seconds': 120.0,
+}
+
+
+@pytest.mark.parametrize('config', [
+    EndpointConfig.from_control_row(CONTROL_ROW),
+    EndpointConfig(endpoint_type='postgres', name='defaults', host='postgres-endpoint', port=5432),
+    EndpointConfig(endpoint_type='mysql', name='pinned', host='db', port=3306, endpoint_id=0, chunk_size=75),
+])
+def test_tags_round_trip(config):
+    tags = config.to_tags()
+    assert all(isinstance(value, str) for value in tags.values())
+    assert EndpointConfig.from_tags(tags, config.endpoint_type) == config
+
+
+def test_from_control_row():
+    config = EndpointConfig.from_control_row(CONTROL_ROW)
+    assert config == EndpointConfig(
+        endpoint_type='mysql', name='line-3', host='10.0.0.5', port=3307, database='plant', endpoint_id=7,
+        chunk_size=500, max_chunks_per_run=40, pipeline_depth=4, adaptive_chunking=True,
+        min_chunk_size=100, max_chunk_size=5000, run_time_budget_seconds=120.0,
+    )
+
+
+def test_missing_control_columns_fall_back_to_defaults():
+    row = {
+        'id': 1, 'ip_address': None, 'port': None, 'name': 'bare', 'chunk_size': None,
+        'max_chunks_per_run': None, 'endpoint_type': 'postgres',
+    }
+    config = EndpointConfig.from_control_row(row)
+    assert (config.host, config.port, config.database) == ('postgres-endpoint', 5432, 'sensors')
+    assert (config.chunk_size, config.max_chunks_per_run, config.pipeline_depth) == (50, 20, 2)
+    assert not config.adaptive_chunking
+    # Without explicit bounds the adaptive sizer is pinned to chunk_size
+    assert config.min_chunk_size == config.max_chunk_size == 50
+
+
+def test_tags_without_an_endpoint_id():
+    config = EndpointConfig(endpoint_type='mysql', name='adhoc', host='db', port=3306)
+    tags = config.to_tags()
+    assert 'endpoint_id' not in tags
+    assert EndpointConfig.from_tags(tags, 'mysql').endpoint_id is None
+    assert EndpointConfig.from_tags({}, 'mysql') == EndpointConfig(
+        endpoint_type='mysql', name='Unknown', host='mysql-endpoint', port=3306,
+    )
@@ -0,0 +1,51 @@
+"""
+Assets, jobs and sensor routing generated from the CONNECTORS registry.
+"""
+from dagster import AssetKey
+
+from dagster_etl import defs
+from dagster_etl.assets import BACKFILL_ASSETS, INGEST_ASSETS, ROLLUP_ASSETS
+from dagster_etl.backfill import BACKFILL_PARTITIONS
+from dagster_etl.connectors import CONNECTORS, SourceConnector
+from dagster_etl.jobs import BACKFILL_JOBS
+from dagster_etl.sensors import SENSOR_RESOURCE_KEYS, _asset_selection
+
+
+def test_connector_columns_and_names():
+    connector = SourceConnector(
+        endpoint_type='sqlite', label='SQLite', table='accelerometer_data',
+        source_columns=('row_id', 'ts', 'x', 'y'), resource_key='sqlite_endpoint',
+    )
+    assert connector.cursor_column == 'row_id'
+    assert connector.channels == ('x', 'y')
+    assert (connector.ingest_asset_name, connector.backfill_asset_name) == ('ingest_sqlite_data', 'backfill_sqlite_data')
+    assert (connector.backfill_job_name, connector.backfill_partitions_name) == ('sqlite_backfill_job', 'sqlite_backfill')
+
+
+def test_every_connector_gets_its_assets_jobs_and_partitions():
+    assert set(INGEST_ASSETS) == set(BACKFILL_ASSETS) == set(BACKFILL_JOBS) == set(BACKFILL_PARTITIONS) == set(CONNECTORS)
+    for endpoint_type, connector in CONNECTORS.items():
+        ingest, backfill = INGEST_ASSETS[endpoint_type], BACKFILL_ASSETS[endpoint_type]
+        assert ingest.key == AssetKey(connector.ingest_asset_name)
+        assert backfill.key == AssetKey(connector.backfill_asset_name)
+        assert {'supabase', connector.resource_key} <= ingest.required_resource_keys
+        assert {'supabase', connector.resource_key} <= backfill.required_resource_keys
+        assert BACKFILL_JOBS[endpoint_type].name == connector.backfill_job_name
+        assert BACKFILL_PARTITIONS[endpoint_type].name == connector.backfill_partitions_name
+        if connector.rollup_asset_name:
+            assert ROLLUP_ASSETS[endpoint_type].key == AssetKey(connector.rollup_asset_name)
+        assert connector.resource_key in SENSOR_RESOURCE_KEYS
+
+
+def test_asset_and_job_names_are_unchanged():
+    # Run history and dynamic partitions are keyed by these names
+    assert {key.to_user_string() for key in defs.get_repository_def().asset_graph.all_asset_keys} >= {
+        'ingest_mysql_data', 'ingest_postgres_data', 'backfill_mysql_data', 'backfill_postgres_data',
+    }
+    assert {job.name for job in BACKFILL_JOBS.values()} == {'mysql_backfill_job', 'postgres_backfill_job'}
+
+
+def test_sensor_routes_endpoint_types_to_their_connector():
+    for endpoint_type, connector in CONNECTORS.items():
+        assert _asset_selection(endpoint_type)[0] == AssetKey(connector.ingest_asset_name)
+    assert _asset_selection('sqlite') is None
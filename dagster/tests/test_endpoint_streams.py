@@ -0,0 +1,101 @@
+"""
+stream_measurements of the endpoint resources: one connection and one cursor per stream.
+"""
+import pytest
+
+from dagster_etl.resources import MySQLEndpointResource, PostgresEndpointResource
+
+ROWS = [(i, f'2024-03-01 12:00:{i:02d}', 0.1 * i, 0.2 * i, 0.3 * i) for i in range(1, 8)]
+
+
+class FakeCursor:
+    def __init__(self, conn, **options):
+        self.conn = conn
+        self.options = options
+        self._rows = []
+
+    def execute(self, query, params=None):
+        self.conn.queries.append((" ".join(query.split()), params))
+        last_id = params[0]
+        self._rows = [row for row in self.conn.rows if row[0] > last_id]
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class FakeConnection:
+    """A source database holding rows, recording the cursors and queries it was asked for"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursors = []
+        self.queries = []
+        self.session = {}
+        self.closed = False
+
+    def cursor(self, **options):
+        self.cursors.append(FakeCursor(self, **options))
+        return self.cursors[-1]
+
+    def set_session(self, **options):
+        self.session.update(options)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def get_connection(self, host, port, database, *args, **kwargs):
+        opened.append(FakeConnection(ROWS))
+        return opened[-1]
+
+    monkeypatch.setattr(PostgresEndpointResource, 'get_connection', get_connection)
+    monkeypatch.setattr(MySQLEndpointResource, 'get_connection', get_connection)
+    return opened
+
+
+def test_postgres_streams_batches_from_one_named_cursor(connections):
+    stream = PostgresEndpointResource().stream_measurements('postgres-endpoint', 5432, 'sensors', last_id=2, batch_size=2)
+    batches = list(stream)
+
+    assert batches == [ROWS[2:4], ROWS[4:6], ROWS[6:7]]
+    assert len(connections) == 1
+    conn = connections[0]
+    assert [cursor.options for cursor in conn.cursors] == [{'name': 'stream_measurements'}]
+    assert conn.session.get('readonly') is True
+    # One query for the whole stream, not one per batch
+    assert len(conn.queries) == 1
+    query, params = conn.queries[0]
+    assert query.startswith("SELECT id, timestamp, accel_x, accel_y, accel_z, mag_x, mag_y, mag_z FROM measurements")
+    assert query.endswith("WHERE id > %s ORDER BY id") and params == (2,)
+    assert conn.closed
+
+
+def test_max_rows_limits_the_query(connections):
+    list(PostgresEndpointResource().stream_measurements('postgres-endpoint', 5432, 'sensors', batch_size=5, max_rows=3))
+    query, params = connections[0].queries[0]
+    assert query.endswith("ORDER BY id LIMIT %s") and params == (0, 3)
+
+
+def test_abandoned_stream_closes_its_connection(connections):
+    stream = PostgresEndpointResource().stream_measurements('postgres-endpoint', 5432, 'sensors', batch_size=2)
+    assert next(stream) == ROWS[:2]
+    assert not connections[0].closed
+    stream.close()
+    assert connections[0].closed
+
+
+def test_mysql_streams_batches_from_one_unbuffered_cursor(connections):
+    stream = MySQLEndpointResource().stream_measurements('mysql-endpoint', 3306, 'sensors', last_id=4, batch_size=10)
+    assert list(stream) == [ROWS[4:]]
+
+    conn = connections[0]
+    assert [cursor.options for cursor in conn.cursors] == [{'buffered': False}]
+    query, params = conn.queries[0]
+    assert query.startswith("SELECT id, timestamp, accel_x, accel_y, accel_z FROM measurements")
+    assert params == (4,)
+    assert conn.closed
@@ -0,0 +1,152 @@
+"""
+Debouncing and completion of file endpoint folders, with explicit clock readings.
+"""
+import time
+
+import pytest
+
+from dagster_etl import file_events
+from dagster_etl.file_events import FolderDebouncer, FolderWatcher, folder_complete
+
+FOLDER = "20240301_120000"
+
+
+def test_folder_is_due_once_quiet_for_quiet_seconds():
+    debouncer = FolderDebouncer(quiet_seconds=1.0)
+    debouncer.touch(FOLDER, now=100.0)
+
+    assert debouncer.due(now=100.5) == []
+    assert debouncer.timeout(now=100.5) == pytest.approx(0.5)
+    assert debouncer.due(now=101.0) == [(FOLDER, 1.0)]
+
+
+def test_every_change_restarts_the_quiet_period():
+    debouncer = FolderDebouncer(quiet_seconds=1.0)
+    for now in (100.0, 100.6, 101.2, 101.8):
+        debouncer.touch(FOLDER, now=now)
+        assert debouncer.due(now=now + 0.9) == []
+
+    # The wait is measured from the first change, not the last
+    assert debouncer.due(now=102.8) == [(FOLDER, pytest.approx(2.8))]
+
+
+def test_due_folders_come_oldest_name_first_and_timeout_tracks_the_next_one():
+    debouncer = FolderDebouncer(quiet_seconds=2.0)
+    debouncer.touch("20240301_120002", now=10.0)
+    debouncer.touch("20240301_120001", now=10.5)
+    debouncer.touch("20240301_120003", now=11.5)
+
+    assert debouncer.timeout(now=11.0) == pytest.approx(1.0)
+    assert [name for name, _ in debouncer.due(now=12.5)] == ["20240301_120001", "20240301_120002"]
+
+    debouncer.forget("20240301_120001")
+    debouncer.forget("20240301_120002")
+    debouncer.forget("never-seen")
+    assert debouncer.timeout(now=12.5) == pytest.approx(1.0)
+    assert debouncer.due(now=13.5) == [("20240301_120003", pytest.approx(2.0))]
+
+
+def test_timeout_without_pending_folders_is_quiet_seconds():
+    debouncer = FolderDebouncer(quiet_seconds=0.25)
+    assert debouncer.timeout(now=5.0) == 0.25
+    debouncer.touch(FOLDER, now=1.0)
+    assert debouncer.timeout(now=5.0) == 0.0
+
+
+def test_default_clock_is_monotonic():
+    debouncer = FolderDebouncer(quiet_seconds=0.05)
+    debouncer.touch(FOLDER)
+    assert debouncer.due() == []
+    time.sleep(0.06)
+    assert [name for name, _ in debouncer.due()] == [FOLDER]
+
+
+def write_folder(root, images: int = 2, xml: bool = True, kmz: bool = True):
+    folder = root / FOLDER
+    folder.mkdir()
+    if xml:
+        (folder / "measurement.xml").write_text("<m/>")
+    if kmz:
+        (folder / "location.KMZ").write_bytes(b"PK")
+    for i in range(images):
+        (folder / f"image_{i}.jpg").write_bytes(b"\xff\xd8")
+    return folder
+
+
+@pytest.mark.parametrize("files, complete", [
+    ({}, True),
+    ({"images": 1}, False),
+    ({"xml": False}, False),
+    ({"kmz": False}, False),
+])
+def test_folder_complete(tmp_path, files, complete):
+    assert folder_complete(str(write_folder(tmp_path, **files)), min_images=2) is complete
+
+
+def test_missing_folder_is_not_complete(tmp_path):
+    assert not folder_complete(str(tmp_path / FOLDER))
+
+
+class FakeObserver:
+    def __init__(self):
+        self.unscheduled = []
+
+    def unschedule(self, watch):
+        self.unscheduled.append(watch)
+
+
+def watcher(tmp_path) -> FolderWatcher:
+    folder_watcher = FolderWatcher(supabase=None, data_dir=str(tmp_path))
+    folder_watcher._observer = FakeObserver()
+    folder_watcher._watches[FOLDER] = "watch"
+    folder_watcher.debouncer = FolderDebouncer(quiet_seconds=0.0)
+    return folder_watcher
+
+
+def test_quiet_complete_folder_is_queued_and_unwatched(tmp_path):
+    write_folder(tmp_path)
+    folder_watcher = watcher(tmp_path)
+    folder_watcher.debouncer.touch(FOLDER)
+    folder_watcher._complete_due()
+
+    assert folder_watcher._unsent == [FOLDER]
+    assert folder_watcher._observer.unscheduled == ["watch"]
+    assert folder_watcher.debouncer.pending == {}
+
+
+def test_quiet_incomplete_folder_waits_until_max_wait(tmp_path, monkeypatch):
+    write_folder(tmp_path, images=0)
+    folder_watcher = watcher(tmp_path)
+    now = time.monotonic()
+    folder_watcher.debouncer.touch(FOLDER, now=now)
+    folder_watcher._complete_due()
+
+    # Still waiting for its images: touched again, not reported
+    assert folder_watcher._unsent == []
+    assert FOLDER in folder_watcher.debouncer.pending
+
+    monkeypatch.setattr(file_events, "MAX_WAIT_SECONDS", 30.0)
+    folder_watcher.debouncer.pending[FOLDER] = (now - 31.0, now - 1.0)
+    folder_watcher._complete_due()
+    assert folder_watcher._unsent == [FOLDER]
+    assert folder_watcher._observer.unscheduled == ["watch"]
+
+
+class RecordingSupabase:
+    def __init__(self):
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append((query, params))
+
+
+def test_report_records_folders_under_the_endpoint(tmp_path):
+    supabase = RecordingSupabase()
+    folder_watcher = FolderWatcher(supabase, endpoint_name="line-3", data_dir=str(tmp_path))
+    folder_watcher._unsent = [FOLDER, "20240301_120001"]
+    folder_watcher._report()
+
+    ((query, params),) = supabase.queries
+    assert query == "INSERT INTO file_events (endpoint_name, folder_name) VALUES (%s, %s), (%s, %s)"
+    assert params == ("line-3", FOLDER, "line-3", "20240301_120001")
+    assert (folder_watcher._unsent, folder_watcher.reported) == ([], 2)
@@ -0,0 +1,106 @@
+"""
+Discovery and extraction of file endpoint folders under a temporary data directory.
+"""
+import os
+import time
+import zipfile
+
+from dagster_etl.filesystem import (
+    EXTRACTED_COLUMNS, extract_folder, extract_folders, newest_timestamp_folder, scan_all_folders, scan_new_folders,
+)
+
+
+def make_folders(root, *names, age: float = 60.0):
+    modified = time.time() - age
+    for name in names:
+        (root / name).mkdir()
+        os.utime(root / name, (modified, modified))
+
+
+def test_scan_new_folders_filters_by_name_above_the_mark(tmp_path):
+    make_folders(tmp_path, '20240301_120002', '20240301_120000', '20240301_120001', 'notes', '.hidden')
+    (tmp_path / '20240301_120003').write_text('a file, not a folder')
+
+    assert [e.name for e in scan_new_folders(str(tmp_path))] == [
+        '20240301_120000', '20240301_120001', '20240301_120002',
+    ]
+    assert [e.name for e in scan_new_folders(str(tmp_path), after='20240301_120000')] == [
+        '20240301_120001', '20240301_120002',
+    ]
+    assert scan_new_folders(str(tmp_path), after='20240301_120002') == []
+
+
+def test_scan_new_folders_stops_before_the_first_unsettled_folder(tmp_path):
+    make_folders(tmp_path, '20240301_120000', '20240301_120002')
+    make_folders(tmp_path, '20240301_120001', age=0.0)
+
+    # 120002 is settled, but the mark must not move past 120001 while it may still be written
+    assert [e.name for e in scan_new_folders(str(tmp_path), settle_seconds=2.0)] == ['20240301_120000']
+    assert len(scan_new_folders(str(tmp_path), settle_seconds=0.0)) == 3
+
+
+def test_scan_all_folders_includes_any_settled_name(tmp_path):
+    make_folders(tmp_path, '20240301_120000', 'manual-upload', '.staging')
+    make_folders(tmp_path, 'still-writing', age=0.0)
+
+    assert [e.name for e in scan_all_folders(str(tmp_path))] == ['20240301_120000', 'manual-upload']
+
+
+def test_newest_timestamp_folder_ignores_other_names():
+    assert newest_timestamp_folder(['20240301_120000', 'zzz', '20240302_000000', '20240301_235959']) == '20240302_000000'
+    assert newest_timestamp_folder(['manual-upload']) is None
+    assert newest_timestamp_folder([]) is None
+
+
+KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+  <Placemark><Point><coordinates>
+    8.5417,47.3769,408.5
+  </coordinates></Point></Placemark>
+</kml>"""
+
+
+def write_measurement(folder, images: int = 2, xml: str = None, kml: str = KML):
+    folder.mkdir()
+    (folder / 'measurement.xml').write_text(xml or (
+        "<measurement><timestamp>2024-03-01T12:00:00</timestamp>"
+        "<latitude>47.3769</latitude><longitude>8.5417</longitude><altitude></altitude></measurement>"
+    ))
+    with zipfile.ZipFile(folder / 'location.KMZ', 'w') as kmz:
+        kmz.writestr('doc.kml', kml)
+    for i in range(images):
+        (folder / f'image_{i}.JPG').write_bytes(b'\xff\xd8')
+    (folder / 'readme.txt').write_text('not counted')
+    return folder
+
+
+def test_extract_folder_parses_xml_and_kmz(tmp_path):
+    record = extract_folder(str(write_measurement(tmp_path / '20240301_120000', images=3)))
+
+    assert set(record) == set(EXTRACTED_COLUMNS) | {'errors'}
+    assert record['errors'] == []
+    assert (record['xml_file'], record['kmz_file'], record['image_count']) == ('measurement.xml', 'location.KMZ', 3)
+    assert record['measured_at'].isoformat() == '2024-03-01T12:00:00'
+    assert (record['latitude'], record['longitude'], record['altitude']) == (47.3769, 8.5417, None)
+    assert (record['kml_latitude'], record['kml_longitude'], record['kml_altitude']) == (47.3769, 8.5417, 408.5)
+
+
+def test_unparseable_files_are_reported_and_leave_their_columns_empty(tmp_path):
+    folder = write_measurement(tmp_path / '20240301_120000', xml='<measurement><timestamp>', kml='<kml/>')
+    record = extract_folder(str(folder))
+
+    assert [error.split(':')[0] for error in record['errors']] == ['measurement.xml', 'location.KMZ']
+    assert record['measured_at'] is None and record['kml_latitude'] is None
+    assert record['image_count'] == 2
+
+
+def test_empty_folder_has_no_files(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    record = extract_folder(str(tmp_path / 'empty'))
+    assert (record['xml_file'], record['kmz_file'], record['image_count'], record['errors']) == (None, None, 0, [])
+
+
+def test_extract_folders_keeps_input_order(tmp_path):
+    paths = [str(write_measurement(tmp_path / f'20240301_1200{i:02d}', images=i)) for i in range(6)]
+    assert [record['image_count'] for record in extract_folders(paths, max_workers=4)] == list(range(6))
+    assert extract_folders(paths, max_workers=4) == extract_folders(paths, max_workers=1)
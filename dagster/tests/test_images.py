@@ -0,0 +1,145 @@
+"""
+Hashing and thumbnailing of file endpoint images, against an in-memory file_images table.
+"""
+import logging
+import os
+import shutil
+
+import pytest
+from PIL import Image
+
+from dagster_etl.images import IMAGE_COLUMNS, THUMBNAIL_SIZE, hash_file, process_images, thumbnail_path
+
+LOG = logging.getLogger(__name__)
+
+
+class ImageTable:
+    """file_images as SupabaseResource's get_image_records / get_thumbnails / save_image_records see it"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get_image_records(self, endpoint_name, folder_paths):
+        return {
+            (row['folder_path'], row['file_name']): (row['file_size'], row['file_mtime_ns'])
+            for row in self.rows.values()
+            if row['endpoint_name'] == endpoint_name and row['folder_path'] in folder_paths and row['thumbnail_path']
+        }
+
+    def get_thumbnails(self, content_hashes):
+        thumbnails = {}
+        for row in self.rows.values():
+            if row['content_hash'] in content_hashes and row['thumbnail_path']:
+                thumbnails.setdefault(row['content_hash'], {
+                    key: row[key] for key in ('thumbnail_path', 'width', 'height')
+                })
+        return thumbnails
+
+    def save_image_records(self, values):
+        for value in values:
+            row = dict(zip(IMAGE_COLUMNS, value))
+            self.rows[row['endpoint_name'], row['folder_path'], row['file_name']] = row
+        return len(values)
+
+    def row(self, folder, file_name):
+        return self.rows['cam', str(folder), file_name]
+
+
+def write_image(path, size, color, image_format='JPEG'):
+    Image.new('RGB', size, color=color).save(path, image_format)
+
+
+@pytest.fixture
+def folders(tmp_path):
+    """Two folders: three distinct images, one of them copied into the second folder, plus a non-image"""
+    first, second = tmp_path / '20240301_120000', tmp_path / '20240301_120010'
+    first.mkdir()
+    second.mkdir()
+    write_image(first / 'image_1.jpg', (640, 480), (200, 30, 30))
+    write_image(first / 'image_2.JPG', (100, 400), (30, 200, 30))
+    write_image(second / 'image_1.png', (50, 20), (30, 30, 200), 'PNG')
+    shutil.copy(first / 'image_1.jpg', second / 'image_2.jpg')
+    (second / 'measurement.xml').write_text('<measurement/>')
+    return [str(first), str(second)]
+
+
+def run(table, folders, thumbnail_dir, max_workers=1):
+    return process_images(table, 'cam', folders, LOG, max_workers=max_workers, thumbnail_dir=str(thumbnail_dir))
+
+
+def test_images_are_hashed_and_thumbnailed_once_per_content(tmp_path, folders):
+    table = ImageTable()
+    thumbnails = tmp_path / 'thumbs'
+    stats = run(table, folders, thumbnails)
+
+    assert stats == {'images': 4, 'cached': 0, 'hashed': 4, 'duplicates': 1, 'thumbnailed': 3, 'failed': 0}
+    original, copy = table.row(folders[0], 'image_1.jpg'), table.row(folders[1], 'image_2.jpg')
+    assert original['content_hash'] == copy['content_hash'] == hash_file(os.path.join(folders[0], 'image_1.jpg'))
+    assert original['thumbnail_path'] == copy['thumbnail_path'] == thumbnail_path(original['content_hash'], str(thumbnails))
+    assert (original['width'], original['height']) == (640, 480)
+
+    with Image.open(original['thumbnail_path']) as thumbnail:
+        assert thumbnail.format == 'JPEG'
+        assert max(thumbnail.size) <= THUMBNAIL_SIZE
+    with Image.open(table.row(folders[0], 'image_2.JPG')['thumbnail_path']) as thumbnail:
+        # Aspect ratio is kept
+        assert thumbnail.size == (THUMBNAIL_SIZE * 100 // 400, THUMBNAIL_SIZE)
+    assert len(list(thumbnails.rglob('*.jpg'))) == 3
+    assert list(thumbnails.rglob('*.tmp')) == []
+
+
+def test_unchanged_images_are_not_read_again(tmp_path, folders):
+    table = ImageTable()
+    run(table, folders, tmp_path / 'thumbs')
+    assert run(table, folders, tmp_path / 'thumbs') == {
+        'images': 4, 'cached': 4, 'hashed': 0, 'duplicates': 0, 'thumbnailed': 0, 'failed': 0,
+    }
+
+    # A changed image is hashed again; its new content gets a thumbnail of its own
+    write_image(os.path.join(folders[1], 'image_1.png'), (60, 20), (0, 0, 0), 'PNG')
+    stats = run(table, folders, tmp_path / 'thumbs')
+    assert (stats['cached'], stats['hashed'], stats['thumbnailed']) == (3, 1, 1)
+
+
+def test_other_endpoints_thumbnails_are_reused(tmp_path, folders):
+    table = ImageTable()
+    run(table, folders[:1], tmp_path / 'thumbs')
+    stats = run(table, folders[1:], tmp_path / 'thumbs')
+    # image_2.jpg is a copy of an image already thumbnailed
+    assert (stats['hashed'], stats['thumbnailed']) == (2, 1)
+
+
+def test_process_pool_matches_inline(tmp_path, folders):
+    inline, pooled = ImageTable(), ImageTable()
+    assert run(inline, folders, tmp_path / 'inline') == run(pooled, folders, tmp_path / 'pooled', max_workers=2)
+
+    def relative(table, root):
+        return {
+            key: {**row, 'thumbnail_path': os.path.relpath(row['thumbnail_path'], root)}
+            for key, row in table.rows.items()
+        }
+
+    assert relative(inline, tmp_path / 'inline') == relative(pooled, tmp_path / 'pooled')
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_corrupt_image_is_recorded_without_a_thumbnail_and_retried(tmp_path, folders, max_workers):
+    (tmp_path / '20240301_120000' / 'image_3.jpg').write_bytes(b'\xff\xd8\xff\xe0 truncated')
+    table = ImageTable()
+    stats = run(table, folders, tmp_path / 'thumbs', max_workers=max_workers)
+
+    assert (stats['images'], stats['thumbnailed'], stats['failed']) == (5, 3, 1)
+    corrupt = table.row(folders[0], 'image_3.jpg')
+    assert corrupt['content_hash'] and (corrupt['thumbnail_path'], corrupt['width'], corrupt['height']) == (None,) * 3
+
+    # Its failed thumbnail does not count as cached
+    stats = run(table, folders, tmp_path / 'thumbs', max_workers=max_workers)
+    assert (stats['cached'], stats['hashed'], stats['failed']) == (4, 1, 1)
+
+
+def test_no_folders_or_no_images(tmp_path):
+    table = ImageTable()
+    assert run(table, [], tmp_path)['images'] == 0
+    (tmp_path / 'empty').mkdir()
+    assert run(table, [str(tmp_path / 'empty'), str(tmp_path / 'missing')], tmp_path)['images'] == 0
+    assert table.rows == {}
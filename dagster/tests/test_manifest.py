@@ -0,0 +1,146 @@
+"""
+The file endpoint's /manifest API, served by file-generator.py from a
+temporary data directory and read back through fetch_manifest.
+"""
+import importlib.util
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from dagster_etl.filesystem import EXTRACTED_COLUMNS
+from dagster_etl.manifest import fetch_manifest, manifest_record
+
+GENERATOR = Path(__file__).resolve().parents[2] / 'endpoints' / 'file-endpoint' / 'file-generator.py'
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    spec = importlib.util.spec_from_file_location('file_generator', GENERATOR)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'DATA_DIR', tmp_path)
+    return module
+
+
+@pytest.fixture
+def server(generator):
+    """(host, port) of a manifest server over the generator's DATA_DIR"""
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), generator.CustomHTTPRequestHandler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_folder(root: Path, name: str, settled: bool = True, images: int = 2) -> Path:
+    folder = root / name
+    folder.mkdir()
+    (folder / 'measurement.xml').write_text(
+        "<measurement><timestamp>2024-03-01T12:00:00</timestamp>"
+        "<latitude>47.3769</latitude><longitude>8.5417</longitude><altitude>408.5</altitude></measurement>"
+    )
+    for i in range(images):
+        (folder / f'image_{i}.jpg').write_bytes(b'\xff\xd8' * (i + 1))
+    if settled:
+        settle(folder)
+    return folder
+
+
+def settle(folder: Path):
+    modified = time.time() - 60
+    os.utime(folder, (modified, modified))
+
+
+def names(page) -> list:
+    return [folder['folder'] for folder in page.folders]
+
+
+def test_gzipped_pages_round_trip_into_extracted_records(generator, server, monkeypatch):
+    # One gzip stream sent in many small chunks, so lines span chunk boundaries
+    monkeypatch.setattr(generator, 'MANIFEST_CHUNK_BYTES', 64)
+    for second in range(5):
+        make_folder(generator.DATA_DIR, f'20240301_12000{second}', images=second)
+
+    page = fetch_manifest(*server)
+    assert names(page) == [f'20240301_12000{second}' for second in range(5)]
+    assert (page.cursor, page.more, page.not_modified) == ('20240301_120004', False, False)
+    assert page.folders[3]['files'] == [
+        {'name': 'image_0.jpg', 'size': 2}, {'name': 'image_1.jpg', 'size': 4}, {'name': 'image_2.jpg', 'size': 6},
+        {'name': 'measurement.xml', 'size': len((generator.DATA_DIR / '20240301_120003' / 'measurement.xml').read_bytes())},
+    ]
+
+    record = manifest_record(page.folders[3])
+    assert set(record) == set(EXTRACTED_COLUMNS) | {'errors'}
+    assert (record['image_count'], record['xml_file'], record['kmz_file'], record['errors']) == (
+        3, 'measurement.xml', None, []
+    )
+    assert record['measured_at'].isoformat() == '2024-03-01T12:00:00'
+    assert (record['latitude'], record['longitude'], record['altitude']) == (47.3769, 8.5417, 408.5)
+
+
+def test_manifest_record_defaults():
+    record = manifest_record({'folder': '20240301_120000', 'image_count': None})
+    assert (record['image_count'], record['measured_at'], record['errors']) == (0, None, [])
+
+
+def test_unchanged_page_is_not_modified(generator, server):
+    make_folder(generator.DATA_DIR, '20240301_120000')
+    first = fetch_manifest(*server, after='20240301_115959', limit=1)
+    assert names(first) == ['20240301_120000'] and first.etag.startswith('W/"')
+
+    again = fetch_manifest(*server, after='20240301_115959', limit=1, etag=first.etag)
+    assert again.not_modified and again.folders == []
+    assert (again.cursor, again.etag) == ('20240301_120000', first.etag)
+
+    # A new folder past the cursor changes the page the sensor checks
+    make_folder(generator.DATA_DIR, '20240301_120001')
+    page = fetch_manifest(*server, after='20240301_120000', limit=1, etag=first.etag)
+    assert not page.not_modified and names(page) == ['20240301_120001']
+
+
+@pytest.mark.parametrize('count, pages', [
+    (5, [['120000', '120001'], ['120002', '120003'], ['120004']]),
+    # A last page exactly `limit` long has nothing after it
+    (4, [['120000', '120001'], ['120002', '120003']]),
+])
+def test_cursor_pages_across_the_limit(generator, server, count, pages):
+    for second in range(count):
+        make_folder(generator.DATA_DIR, f'20240301_1200{second:02d}')
+
+    after, seen = None, []
+    while True:
+        page = fetch_manifest(*server, after=after, limit=2)
+        seen.append([name[-6:] for name in names(page)])
+        assert page.cursor == names(page)[-1]
+        if not page.more:
+            break
+        after = page.cursor
+    assert seen == pages
+
+
+def test_cursor_does_not_pass_a_folder_still_settling(generator, server):
+    make_folder(generator.DATA_DIR, '20240301_120000')
+    writing = make_folder(generator.DATA_DIR, '20240301_120001', settled=False)
+    make_folder(generator.DATA_DIR, '20240301_120002')
+
+    page = fetch_manifest(*server)
+    # 120002 is settled, but listing it would move the cursor past 120001
+    assert (names(page), page.cursor, page.more) == (['20240301_120000'], '20240301_120000', False)
+
+    settle(writing)
+    page = fetch_manifest(*server, after=page.cursor)
+    assert names(page) == ['20240301_120001', '20240301_120002']
+
+
+def test_list_manifest_folders_ignores_other_names(generator):
+    make_folder(generator.DATA_DIR, '20240301_120000')
+    make_folder(generator.DATA_DIR, 'manual-upload')
+    (generator.DATA_DIR / '20240301_120001').write_text('a file, not a folder')
+
+    folders, more = generator.list_manifest_folders(None, 10)
+    assert ([name for name, _ in folders], more) == (['20240301_120000'], False)
@@ -0,0 +1,86 @@
+"""
+IngestMetrics bookkeeping and its Prometheus text export.
+"""
+import pytest
+
+from dagster_etl.metrics import IngestMetrics, render_prometheus, timed, write_textfile
+
+
+def run_metrics(name: str) -> IngestMetrics:
+    metrics = IngestMetrics('mysql', name)
+    metrics.add('connect', 0.5)
+    metrics.add('query', 0.25)
+    # Fetches are matched to chunks in order, whichever thread recorded them
+    metrics.record_fetch(1.0)
+    metrics.record_fetch(2.0)
+    metrics.record_chunk(100, 4_000, 1.5, queue_wait_seconds=0.1,
+                         sink={'checkout_seconds': 0.01, 'load_seconds': 0.3, 'commit_seconds': 0.05})
+    metrics.record_chunk(50, 2_000, 2.5, sink={'load_seconds': 0.2, 'retries': 1})
+    return metrics
+
+
+def test_chunks_take_the_fetch_recorded_before_them():
+    metrics = run_metrics('chunks')
+    first, second = metrics.chunks
+    assert (first.chunk, first.fetch_seconds, first.load_seconds, first.retries) == (1, 1.0, 0.3, 0)
+    assert (second.chunk, second.fetch_seconds, second.queue_wait_seconds, second.retries) == (2, 2.0, 0.0, 1)
+    # A chunk without a recorded fetch (e.g. the file endpoint) gets 0
+    assert metrics.record_chunk(1, 10, 0.1).fetch_seconds == 0.0
+
+
+def test_summary_totals_and_bottleneck():
+    summary = run_metrics('summary').summary()
+    assert (summary['rows'], summary['bytes'], summary['chunks'], summary['retries']) == (150, 6_000, 2, 1)
+    assert summary['fetch_seconds'] == 3.0
+    assert summary['load_seconds'] == pytest.approx(0.5)
+    assert summary['chunk_p50_ms'] == 2000.0
+    # 3.25s of source work against 0.55s of sink and 0.51s of connection setup
+    assert summary['bottleneck'] == 'source'
+
+
+def test_empty_run_has_no_bottleneck():
+    metrics = IngestMetrics('postgres', 'idle')
+    summary = metrics.summary()
+    assert (summary['chunks'], summary['chunk_p95_ms'], summary['bottleneck']) == (0, 0.0, None)
+    assert 'metrics/bottleneck' not in metrics.to_metadata()
+
+
+def test_metadata_keeps_the_most_recent_chunks(monkeypatch):
+    from dagster_etl import metrics as metrics_module
+
+    monkeypatch.setattr(metrics_module, 'MAX_CHUNKS_IN_METADATA', 3)
+    metrics = IngestMetrics('mysql', 'many')
+    for _ in range(5):
+        metrics.record_chunk(10, 100, 0.123456)
+    metadata = metrics.to_metadata()
+    assert metadata['metrics/chunks'] == 5
+    assert [chunk['chunk'] for chunk in metadata['metrics/recent_chunks']] == [3, 4, 5]
+    assert metadata['metrics/recent_chunks'][0]['seconds'] == 0.1235
+
+
+def test_timed_adds_to_a_phase_and_tolerates_no_metrics():
+    metrics = IngestMetrics('mysql', 'timed')
+    with timed(metrics, 'scan'):
+        pass
+    with timed(None, 'scan'):
+        pass
+    assert list(metrics.phases) == ['scan']
+
+
+def test_published_runs_accumulate_in_prometheus_text(tmp_path):
+    name = 'line "3"\nwest'
+    for _ in range(2):
+        run_metrics(name).publish()
+
+    text = render_prometheus(name)
+    labels = 'endpoint_type="mysql",endpoint="line \\"3\\"\\nwest"'
+    assert "# TYPE ingest_rows_total counter" in text
+    assert f"ingest_rows_total{{{labels}}} 300" in text
+    assert f"ingest_last_run_rows{{{labels}}} 150" in text
+    assert f'ingest_phase_seconds_total{{{labels},phase="fetch"}} 6.0' in text
+    # Only the requested endpoint's series
+    assert all(labels in line for line in text.splitlines() if not line.startswith('#'))
+
+    path = write_textfile(str(tmp_path), IngestMetrics('mysql', name))
+    assert path == str(tmp_path / 'ingest_mysql_line_3_west.prom')
+    assert open(path).read() == text
@@ -0,0 +1,123 @@
+"""
+Partition bound parsing and interval arithmetic of the time-partitioned sensor tables.
+"""
+from datetime import datetime
+
+import pytest
+
+from dagster_etl.partitions import (
+    PARTITION_INTERVALS, drop_expired, interval_start, list_partitions, next_start, partition_name,
+)
+
+
+class FakeCursor:
+    """Answers the pg_inherits query with canned (relname, pg_get_expr) rows and records every statement"""
+
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.statements = []
+        self._result = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+        self._result = self.partitions if "pg_inherits" in sql else []
+
+    def fetchall(self):
+        return self._result
+
+
+PARTITIONS = [
+    ("accelerometer_data_p20240401", "FOR VALUES FROM ('2024-04-01 00:00:00') TO ('2024-05-01 00:00:00')"),
+    ("accelerometer_data_default", "DEFAULT"),
+    ("accelerometer_data_p20240301", "FOR VALUES FROM ('2024-03-01 00:00:00') TO ('2024-04-01 00:00:00')"),
+    ("accelerometer_data_p20240228", "FOR VALUES FROM ('2024-02-28 06:30:00.5') TO ('2024-03-01 00:00:00')"),
+]
+
+
+def test_list_partitions_parses_bounds_oldest_first_without_default():
+    cursor = FakeCursor(PARTITIONS)
+    assert list_partitions(cursor, "accelerometer_data") == [
+        ("accelerometer_data_p20240228", datetime(2024, 2, 28, 6, 30, 0, 500000), datetime(2024, 3, 1)),
+        ("accelerometer_data_p20240301", datetime(2024, 3, 1), datetime(2024, 4, 1)),
+        ("accelerometer_data_p20240401", datetime(2024, 4, 1), datetime(2024, 5, 1)),
+    ]
+    assert cursor.statements[0][1] == ("accelerometer_data",)
+
+
+@pytest.mark.parametrize("bound", [
+    "DEFAULT",
+    "FOR VALUES FROM (MINVALUE) TO ('2024-01-01 00:00:00')",
+    "FOR VALUES IN ('a', 'b')",
+])
+def test_list_partitions_skips_bounds_that_are_not_a_timestamp_range(bound):
+    assert list_partitions(FakeCursor([("other", bound)]), "accelerometer_data") == []
+
+
+def test_drop_expired_drops_partitions_ending_by_the_cutoff():
+    cursor = FakeCursor(PARTITIONS)
+    dropped = drop_expired(cursor, "accelerometer_data", datetime(2024, 4, 1))
+
+    assert dropped == ["accelerometer_data_p20240228", "accelerometer_data_p20240301"]
+    statements = [sql for sql, _ in cursor.statements]
+    assert "DROP TABLE accelerometer_data_p20240228" in statements
+    assert "DROP TABLE accelerometer_data_p20240301" in statements
+    assert "DROP TABLE accelerometer_data_p20240401" not in statements
+    # Old default-partition rows and their source keys go too
+    assert cursor.statements[-2] == (
+        "DELETE FROM accelerometer_data_default WHERE timestamp < %s", (datetime(2024, 4, 1),)
+    )
+    assert cursor.statements[-1] == (
+        "DELETE FROM sensor_source_keys WHERE source_table = %s AND timestamp < %s",
+        ("accelerometer_data", datetime(2024, 4, 1)),
+    )
+
+
+def test_drop_expired_keeps_source_keys_of_the_partition_straddling_the_cutoff():
+    cursor = FakeCursor(PARTITIONS)
+    dropped = drop_expired(cursor, "accelerometer_data", datetime(2024, 4, 15))
+
+    # p20240401 still holds rows from 2024-04-01 on, so their keys must stay claimed
+    assert dropped == ["accelerometer_data_p20240228", "accelerometer_data_p20240301"]
+    assert cursor.statements[-2][1] == (datetime(2024, 4, 15),)
+    assert cursor.statements[-1][1] == ("accelerometer_data", datetime(2024, 4, 1))
+
+
+@pytest.mark.parametrize("interval, expected", [
+    ("day", datetime(2024, 3, 14)),
+    # 2024-03-14 is a Thursday; weeks start on Monday like date_trunc('week')
+    ("week", datetime(2024, 3, 11)),
+    ("month", datetime(2024, 3, 1)),
+])
+def test_interval_start(interval, expected):
+    assert interval_start(datetime(2024, 3, 14, 17, 45, 12, 345), interval) == expected
+
+
+@pytest.mark.parametrize("start, interval, expected", [
+    (datetime(2024, 2, 28), "day", datetime(2024, 2, 29)),
+    (datetime(2024, 12, 30), "week", datetime(2025, 1, 6)),
+    (datetime(2024, 1, 1), "month", datetime(2024, 2, 1)),
+    (datetime(2024, 12, 1), "month", datetime(2025, 1, 1)),
+])
+def test_next_start(start, interval, expected):
+    assert next_start(start, interval) == expected
+
+
+def test_intervals_tile_without_gaps():
+    for interval in PARTITION_INTERVALS:
+        start = interval_start(datetime(2023, 11, 20), interval)
+        for _ in range(30):
+            end = next_start(start, interval)
+            assert interval_start(end, interval) == end
+            assert start < end
+            start = end
+
+
+def test_unknown_interval_is_rejected():
+    with pytest.raises(ValueError):
+        interval_start(datetime(2024, 1, 1), "year")
+    with pytest.raises(ValueError):
+        next_start(datetime(2024, 1, 1), "year")
+
+
+def test_partition_name():
+    assert partition_name("accel_mag_data", datetime(2024, 3, 4)) == "accel_mag_data_p20240304"
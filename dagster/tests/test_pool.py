@@ -0,0 +1,208 @@
+"""
+ConnectionPool checkout, return and discard, with in-memory stand-in connections.
+"""
+import threading
+import time
+
+import pytest
+
+from dagster_etl.pool import ConnectionPool, PoolTimeout, get_pool
+
+
+class FakeConnection:
+    """DB-API connection stand-in that records rollbacks and can be made to fail"""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.closed = 0
+        self.rollbacks = 0
+        self.healthy = True
+
+    def rollback(self):
+        if not self.healthy:
+            raise RuntimeError("server closed the connection")
+        self.rollbacks += 1
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    def __init__(self, conn: FakeConnection):
+        self.conn = conn
+
+    def execute(self, query):
+        if not self.conn.healthy:
+            raise RuntimeError("server closed the connection")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class Connector:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self) -> FakeConnection:
+        conn = FakeConnection(len(self.opened) + 1)
+        self.opened.append(conn)
+        return conn
+
+
+@pytest.fixture
+def connect():
+    return Connector()
+
+
+def test_returned_connection_is_reused(connect):
+    pool = ConnectionPool(connect, min_size=0, max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert second is first
+    assert len(connect.opened) == 1
+    assert pool.stats["connects"] == 1 and pool.stats["checkouts"] == 2
+    # Returning a connection rolls back anything the caller left open
+    assert first.rollbacks == 2
+
+
+def test_checkouts_beyond_max_size_wait_then_time_out(connect):
+    pool = ConnectionPool(connect, max_size=2, checkout_timeout=0.05)
+    held = [pool.acquire(), pool.acquire()]
+    assert held[0] is not held[1]
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.05
+
+    # A release wakes a waiting checkout, which gets the returned connection
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=5)))
+    waiter.start()
+    time.sleep(0.02)
+    pool.release(held[0])
+    waiter.join(timeout=5)
+    assert got == [held[0]]
+    assert len(connect.opened) == 2
+
+
+def test_discarded_connection_frees_its_slot(connect):
+    pool = ConnectionPool(connect, max_size=1, checkout_timeout=0.05)
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+
+    assert conn.closed
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert len(connect.opened) == 2
+
+
+def test_connection_whose_rollback_fails_is_discarded(connect):
+    pool = ConnectionPool(connect, max_size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            conn.healthy = False
+            raise ValueError("query failed")
+
+    assert conn.closed
+    with pool.connection() as replacement:
+        assert replacement is not conn
+
+
+def test_dead_idle_connection_is_replaced_on_checkout(connect):
+    pool = ConnectionPool(connect, max_size=1, health_check_interval=0)
+    with pool.connection() as conn:
+        pass
+    conn.healthy = False
+
+    with pool.connection() as replacement:
+        assert replacement is not conn
+        assert pool.last_checkout_reconnected()
+    assert conn.closed
+    assert pool.stats["reconnects"] == 1
+
+    with pool.connection():
+        assert not pool.last_checkout_reconnected()
+
+
+def test_failed_connect_does_not_leak_a_slot():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("connection refused")
+        return FakeConnection(len(attempts))
+
+    pool = ConnectionPool(connect, max_size=1, checkout_timeout=0.05)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.acquire().number == 2
+
+
+def test_idle_connections_above_min_size_are_evicted(connect):
+    pool = ConnectionPool(connect, min_size=1, max_size=3, idle_timeout=0)
+    held = [pool.acquire() for _ in range(3)]
+    for conn in held:
+        pool.release(conn)
+
+    # The next checkout closes idle connections until min_size are left
+    pool.acquire()
+    assert pool.stats["evictions"] == 2
+    assert sum(conn.closed for conn in held) == 2
+
+
+def test_closed_pool_refuses_checkouts_and_closes_returns(connect):
+    pool = ConnectionPool(connect, max_size=2)
+    idle, busy = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.close()
+
+    assert idle.closed and not busy.closed
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(busy)
+    assert busy.closed
+
+
+def test_get_pool_returns_one_pool_per_key(connect):
+    created = []
+
+    def factory():
+        created.append(ConnectionPool(connect))
+        return created[-1]
+
+    key = ("test_pool", id(created))
+    assert get_pool(key, factory) is get_pool(key, factory)
+    assert get_pool(key + ("other",), factory) is not created[0]
+    assert len(created) == 2
+    for pool in created:
+        pool.close()
+
+
+def test_stats_count_every_concurrent_checkout(connect):
+    pool = ConnectionPool(connect, min_size=0, max_size=4, health_check_interval=0)
+
+    def check_out_and_return():
+        for _ in range(250):
+            with pool.connection():
+                pass
+
+    threads = [threading.Thread(target=check_out_and_return) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pool.stats["checkouts"] == 8 * 250
+    assert pool.stats["connects"] == len(connect.opened) <= 4
+    pool.close()
@@ -0,0 +1,111 @@
+"""
+rollups.aggregate (NumPy reduceat over sorted buckets) against a per-row Python reference.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from dagster_etl.columnar import MeasurementBatch
+from dagster_etl.rollups import RAW_RESOLUTIONS, ROLLUP_COLUMNS, aggregate, minute_window, rollup_rows
+
+CHANNELS = ('accel_x', 'accel_y', 'accel_z')
+
+
+def random_batch(rows: int, seed: int, span_us: int = 5 * 60_000_000, nan_fraction: float = 0.1) -> MeasurementBatch:
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-03-01T11:58:30', 'us').astype(np.int64)
+    # Out of order, with repeated timestamps, like rows re-read from several partitions
+    micros = start + rng.integers(0, span_us, rows)
+    values = rng.normal(0, 5, (len(CHANNELS), rows)).round(6)
+    values[rng.random(values.shape) < nan_fraction] = np.nan
+    return MeasurementBatch(np.arange(1, rows + 1, dtype=np.int64), micros.view('datetime64[us]'), values, CHANNELS)
+
+
+def reference(batch: MeasurementBatch, resolution: str) -> dict:
+    """{(bucket start us, channel): (count, min, max, sum, sum of squares)} of the non-NaN values, row by row"""
+    width = RAW_RESOLUTIONS[resolution]
+    values = defaultdict(list)
+    for micros, row in zip(batch.timestamps.view(np.int64).tolist(), batch.values.T.tolist()):
+        for channel, value in zip(batch.channels, row):
+            if not math.isnan(value):
+                values[(micros - micros % width, channel)].append(value)
+    return {
+        key: (len(vs), min(vs), max(vs), math.fsum(vs), math.fsum(v * v for v in vs))
+        for key, vs in values.items()
+    }
+
+
+def as_dict(stats, channels) -> dict:
+    result = {}
+    for i, channel in enumerate(channels):
+        for j, start in enumerate(stats.bucket_starts.tolist()):
+            if stats.counts[i, j]:
+                result[(start, channel)] = (
+                    int(stats.counts[i, j]), stats.mins[i, j], stats.maxs[i, j], stats.sums[i, j], stats.sum_squares[i, j],
+                )
+    return result
+
+
+@pytest.mark.parametrize('resolution', list(RAW_RESOLUTIONS))
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_aggregate_matches_reference(resolution, seed):
+    batch = random_batch(2_000, seed)
+    stats = aggregate(batch, resolution)
+
+    assert stats.resolution == resolution
+    assert np.all(np.diff(stats.bucket_starts) > 0)
+    expected = reference(batch, resolution)
+    actual = as_dict(stats, CHANNELS)
+    assert actual.keys() == expected.keys()
+    for key, (count, low, high, total, squares) in expected.items():
+        got = actual[key]
+        assert got[0] == count
+        assert got[1] == low and got[2] == high
+        assert got[3] == pytest.approx(total, rel=1e-9, abs=1e-9)
+        assert got[4] == pytest.approx(squares, rel=1e-9, abs=1e-9)
+
+
+def test_bucket_with_only_nulls_for_an_axis_has_no_row_for_it():
+    micros = np.datetime64('2024-03-01T12:00:00', 'us').astype(np.int64) + np.array([0, 100, 2_000_000])
+    values = np.array([
+        [1.0, 3.0, np.nan],
+        [np.nan, np.nan, 2.0],
+        [-1.0, 0.5, 4.0],
+    ])
+    batch = MeasurementBatch(np.arange(1, 4, dtype=np.int64), micros.view('datetime64[us]'), values, CHANNELS)
+    stats = aggregate(batch, '1s')
+
+    assert stats.counts.tolist() == [[2, 0], [0, 1], [2, 1]]
+    rows = stats.to_rows('accelerometer_data', 'e', CHANNELS)
+    assert [(row[3].second, row[4]) for row in rows] == [(0, 'accel_x'), (2, 'accel_y'), (0, 'accel_z'), (2, 'accel_z')]
+    first = dict(zip(ROLLUP_COLUMNS, rows[0]))
+    assert first == {
+        'source_table': 'accelerometer_data', 'endpoint_name': 'e', 'resolution': '1s',
+        'bucket_start': datetime(2024, 3, 1, 12, 0, 0), 'axis': 'accel_x',
+        'sample_count': 2, 'min_value': 1.0, 'max_value': 3.0, 'sum_value': 4.0, 'sum_squares': 10.0,
+    }
+
+
+def test_empty_batch_has_no_buckets():
+    stats = aggregate(MeasurementBatch.empty(CHANNELS), '1m')
+    assert stats.counts.shape == (len(CHANNELS), 0)
+    assert rollup_rows(MeasurementBatch.empty(CHANNELS), 'accelerometer_data', 'e') == []
+
+
+def test_rollup_rows_cover_every_raw_resolution():
+    batch = random_batch(500, seed=3, nan_fraction=0.0)
+    rows = rollup_rows(batch, 'accelerometer_data', 'e')
+    for resolution in RAW_RESOLUTIONS:
+        buckets = {row[3] for row in rows if row[2] == resolution}
+        assert len(buckets) == len(aggregate(batch, resolution).bucket_starts)
+        # Every raw row is counted once per axis at each resolution
+        assert sum(row[5] for row in rows if row[2] == resolution) == len(batch) * len(CHANNELS)
+
+
+def test_minute_window_covers_whole_minutes():
+    assert minute_window(datetime(2024, 3, 1, 12, 0, 59, 999999), datetime(2024, 3, 1, 12, 3, 0)) == (
+        datetime(2024, 3, 1, 12, 0), datetime(2024, 3, 1, 12, 4)
+    )
@@ -0,0 +1,324 @@
+"""
+Sensor ticks evaluated against stand-in resources, and their run requests resolved against defs.
+"""
+import json
+
+import pytest
+from dagster import DagsterInstance, RunRequest, build_sensor_context
+
+from dagster_etl import defs, manifest, sensors
+from dagster_etl.assets import ingest_async_data
+from dagster_etl.manifest import ManifestPage
+from dagster_etl.sensors import backfill_planner_sensor, endpoint_monitor_sensor, file_event_sensor
+
+
+def control_row(endpoint_id: int, endpoint_type: str, **columns) -> dict:
+    """An active ingest_control row as execute_query returns it"""
+    return {
+        'id': endpoint_id, 'ip_address': None, 'port': None, 'name': f'{endpoint_type}-{endpoint_id}',
+        'chunk_size': 50, 'max_chunks_per_run': 20, 'endpoint_type': endpoint_type, 'database_name': None,
+        'pipeline_depth': None, 'adaptive_chunking': False, 'min_chunk_size': None, 'max_chunk_size': None,
+        'run_time_budget_seconds': None, 'file_source': 'local', **columns,
+    }
+
+
+class FakeSupabase:
+    """Answers the sensors' ingest_control query with canned rows"""
+
+    def __init__(self, endpoints, checkpoints=None):
+        self.endpoints = endpoints
+        self.checkpoints = checkpoints or {}
+        self.checkpoint_reads = 0
+
+    def execute_query(self, query, params=None):
+        return self.endpoints
+
+    def get_checkpoints(self):
+        self.checkpoint_reads += 1
+        return self.checkpoints
+
+
+class FakeSource:
+    def __init__(self, max_id: int = 0):
+        self.max_id = max_id
+
+    def get_max_id(self, host, port, database):
+        if isinstance(self.max_id, Exception):
+            raise self.max_id
+        return self.max_id
+
+
+@pytest.fixture
+def instance(tmp_path):
+    # Persistent, so partitioned run requests can be resolved against its dynamic partitions
+    with DagsterInstance.local_temp(str(tmp_path)) as instance:
+        yield instance
+
+
+def tick(sensor, instance, supabase, cursor=None, mysql=None, postgres=None):
+    """Evaluate one sensor tick the way the daemon does; returns its SensorExecutionData"""
+    resources = {
+        'supabase': supabase, 'mysql_endpoint': mysql or FakeSource(), 'postgres_endpoint': postgres or FakeSource(),
+    }
+    with build_sensor_context(
+        instance=instance, instance_ref=instance.get_ref(), cursor=cursor, resources=resources,
+        repository_def=defs.get_repository_def(),
+    ) as context:
+        return sensor.evaluate_tick(context)
+
+
+def resolved_assets(sensor, run_request: RunRequest) -> set:
+    """Names of the assets the run request's job resolves to, as the daemon would launch it"""
+    job = defs.get_job_def(run_request.job_name or sensor.job_name)
+    subset = job.get_subset(asset_selection=set(run_request.asset_selection)) if run_request.asset_selection else job
+    return set(subset.graph.node_dict)
+
+
+@pytest.mark.parametrize('engine, expected', [
+    ('threads', {'ingest_mysql_data', 'ingest_postgres_data'}),
+    ('async', {'ingest_async_data'}),
+])
+def test_database_runs_resolve_to_their_ingest_assets(monkeypatch, instance, engine, expected):
+    monkeypatch.setattr(sensors, 'ENGINE', engine)
+    monkeypatch.setattr(sensors, 'CHANGE_DETECTION', False)
+    monkeypatch.setattr(sensors, 'ROLLUPS_ENABLED', False)
+    supabase = FakeSupabase([control_row(1, 'mysql'), control_row(2, 'postgres')])
+
+    run_requests = tick(endpoint_monitor_sensor, instance, supabase).run_requests
+
+    assert run_requests and all(isinstance(request, RunRequest) for request in run_requests)
+    resolved = set().union(*(resolved_assets(endpoint_monitor_sensor, request) for request in run_requests))
+    assert resolved == expected
+    if engine == 'async':
+        (request,) = run_requests
+        assert request.asset_selection == [ingest_async_data.key]
+        assert request.tags['endpoint_ids'] == '1,2'
+
+
+class FileEventSupabase(FakeSupabase):
+    """Also answers file_event_sensor's file_events queries from (id, endpoint_name) rows"""
+
+    def __init__(self, endpoints, events):
+        super().__init__(endpoints)
+        self.events = events
+
+    def execute_query(self, query, params=None):
+        if 'SELECT id FROM file_events' in query:
+            endpoint_name, after_id, limit = params
+            return [{'id': i} for i, name in self.events if name == endpoint_name and i > after_id][:limit]
+        if 'file_events' in query:
+            return []
+        return self.endpoints
+
+
+def test_file_event_runs_cover_only_their_endpoints_events(monkeypatch, instance):
+    monkeypatch.setattr(sensors, 'FILE_RECHECK_SECONDS', 3600)
+    endpoints = [control_row(1, 'file', name='north', max_chunks_per_run=2), control_row(2, 'file', name='south')]
+    supabase = FileEventSupabase(endpoints, [(1, 'north'), (2, 'south'), (3, 'north'), (4, 'north'), (5, 'other')])
+    cursor = json.dumps({'event_ids': {}, 'swept_at': 4e9})
+
+    result = tick(file_event_sensor, instance, supabase, cursor=cursor)
+    assert [(r.tags['endpoint_name'], r.tags['file_event_range']) for r in result.run_requests] == [
+        ('north', '0-3'), ('north', '3-4'), ('south', '0-2'),
+    ]
+    assert json.loads(result.cursor)['event_ids'] == {'north': 4, 'south': 2}
+
+    # Only south has a new event; north resumes from its own position
+    supabase.events.append((6, 'south'))
+    result = tick(file_event_sensor, instance, supabase, cursor=result.cursor)
+    assert [(r.tags['endpoint_name'], r.tags['file_event_range']) for r in result.run_requests] == [('south', '2-6')]
+    assert json.loads(result.cursor)['event_ids'] == {'north': 4, 'south': 6}
+
+
+def test_file_event_cursor_from_before_per_endpoint_ids_resumes_everywhere(monkeypatch, instance):
+    monkeypatch.setattr(sensors, 'FILE_RECHECK_SECONDS', 3600)
+    supabase = FileEventSupabase([control_row(1, 'file', name='north')], [(7, 'north'), (8, 'north')])
+
+    result = tick(file_event_sensor, instance, supabase, cursor=json.dumps({'event_id': 7, 'swept_at': 4e9}))
+    assert [r.tags['file_event_range'] for r in result.run_requests] == ['7-8']
+
+
+class BackfillSupabase(FakeSupabase):
+    """Also keeps backfill_ranges: pending ranges and the attempts they have had"""
+
+    def __init__(self, endpoints, pending=(), watermark=0):
+        super().__init__(endpoints)
+        self.pending = list(pending)
+        self.watermark = watermark
+        self.planned = []
+
+    def get_pending_backfills(self):
+        return self.pending
+
+    def retry_backfill(self, table, key):
+        row = next(row for row in self.pending if (row['target_table'], row['partition_key']) == (table, key))
+        row['attempts'] += 1
+        return row['attempts']
+
+    def plan_backfill(self, table, endpoint_name, keys, up_to_id):
+        self.planned.append((table, endpoint_name, keys, up_to_id))
+
+    def get_watermark(self, table, endpoint_name):
+        return self.watermark
+
+
+def test_backfill_planner_splits_the_backlog_into_partitions(monkeypatch, instance):
+    monkeypatch.setattr(sensors, 'BACKFILL_MIN_BACKLOG', 100)
+    monkeypatch.setattr(sensors, 'BACKFILL_PARTITION_ROWS', 40)
+    supabase = BackfillSupabase([control_row(3, 'mysql', name='line-3')], watermark=10)
+
+    result = tick(backfill_planner_sensor, instance, supabase, mysql=FakeSource(125))
+    keys = ['3:10-50', '3:50-90', '3:90-125']
+    assert [request.partition_key for request in result.run_requests] == keys
+    assert supabase.planned == [('accelerometer_data', 'line-3', keys, 125)]
+    (partitions_request,) = result.dynamic_partitions_requests
+    assert partitions_request.partition_keys == keys
+
+    # A backlog under the minimum is left to incremental runs
+    result = tick(backfill_planner_sensor, instance, supabase, mysql=FakeSource(109))
+    assert result.run_requests == [] and result.skip_message
+
+
+def test_backfill_planner_stops_retrying_after_max_attempts(monkeypatch, instance):
+    monkeypatch.setattr(sensors, 'BACKFILL_MAX_ATTEMPTS', 3)
+    pending = [
+        {'target_table': 'accelerometer_data', 'partition_key': f'3:{after_id}-{after_id + 40}',
+         'endpoint_name': 'line-3', 'attempts': attempts}
+        for after_id, attempts in ((10, 1), (50, 2), (90, 3))
+    ]
+    supabase = BackfillSupabase([control_row(3, 'mysql', name='line-3')], pending=pending, watermark=130)
+
+    result = tick(backfill_planner_sensor, instance, supabase, mysql=FakeSource(130))
+    assert [(r.partition_key, r.run_key) for r in result.run_requests] == [
+        ('3:10-50', 'backfill_mysql_3:10-50_attempt2'), ('3:50-90', 'backfill_mysql_3:50-90_attempt3'),
+    ]
+    # The next tick gives up on the range that has now had its third run
+    result = tick(backfill_planner_sensor, instance, supabase, mysql=FakeSource(130))
+    assert [r.partition_key for r in result.run_requests] == ['3:10-50']
+    assert [row['attempts'] for row in supabase.pending] == [3, 3, 3]
+
+
+@pytest.fixture
+def change_detection(monkeypatch):
+    monkeypatch.setattr(sensors, 'CHANGE_DETECTION', True)
+    monkeypatch.setattr(sensors, 'ENGINE', 'threads')
+    monkeypatch.setattr(sensors, 'RUN_MODE', 'per_endpoint')
+    monkeypatch.setattr(sensors, 'FILE_DISCOVERY', 'poll')
+    monkeypatch.setattr(sensors, '_busy_endpoints', lambda context: (set(), set()))
+
+
+def requested(result) -> list:
+    return [request.tags['endpoint_name'] for request in result.run_requests]
+
+
+def test_database_endpoint_is_requested_until_caught_up(change_detection, instance):
+    supabase = FakeSupabase([control_row(3, 'mysql', name='line-3')],
+                            {('accelerometer_data', 'line-3'): {'last_source_id': 100}})
+    source = FakeSource(150)
+
+    result = tick(endpoint_monitor_sensor, instance, supabase, mysql=source)
+    assert requested(result) == ['line-3']
+    assert json.loads(result.cursor) == {'mysql:line-3': {'source_max': 150, 'caught_up': False}}
+
+    # Still behind while the run has not moved the watermark
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor, mysql=source)
+    assert requested(result) == ['line-3']
+
+    supabase.checkpoints[('accelerometer_data', 'line-3')]['last_source_id'] = 150
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor, mysql=source)
+    assert requested(result) == [] and result.skip_message
+    assert json.loads(result.cursor) == {'mysql:line-3': {'source_max': 150, 'caught_up': True}}
+
+    # Caught up and the source max is unchanged: the watermark is not even read
+    reads = supabase.checkpoint_reads
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor, mysql=source)
+    assert requested(result) == [] and supabase.checkpoint_reads == reads
+
+    source.max_id = 160
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor, mysql=source)
+    assert requested(result) == ['line-3']
+    assert json.loads(result.cursor) == {'mysql:line-3': {'source_max': 160, 'caught_up': False}}
+
+
+def test_busy_or_unreachable_endpoints_keep_their_previous_state(change_detection, monkeypatch, instance):
+    supabase = FakeSupabase([control_row(3, 'mysql', name='line-3')],
+                            {('accelerometer_data', 'line-3'): {'last_source_id': 100}})
+    previous = json.dumps({'mysql:line-3': {'source_max': 100, 'caught_up': True}})
+
+    monkeypatch.setattr(sensors, '_busy_endpoints', lambda context: ({'line-3'}, set()))
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=previous, mysql=FakeSource(150))
+    # The change is picked up once the run in flight finishes
+    assert requested(result) == [] and json.loads(result.cursor) == json.loads(previous)
+
+    monkeypatch.setattr(sensors, '_busy_endpoints', lambda context: (set(), set()))
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=previous,
+                  mysql=FakeSource(ConnectionRefusedError('endpoint down')))
+    assert requested(result) == [] and json.loads(result.cursor) == json.loads(previous)
+
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=previous, mysql=FakeSource(150))
+    assert requested(result) == ['line-3']
+
+
+def test_local_file_endpoint_is_requested_when_its_directory_or_high_water_mark_moves(
+        change_detection, monkeypatch, tmp_path, instance):
+    monkeypatch.setattr(sensors, 'FILE_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(sensors, 'FILE_RECHECK_SECONDS', 300)
+    supabase = FakeSupabase([control_row(9, 'file', name='camera')], {})
+
+    def state(result):
+        return json.loads(result.cursor)['file:camera']
+
+    result = tick(endpoint_monitor_sensor, instance, supabase)
+    assert requested(result) == ['camera']
+    assert state(result)['mtime'] == tmp_path.stat().st_mtime_ns and state(result)['last_folder'] is None
+
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor)
+    assert requested(result) == []
+
+    (tmp_path / '20240301_120000').mkdir()
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor)
+    assert requested(result) == ['camera']
+
+    # The last run found a folder, so there may be more behind it
+    supabase.checkpoints[('file_metadata', 'camera')] = {'last_folder': '20240301_120000'}
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor)
+    assert requested(result) == ['camera'] and state(result)['last_folder'] == '20240301_120000'
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor)
+    assert requested(result) == []
+
+    # Nothing moved, but a recheck is due for settling folders and reconciliation sweeps
+    stale = json.loads(result.cursor)
+    stale['file:camera']['requested_at'] -= 301
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=json.dumps(stale))
+    assert requested(result) == ['camera'] and state(result)['requested_at'] > stale['file:camera']['requested_at']
+
+
+def test_remote_file_endpoint_checks_the_manifest_etag(change_detection, monkeypatch, instance):
+    pages = {}
+    calls = []
+
+    def fetch_manifest(host, port, after=None, limit=1000, etag=None, timeout=None):
+        calls.append((after, limit, etag))
+        page = pages[after]
+        if etag == page.etag:
+            return ManifestPage(cursor=after, etag=etag, not_modified=True)
+        return page
+
+    monkeypatch.setattr(manifest, 'fetch_manifest', fetch_manifest)
+    supabase = FakeSupabase([control_row(9, 'file', name='remote-camera', file_source='remote')], {})
+    pages[None] = ManifestPage(folders=[{'folder': '20240301_120000'}], cursor='20240301_120000', etag='W/"a"')
+
+    result = tick(endpoint_monitor_sensor, instance, supabase)
+    assert requested(result) == ['remote-camera']
+    assert json.loads(result.cursor) == {'file:remote-camera': {'etag': 'W/"a"', 'last_folder': None}}
+
+    # Unchanged first page: a 304, and the state is kept as it was
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor)
+    assert requested(result) == [] and calls[-1] == (None, 1, 'W/"a"')
+
+    # The run loaded the folder; nothing is listed after it yet
+    supabase.checkpoints[('file_metadata', 'remote-camera')] = {'last_folder': '20240301_120000'}
+    pages['20240301_120000'] = ManifestPage(cursor='20240301_120000', etag='W/"b"')
+    result = tick(endpoint_monitor_sensor, instance, supabase, cursor=result.cursor)
+    assert requested(result) == []
+    assert json.loads(result.cursor)['file:remote-camera'] == {'etag': 'W/"b"', 'last_folder': '20240301_120000'}
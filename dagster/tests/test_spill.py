@@ -0,0 +1,171 @@
+"""
+Spilling chunks to local disk while the sink is down, and replaying them in order.
+"""
+import logging
+
+import numpy as np
+import psycopg2
+import pytest
+
+from dagster_etl import spill as spill_module
+from dagster_etl.columnar import MeasurementBatch
+from dagster_etl.spill import SpillBuffer, SpillFull, SpillingSink
+
+CHANNELS = ('accel_x', 'accel_y', 'accel_z')
+TABLE = 'accelerometer_data'
+ENDPOINT = 'line 3/west'
+LOG = logging.getLogger(__name__)
+
+
+def batch(first_id: int, rows: int = 4) -> MeasurementBatch:
+    ids = np.arange(first_id, first_id + rows, dtype=np.int64)
+    timestamps = (np.int64(1_709_294_400_000_000) + ids * 1_000).view('datetime64[us]')
+    values = np.vstack([ids * 0.5 + channel for channel in range(len(CHANNELS))]).astype(np.float64)
+    return MeasurementBatch(ids, timestamps, values, CHANNELS, ENDPOINT)
+
+
+class FlakySupabase:
+    """Records committed batches; insert_batch fails while ``down`` is set or for the call numbers in ``fail_calls``"""
+
+    def __init__(self, down: bool = False, fail_calls=()):
+        self.down = down
+        self.fail_calls = set(fail_calls)
+        self.calls = 0
+        self.loaded = []
+        self.watermark = 0
+
+    def get_watermark(self, table, endpoint_name):
+        if self.down:
+            raise psycopg2.OperationalError('connection refused')
+        return self.watermark
+
+    def insert_batch(self, table, columns, values, checkpoint=None, timings=None):
+        self.calls += 1
+        if self.down or self.calls in self.fail_calls:
+            raise psycopg2.OperationalError('connection refused')
+        self.loaded.append(values)
+        self.watermark = checkpoint['last_source_id']
+        return len(values)
+
+
+def loaded_ids(supabase) -> list:
+    return [int(i) for values in supabase.loaded for i in values.ids]
+
+
+@pytest.mark.parametrize('compression', [0, 1])
+def test_segment_round_trip(tmp_path, compression):
+    buffer = SpillBuffer(str(tmp_path), compression=compression)
+    path = buffer.append(TABLE, ENDPOINT, batch(11))
+
+    assert path.name == f'{11:020d}-{14:020d}.seg'
+    restored = SpillBuffer.read(path)
+    original = batch(11)
+    assert restored.endpoint_name == ENDPOINT and restored.channels == CHANNELS
+    np.testing.assert_array_equal(restored.ids, original.ids)
+    np.testing.assert_array_equal(restored.timestamps, original.timestamps)
+    np.testing.assert_array_equal(restored.values, original.values)
+    assert buffer.size() == path.stat().st_size
+
+
+def test_chunks_overflow_to_disk_and_replay_in_source_order(tmp_path):
+    buffer = SpillBuffer(str(tmp_path))
+    supabase = FlakySupabase(fail_calls={2})
+    sink = SpillingSink(supabase, buffer, TABLE, CHANNELS, ENDPOINT, LOG)
+    assert sink.start() == 0
+
+    assert sink.load(batch(1), 4) == 4
+    # The second load fails: it and every later chunk go to disk so none overtakes another
+    assert [sink.load(batch(first), first + 3) for first in (5, 9, 13)] == [0, 0, 0]
+    assert (sink.healthy, sink.spilled_rows) == (False, 12)
+    assert buffer.watermark(TABLE, ENDPOINT) == 16
+    sink.finish()
+    assert loaded_ids(supabase) == [1, 2, 3, 4]
+
+    # The next run replays the segments before reading on from the spilled watermark
+    sink = SpillingSink(supabase, buffer, TABLE, CHANNELS, ENDPOINT, LOG, replay_rows=8)
+    assert sink.start() == 16
+    assert loaded_ids(supabase) == list(range(1, 17))
+    assert [len(values) for values in supabase.loaded] == [4, 8, 4]
+    assert (sink.replayed_rows, sink.replayed_id, supabase.watermark) == (12, 16, 16)
+
+
+def test_replayed_segments_are_deleted(tmp_path):
+    buffer = SpillBuffer(str(tmp_path))
+    supabase = FlakySupabase()
+    sink = SpillingSink(supabase, buffer, TABLE, CHANNELS, ENDPOINT, LOG, write_ahead=True)
+    sink.start()
+    for first in (1, 5):
+        sink.load(batch(first), first + 3)
+    assert len(buffer.segments(TABLE, ENDPOINT)) == 2
+
+    sink.finish()
+    assert loaded_ids(supabase) == list(range(1, 9))
+    assert buffer.segments(TABLE, ENDPOINT) == []
+    assert list(tmp_path.rglob('*.seg')) == list(tmp_path.rglob('*.tmp')) == []
+    assert buffer.size() == 0
+
+
+def test_failed_segment_write_leaves_no_partial_file(tmp_path, monkeypatch):
+    buffer = SpillBuffer(str(tmp_path))
+    buffer.append(TABLE, ENDPOINT, batch(1))
+    held = buffer.size()
+
+    def disk_full(fd):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(spill_module.os, 'fsync', disk_full)
+    with pytest.raises(OSError):
+        buffer.append(TABLE, ENDPOINT, batch(5))
+    assert list(tmp_path.rglob('*.tmp')) == []
+    assert [path.name[:20] for path in buffer.segments(TABLE, ENDPOINT)] == [f'{1:020d}']
+    assert buffer.size() == held
+
+
+def test_sink_failure_mid_drain_keeps_the_unreplayed_segments(tmp_path):
+    buffer = SpillBuffer(str(tmp_path))
+    for first in (1, 5, 9):
+        buffer.append(TABLE, ENDPOINT, batch(first))
+    supabase = FlakySupabase(fail_calls={2})
+
+    sink = SpillingSink(supabase, buffer, TABLE, CHANNELS, ENDPOINT, LOG, replay_rows=4)
+    # The first segment commits; the second fails, so reading resumes after what is on disk
+    assert sink.start() == 12
+    assert (sink.healthy, sink.replayed_id, supabase.watermark) == (False, 4, 4)
+    assert [path.name[:20] for path in buffer.segments(TABLE, ENDPOINT)] == [f'{5:020d}', f'{9:020d}']
+    # New chunks queue up behind them
+    assert sink.load(batch(13), 16) == 0
+
+    sink = SpillingSink(supabase, buffer, TABLE, CHANNELS, ENDPOINT, LOG, replay_rows=4)
+    assert sink.start() == 16
+    assert loaded_ids(supabase) == list(range(1, 17))
+    assert buffer.segments(TABLE, ENDPOINT) == []
+
+
+def test_start_while_supabase_is_down_resumes_from_spilled_watermark(tmp_path):
+    buffer = SpillBuffer(str(tmp_path))
+    buffer.append(TABLE, ENDPOINT, batch(1))
+    sink = SpillingSink(FlakySupabase(down=True), buffer, TABLE, CHANNELS, ENDPOINT, LOG)
+    assert sink.start() == 4
+    assert not sink.healthy
+
+    # Nothing spilled for this endpoint: the error is not hidden
+    other = SpillingSink(FlakySupabase(down=True), buffer, TABLE, CHANNELS, 'other', LOG)
+    with pytest.raises(psycopg2.OperationalError):
+        other.start()
+
+
+def test_spill_stops_at_max_bytes(tmp_path):
+    buffer = SpillBuffer(str(tmp_path), max_bytes=1)
+    buffer.append(TABLE, ENDPOINT, batch(1))
+    with pytest.raises(SpillFull):
+        buffer.append(TABLE, ENDPOINT, batch(5))
+    assert len(buffer.segments(TABLE, ENDPOINT)) == 1
+
+
+def test_row_tuples_are_spilled_as_batches(tmp_path):
+    buffer = SpillBuffer(str(tmp_path))
+    sink = SpillingSink(FlakySupabase(), buffer, TABLE, CHANNELS, ENDPOINT, LOG, write_ahead=True)
+    rows = [(i, 1_709_294_400_000_000 + i, 0.1, 0.2, 0.3, ENDPOINT) for i in (3, 4)]
+    assert sink.load(rows, 4) == 0
+    (path,) = buffer.segments(TABLE, ENDPOINT)
+    np.testing.assert_array_equal(SpillBuffer.read(path).ids, [3, 4])
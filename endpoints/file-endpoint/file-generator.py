@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 import os
+import re
 import time
+import json
 import random
+import hashlib
+import zlib
 from datetime import datetime
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 import threading
 from pathlib import Path
 from PIL import Image
@@ -12,6 +17,19 @@ import zipfile
 
 DATA_DIR = Path("/data")
 
+# Folders are named YYYYMMDD_HHMMSS, so name order is creation order
+FOLDER_NAME_PATTERN = re.compile(r'^\d{8}_\d{6}$')
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+# Folders modified more recently than this may still be being written and are not listed yet
+MANIFEST_SETTLE_SECONDS = 2.0
+MANIFEST_MAX_LIMIT = 10000
+# Response body is written in chunks of about this size
+MANIFEST_CHUNK_BYTES = 64 * 1024
+
+# Parsed manifest entries by folder name, with the folder mtime they were built from
+_manifest_cache = {}
+_manifest_lock = threading.Lock()
+
 def generate_xml_file(folder_path, timestamp):
     """Generate a sample XML file"""
     root = ET.Element("measurement")
@@ -95,17 +113,190 @@ def data_generator():
             print(f"Error generating folder: {e}")
             time.sleep(10)
 
+def _float(text):
+    return float(text) if text not in (None, '') else None
+
+def parse_folder(path):
+    """Manifest entry for one folder: its files plus the parsed XML and KMZ fields"""
+    entry = {
+        "folder": path.name, "files": [], "image_count": 0, "xml_file": None, "kmz_file": None,
+        "measured_at": None, "latitude": None, "longitude": None, "altitude": None,
+        "kml_latitude": None, "kml_longitude": None, "kml_altitude": None, "errors": [],
+    }
+    with os.scandir(path) as files:
+        for file in sorted(files, key=lambda f: f.name):
+            if not file.is_file():
+                continue
+            entry["files"].append({"name": file.name, "size": file.stat().st_size})
+            suffix = os.path.splitext(file.name)[1].lower()
+            if suffix == '.xml':
+                entry["xml_file"] = file.name
+            elif suffix == '.kmz':
+                entry["kmz_file"] = file.name
+            elif suffix in IMAGE_SUFFIXES:
+                entry["image_count"] += 1
+
+    if entry["xml_file"]:
+        try:
+            root = ET.parse(path / entry["xml_file"]).getroot()
+            entry.update(
+                measured_at=root.findtext('timestamp'),
+                latitude=_float(root.findtext('latitude')),
+                longitude=_float(root.findtext('longitude')),
+                altitude=_float(root.findtext('altitude')),
+            )
+        except (ET.ParseError, ValueError, OSError) as e:
+            entry["errors"].append(f"{entry['xml_file']}: {e}")
+
+    if entry["kmz_file"]:
+        try:
+            with zipfile.ZipFile(path / entry["kmz_file"]) as kmz:
+                kml_name = next(name for name in kmz.namelist() if name.lower().endswith('.kml'))
+                root = ET.fromstring(kmz.read(kml_name))
+            coordinates = next(el.text for el in root.iter() if el.tag.rsplit('}', 1)[-1] == 'coordinates')
+            parts = coordinates.strip().split()[0].split(',')
+            entry.update(
+                kml_longitude=float(parts[0]),
+                kml_latitude=float(parts[1]),
+                kml_altitude=float(parts[2]) if len(parts) > 2 else None,
+            )
+        except (ET.ParseError, ValueError, OSError, StopIteration, zipfile.BadZipFile) as e:
+            entry["errors"].append(f"{entry['kmz_file']}: {e or 'no KML coordinates'}")
+
+    return entry
+
+def list_manifest_folders(after, limit):
+    """Settled folders named after `after`, oldest first, as (name, mtime_ns); plus whether more remain"""
+    with os.scandir(DATA_DIR) as entries:
+        candidates = sorted(
+            (entry for entry in entries
+             if FOLDER_NAME_PATTERN.match(entry.name) and (after is None or entry.name > after) and entry.is_dir()),
+            key=lambda entry: entry.name
+        )
+    folders = []
+    now = time.time()
+    for entry in candidates:
+        mtime_ns = entry.stat().st_mtime_ns
+        # Stop at the first folder that may still be being written, so a cursor never skips it
+        if now - mtime_ns / 1e9 < MANIFEST_SETTLE_SECONDS or len(folders) == limit:
+            break
+        folders.append((entry.name, mtime_ns))
+    more = len(folders) == limit and len(candidates) > limit
+    return folders, more
+
+def manifest_entry(name, mtime_ns):
+    """Cached manifest entry, rebuilt if the folder changed since it was parsed"""
+    with _manifest_lock:
+        cached = _manifest_cache.get(name)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    entry = json.dumps(parse_folder(DATA_DIR / name)).encode()
+    with _manifest_lock:
+        _manifest_cache[name] = (mtime_ns, entry)
+    return entry
+
 class CustomHTTPRequestHandler(SimpleHTTPRequestHandler):
+    # Keep-alive, so a sync can page through the manifest on one connection
+    protocol_version = "HTTP/1.1"
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=str(DATA_DIR), **kwargs)
 
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/manifest':
+            return self.send_manifest(parse_qs(url.query))
+        return super().do_GET()
+
+    def send_manifest(self, query):
+        """
+        GET /manifest?after=<folder>&limit=<n>&format=ndjson|json
+
+        Streams one entry per settled folder named after `after` (files with
+        sizes, image count, parsed XML and KMZ fields), oldest first. The
+        X-Manifest-Cursor header is the `after` for the next page and
+        X-Manifest-More says whether there is one. Responses are gzipped if
+        the client accepts it, and carry an ETag over the listed folders and
+        their mtimes, so an unchanged page costs a 304.
+        """
+        try:
+            after = query.get('after', [''])[0] or None
+            limit = max(1, min(int(query.get('limit', ['1000'])[0]), MANIFEST_MAX_LIMIT))
+        except ValueError:
+            return self.send_error(400, "limit must be an integer")
+        as_array = query.get('format', ['ndjson'])[0] == 'json'
+
+        folders, more = list_manifest_folders(after, limit)
+        digest = hashlib.sha1(f"{after}|{limit}|{as_array}".encode())
+        for name, mtime_ns in folders:
+            digest.update(f"|{name}:{mtime_ns}".encode())
+        etag = f'W/"{digest.hexdigest()}"'
+
+        headers = {
+            "ETag": etag,
+            "X-Manifest-Cursor": folders[-1][0] if folders else (after or ''),
+            "X-Manifest-More": "true" if more else "false",
+            "Vary": "Accept-Encoding",
+        }
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json" if as_array else "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        # wbits=31 writes a gzip container around the deflate stream
+        encoder = zlib.compressobj(6, zlib.DEFLATED, 31) if gzipped else None
+        pending = []
+        pending_bytes = 0
+
+        def write_chunk(data):
+            if encoder:
+                data = encoder.compress(data)
+            if data:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        if as_array:
+            pending.append(b"[")
+        written = 0
+        for name, mtime_ns in folders:
+            try:
+                entry = manifest_entry(name, mtime_ns)
+            except OSError:
+                # Deleted since it was listed
+                continue
+            pending.append((b"," if as_array and written else b"") + entry + (b"" if as_array else b"\n"))
+            written += 1
+            pending_bytes += len(pending[-1])
+            if pending_bytes >= MANIFEST_CHUNK_BYTES:
+                write_chunk(b"".join(pending))
+                pending, pending_bytes = [], 0
+        if as_array:
+            pending.append(b"]")
+        write_chunk(b"".join(pending))
+        if encoder:
+            tail = encoder.flush()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(tail), tail))
+        self.wfile.write(b"0\r\n\r\n")
+
     def log_message(self, format, *args):
         # Suppress HTTP server logs
         pass
 
 def run_http_server():
-    """Run HTTP server to serve files"""
-    server = HTTPServer(('0.0.0.0', 8000), CustomHTTPRequestHandler)
+    """Run HTTP server to serve files and the folder manifest"""
+    server = ThreadingHTTPServer(('0.0.0.0', 8000), CustomHTTPRequestHandler)
     print("HTTP server started on port 8000")
     server.serve_forever()
 
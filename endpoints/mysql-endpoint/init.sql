@@ -8,3 +8,6 @@ CREATE TABLE IF NOT EXISTS measurements (
     accel_z DECIMAL(10, 6),
     INDEX idx_timestamp (timestamp)
 );
+
+-- Change-data-capture: the cdc-consumer reads row-based binlog events as a replica
+GRANT REPLICATION SLAVE, REPLICATION CLIENT ON *.* TO 'sensoruser'@'%';
@@ -10,3 +10,7 @@ CREATE TABLE IF NOT EXISTS measurements (
 );
 
 CREATE INDEX idx_measurements_timestamp ON measurements(timestamp);
+
+-- Change-data-capture: the cdc-consumer streams inserts through this publication
+-- (the server runs with wal_level=logical; see docker-compose.yml)
+CREATE PUBLICATION ingest_cdc FOR TABLE measurements;
@@ -9,25 +9,38 @@ CREATE TABLE IF NOT EXISTS ingest_control (
     active BOOLEAN DEFAULT false,
     endpoint_type VARCHAR(50) NOT NULL, -- 'mysql', 'postgres', 'file'
     database_name VARCHAR(100), -- for database endpoints
+    pipeline_depth INTEGER DEFAULT 2, -- chunks prefetched from the source while the previous one loads (0 = serial)
+    adaptive_chunking BOOLEAN DEFAULT true, -- tune chunk_size from measured throughput and write it back
+    min_chunk_size INTEGER DEFAULT 50, -- adaptive chunk size floor
+    max_chunk_size INTEGER DEFAULT 10000, -- adaptive chunk size ceiling
+    run_time_budget_seconds INTEGER DEFAULT 60, -- adaptive runs stop starting new chunks after this long
+    ingest_mode VARCHAR(10) NOT NULL DEFAULT 'poll', -- 'poll' (sensor-triggered runs) or 'cdc' (streamed by cdc-consumer)
+    file_source VARCHAR(10) NOT NULL DEFAULT 'local', -- file endpoints: 'local' (FILE_DATA_DIR) or 'remote' (the endpoint's /manifest API)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Raw sensor tables are range-partitioned on timestamp. storage_maintenance_job creates
+-- the partitions; rows no partition covers yet land in the _default partition until it
+-- moves them out.
+
 -- Accelerometer data table (from MySQL endpoint)
 CREATE TABLE IF NOT EXISTS accelerometer_data (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     endpoint_name VARCHAR(255) NOT NULL,
     timestamp TIMESTAMP NOT NULL,
     accel_x DECIMAL(10, 6),
     accel_y DECIMAL(10, 6),
     accel_z DECIMAL(10, 6),
     ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    source_id INTEGER -- original ID from source system
-);
+    source_id INTEGER, -- original ID from source system
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+CREATE TABLE IF NOT EXISTS accelerometer_data_default PARTITION OF accelerometer_data DEFAULT;
 
 -- Accelerometer + Magnetometer data table (from PostgreSQL endpoint)
 CREATE TABLE IF NOT EXISTS accel_mag_data (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     endpoint_name VARCHAR(255) NOT NULL,
     timestamp TIMESTAMP NOT NULL,
     accel_x DECIMAL(10, 6),
@@ -37,8 +50,10 @@ CREATE TABLE IF NOT EXISTS accel_mag_data (
     mag_y DECIMAL(10, 6),
     mag_z DECIMAL(10, 6),
     ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    source_id INTEGER
-);
+    source_id INTEGER,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+CREATE TABLE IF NOT EXISTS accel_mag_data_default PARTITION OF accel_mag_data DEFAULT;
 
 -- File metadata table (from file endpoint)
 CREATE TABLE IF NOT EXISTS file_metadata (
@@ -48,10 +63,99 @@ CREATE TABLE IF NOT EXISTS file_metadata (
     xml_file VARCHAR(255),
     kmz_file VARCHAR(255),
     image_count INTEGER,
+    measured_at TIMESTAMP, -- from measurement.xml
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    altitude DOUBLE PRECISION,
+    kml_latitude DOUBLE PRECISION, -- Placemark point from location.kmz
+    kml_longitude DOUBLE PRECISION,
+    kml_altitude DOUBLE PRECISION,
     created_at TIMESTAMP NOT NULL,
     ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Per-endpoint ingestion checkpoint, updated in the same transaction as each chunk's insert
+CREATE TABLE IF NOT EXISTS ingest_state (
+    target_table VARCHAR(100) NOT NULL,
+    endpoint_name VARCHAR(255) NOT NULL,
+    last_source_id BIGINT, -- highest source id committed to target_table
+    last_folder VARCHAR(255), -- file endpoints: newest YYYYMMDD_HHMMSS folder ingested
+    last_reconciled_at TIMESTAMP, -- file endpoints: last completed full folder sweep
+    cdc_position BIGINT, -- CDC endpoints: replication position (LSN, or binlog file number << 32 | offset) after the last loaded transaction
+    rows_ingested BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (target_table, endpoint_name)
+);
+
+-- Backfill partitions planned behind the ingest_state watermark and not loaded yet;
+-- backfill_planner_sensor requests a range again if its run fails or never launches
+CREATE TABLE IF NOT EXISTS backfill_ranges (
+    target_table VARCHAR(100) NOT NULL,
+    endpoint_name VARCHAR(255) NOT NULL,
+    partition_key VARCHAR(255) NOT NULL, -- "<endpoint_id>:<after_id>-<up_to_id>"
+    attempts INTEGER NOT NULL DEFAULT 1, -- runs requested for the range
+    planned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (target_table, partition_key)
+);
+
+-- Completed folders reported by the file-watcher service (INGEST_FILE_DISCOVERY=events);
+-- file_event_sensor hands them to ingest_file_data runs in id order
+CREATE TABLE IF NOT EXISTS file_events (
+    id BIGSERIAL PRIMARY KEY,
+    endpoint_name VARCHAR(255), -- ingest_control name of the file endpoint the watcher reports for
+    folder_name VARCHAR(255) NOT NULL, -- YYYYMMDD_HHMMSS folder under FILE_DATA_DIR
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_file_events_endpoint ON file_events(endpoint_name, id);
+
+-- Content hash and thumbnail of every image in an ingested local file endpoint folder,
+-- written by the file_images asset; also its cache of already-hashed files
+CREATE TABLE IF NOT EXISTS file_images (
+    endpoint_name VARCHAR(255) NOT NULL,
+    folder_path VARCHAR(500) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    file_size BIGINT NOT NULL, -- with file_mtime_ns, decides whether content_hash is still current
+    file_mtime_ns BIGINT NOT NULL,
+    content_hash CHAR(64) NOT NULL, -- SHA-256 of the image bytes
+    width INTEGER,
+    height INTEGER,
+    thumbnail_path VARCHAR(500), -- INGEST_THUMBNAIL_DIR/<hash[:2]>/<hash>.jpg, shared by equal images
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (endpoint_name, folder_path, file_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_file_images_content_hash ON file_images(content_hash);
+
+-- (endpoint_name, source_id) of every row upserted into the partitioned sensor tables,
+-- whose own unique indexes must include timestamp: a source row is loaded once even if
+-- its timestamp changes between reads
+CREATE TABLE IF NOT EXISTS sensor_source_keys (
+    source_table VARCHAR(100) NOT NULL, -- 'accelerometer_data' or 'accel_mag_data'
+    endpoint_name VARCHAR(255) NOT NULL,
+    source_id BIGINT NOT NULL,
+    timestamp TIMESTAMP NOT NULL, -- of the loaded row, so retention purges keys with their partition
+    PRIMARY KEY (source_table, endpoint_name, source_id)
+);
+
+-- Downsampled accelerometer/magnetometer stats per endpoint, axis and 1s/1m/1h bucket,
+-- refreshed after every ingest run for the buckets its rows fall in
+CREATE TABLE IF NOT EXISTS sensor_rollups (
+    source_table VARCHAR(100) NOT NULL, -- 'accelerometer_data' or 'accel_mag_data'
+    endpoint_name VARCHAR(255) NOT NULL,
+    resolution VARCHAR(4) NOT NULL, -- '1s', '1m' or '1h'
+    bucket_start TIMESTAMP NOT NULL,
+    axis VARCHAR(20) NOT NULL, -- accel_x ... mag_z
+    sample_count BIGINT NOT NULL, -- non-NULL raw values in the bucket
+    min_value DOUBLE PRECISION,
+    max_value DOUBLE PRECISION,
+    sum_value DOUBLE PRECISION,
+    sum_squares DOUBLE PRECISION,
+    mean_value DOUBLE PRECISION GENERATED ALWAYS AS (sum_value / sample_count) STORED,
+    rms_value DOUBLE PRECISION GENERATED ALWAYS AS (sqrt(sum_squares / sample_count)) STORED,
+    PRIMARY KEY (source_table, endpoint_name, resolution, bucket_start, axis)
+);
+
 -- Insert sample ingest control records
 INSERT INTO ingest_control (ip_address, port, name, chunk_size, max_chunks_per_run, active, endpoint_type, database_name) VALUES
 ('mysql-endpoint', 3306, 'MySQL Accelerometer Sensor', 50, 20, true, 'mysql', 'sensors'),
@@ -59,9 +163,18 @@ INSERT INTO ingest_control (ip_address, port, name, chunk_size, max_chunks_per_r
 ('file-endpoint', 8000, 'File-based Camera System', 10, 50, true, 'file', NULL);
 
 -- Create indexes for better query performance
-CREATE INDEX idx_accelerometer_timestamp ON accelerometer_data(timestamp);
-CREATE INDEX idx_accelerometer_endpoint ON accelerometer_data(endpoint_name);
-CREATE INDEX idx_accel_mag_timestamp ON accel_mag_data(timestamp);
-CREATE INDEX idx_accel_mag_endpoint ON accel_mag_data(endpoint_name);
+-- Raw rows arrive in time order, so a BRIN index (a few pages per partition) serves
+-- time-range scans instead of a B-tree that every insert has to update
+CREATE INDEX idx_accelerometer_timestamp ON accelerometer_data USING brin (timestamp);
+CREATE INDEX idx_accel_mag_timestamp ON accel_mag_data USING brin (timestamp);
+-- Per-endpoint time ranges (rollup refreshes read one endpoint's touched minutes)
+CREATE INDEX idx_accelerometer_endpoint_timestamp ON accelerometer_data(endpoint_name, timestamp);
+CREATE INDEX idx_accel_mag_endpoint_timestamp ON accel_mag_data(endpoint_name, timestamp);
+-- Upserts merge on these keys (unique indexes on a partitioned table must include the
+-- partition column; source-key uniqueness itself is kept in sensor_source_keys). They
+-- also serve per-endpoint lookups, so there is no separate endpoint_name index
+CREATE UNIQUE INDEX uq_accelerometer_endpoint_source ON accelerometer_data(endpoint_name, source_id, timestamp);
+CREATE UNIQUE INDEX uq_accel_mag_endpoint_source ON accel_mag_data(endpoint_name, source_id, timestamp);
+CREATE UNIQUE INDEX uq_file_metadata_endpoint_folder ON file_metadata(endpoint_name, folder_path);
 CREATE INDEX idx_file_metadata_endpoint ON file_metadata(endpoint_name);
 CREATE INDEX idx_ingest_control_active ON ingest_control(active);
@@ -0,0 +1,3 @@
+-- Pipelined fetch/load: number of chunks prefetched from the source while the
+-- previous chunk is being inserted into Supabase (0 = strictly serial)
+ALTER TABLE ingest_control ADD COLUMN IF NOT EXISTS pipeline_depth INTEGER DEFAULT 2;
@@ -0,0 +1,23 @@
+-- Per-endpoint ingestion checkpoint so resuming is a primary-key lookup
+-- instead of a MAX(source_id) scan over the target tables
+CREATE TABLE IF NOT EXISTS ingest_state (
+    target_table VARCHAR(100) NOT NULL,
+    endpoint_name VARCHAR(255) NOT NULL,
+    last_source_id BIGINT, -- highest source id committed to target_table
+    rows_ingested BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (target_table, endpoint_name)
+);
+
+-- One-time seed from the data already ingested
+INSERT INTO ingest_state (target_table, endpoint_name, last_source_id, rows_ingested)
+SELECT 'accelerometer_data', endpoint_name, MAX(source_id), COUNT(*)
+FROM accelerometer_data
+GROUP BY endpoint_name
+ON CONFLICT (target_table, endpoint_name) DO NOTHING;
+
+INSERT INTO ingest_state (target_table, endpoint_name, last_source_id, rows_ingested)
+SELECT 'accel_mag_data', endpoint_name, MAX(source_id), COUNT(*)
+FROM accel_mag_data
+GROUP BY endpoint_name
+ON CONFLICT (target_table, endpoint_name) DO NOTHING;
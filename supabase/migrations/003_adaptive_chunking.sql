@@ -0,0 +1,6 @@
+-- Adaptive chunk sizing: chunk_size is tuned between the floor and ceiling from
+-- measured throughput, and the learned value is written back to chunk_size
+ALTER TABLE ingest_control ADD COLUMN IF NOT EXISTS adaptive_chunking BOOLEAN DEFAULT true;
+ALTER TABLE ingest_control ADD COLUMN IF NOT EXISTS min_chunk_size INTEGER DEFAULT 50;
+ALTER TABLE ingest_control ADD COLUMN IF NOT EXISTS max_chunk_size INTEGER DEFAULT 10000;
+ALTER TABLE ingest_control ADD COLUMN IF NOT EXISTS run_time_budget_seconds INTEGER DEFAULT 60;
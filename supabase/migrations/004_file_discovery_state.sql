@@ -0,0 +1,15 @@
+-- Incremental folder discovery for file endpoints: a folder-name high-water mark
+-- plus the time of the last full reconciliation sweep
+ALTER TABLE ingest_state ADD COLUMN IF NOT EXISTS last_folder VARCHAR(255);
+ALTER TABLE ingest_state ADD COLUMN IF NOT EXISTS last_reconciled_at TIMESTAMP;
+
+-- One-time seed from the folders already ingested. last_reconciled_at stays NULL
+-- so the first run does a full sweep before switching to incremental scans
+INSERT INTO ingest_state (target_table, endpoint_name, last_folder, rows_ingested)
+SELECT 'file_metadata',
+       endpoint_name,
+       MAX(substring(folder_path from '(\d{8}_\d{6})$')),
+       COUNT(*)
+FROM file_metadata
+GROUP BY endpoint_name
+ON CONFLICT (target_table, endpoint_name) DO UPDATE SET last_folder = EXCLUDED.last_folder;
@@ -0,0 +1,8 @@
+-- Parsed contents of each folder's measurement.xml and location.kmz
+ALTER TABLE file_metadata ADD COLUMN IF NOT EXISTS measured_at TIMESTAMP;
+ALTER TABLE file_metadata ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE file_metadata ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+ALTER TABLE file_metadata ADD COLUMN IF NOT EXISTS altitude DOUBLE PRECISION;
+ALTER TABLE file_metadata ADD COLUMN IF NOT EXISTS kml_latitude DOUBLE PRECISION;
+ALTER TABLE file_metadata ADD COLUMN IF NOT EXISTS kml_longitude DOUBLE PRECISION;
+ALTER TABLE file_metadata ADD COLUMN IF NOT EXISTS kml_altitude DOUBLE PRECISION;
@@ -0,0 +1,4 @@
+-- Backfill partitions replace an endpoint's rows by source_id range before loading;
+-- this keeps those deletes (and MAX(source_id) lookups) off a full endpoint scan
+CREATE INDEX IF NOT EXISTS idx_accelerometer_endpoint_source ON accelerometer_data(endpoint_name, source_id);
+CREATE INDEX IF NOT EXISTS idx_accel_mag_endpoint_source ON accel_mag_data(endpoint_name, source_id);
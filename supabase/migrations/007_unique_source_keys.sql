@@ -0,0 +1,28 @@
+-- Make (endpoint_name, source_id) unique so retried chunks and overlapping
+-- backfills can upsert instead of duplicating rows. Existing duplicates are
+-- removed first, keeping the earliest-ingested copy.
+DELETE FROM accelerometer_data a
+USING accelerometer_data b
+WHERE a.endpoint_name = b.endpoint_name
+  AND a.source_id = b.source_id
+  AND a.id > b.id;
+
+DELETE FROM accel_mag_data a
+USING accel_mag_data b
+WHERE a.endpoint_name = b.endpoint_name
+  AND a.source_id = b.source_id
+  AND a.id > b.id;
+
+DELETE FROM file_metadata a
+USING file_metadata b
+WHERE a.endpoint_name = b.endpoint_name
+  AND a.folder_path = b.folder_path
+  AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_accelerometer_endpoint_source ON accelerometer_data(endpoint_name, source_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_accel_mag_endpoint_source ON accel_mag_data(endpoint_name, source_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_file_metadata_endpoint_folder ON file_metadata(endpoint_name, folder_path);
+
+-- The unique indexes cover the range lookups added in 006
+DROP INDEX IF EXISTS idx_accelerometer_endpoint_source;
+DROP INDEX IF EXISTS idx_accel_mag_endpoint_source;
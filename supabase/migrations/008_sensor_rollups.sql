@@ -0,0 +1,22 @@
+-- Downsampled accelerometer/magnetometer stats per endpoint, axis and 1s/1m/1h bucket.
+-- Only rows ingested from now on are rolled up; history can be rolled up by calling
+-- SupabaseResource.refresh_rollups over its source id range.
+CREATE TABLE IF NOT EXISTS sensor_rollups (
+    source_table VARCHAR(100) NOT NULL, -- 'accelerometer_data' or 'accel_mag_data'
+    endpoint_name VARCHAR(255) NOT NULL,
+    resolution VARCHAR(4) NOT NULL, -- '1s', '1m' or '1h'
+    bucket_start TIMESTAMP NOT NULL,
+    axis VARCHAR(20) NOT NULL, -- accel_x ... mag_z
+    sample_count BIGINT NOT NULL, -- non-NULL raw values in the bucket
+    min_value DOUBLE PRECISION,
+    max_value DOUBLE PRECISION,
+    sum_value DOUBLE PRECISION,
+    sum_squares DOUBLE PRECISION,
+    mean_value DOUBLE PRECISION GENERATED ALWAYS AS (sum_value / sample_count) STORED,
+    rms_value DOUBLE PRECISION GENERATED ALWAYS AS (sqrt(sum_squares / sample_count)) STORED,
+    PRIMARY KEY (source_table, endpoint_name, resolution, bucket_start, axis)
+);
+
+-- Rollup refreshes re-read an endpoint's raw rows by time window
+CREATE INDEX IF NOT EXISTS idx_accelerometer_endpoint_timestamp ON accelerometer_data(endpoint_name, timestamp);
+CREATE INDEX IF NOT EXISTS idx_accel_mag_endpoint_timestamp ON accel_mag_data(endpoint_name, timestamp);
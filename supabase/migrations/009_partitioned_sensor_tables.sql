@@ -0,0 +1,68 @@
+-- Convert accelerometer_data and accel_mag_data to tables range-partitioned on
+-- timestamp with BRIN timestamp indexes. Existing rows are copied into the
+-- default partition; the next storage_maintenance_job run moves them into
+-- per-interval partitions. Ingestion should be paused while this runs: both
+-- tables are locked and rewritten in one transaction.
+BEGIN;
+
+-- accelerometer_data
+ALTER TABLE accelerometer_data RENAME TO accelerometer_data_unpartitioned;
+ALTER INDEX accelerometer_data_pkey RENAME TO accelerometer_data_unpartitioned_pkey;
+
+CREATE TABLE accelerometer_data (
+    id INTEGER NOT NULL DEFAULT nextval('accelerometer_data_id_seq'),
+    endpoint_name VARCHAR(255) NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    accel_x DECIMAL(10, 6),
+    accel_y DECIMAL(10, 6),
+    accel_z DECIMAL(10, 6),
+    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    source_id INTEGER,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+-- Keep the id sequence when the old table is dropped
+ALTER SEQUENCE accelerometer_data_id_seq OWNED BY accelerometer_data.id;
+CREATE TABLE accelerometer_data_default PARTITION OF accelerometer_data DEFAULT;
+
+INSERT INTO accelerometer_data (id, endpoint_name, timestamp, accel_x, accel_y, accel_z, ingested_at, source_id)
+SELECT id, endpoint_name, timestamp, accel_x, accel_y, accel_z, ingested_at, source_id
+FROM accelerometer_data_unpartitioned;
+DROP TABLE accelerometer_data_unpartitioned;
+
+CREATE INDEX idx_accelerometer_timestamp ON accelerometer_data USING brin (timestamp);
+-- Recreates 008's index, dropped with the unpartitioned table
+CREATE INDEX idx_accelerometer_endpoint_timestamp ON accelerometer_data(endpoint_name, timestamp);
+CREATE UNIQUE INDEX uq_accelerometer_endpoint_source ON accelerometer_data(endpoint_name, source_id, timestamp);
+
+-- accel_mag_data
+ALTER TABLE accel_mag_data RENAME TO accel_mag_data_unpartitioned;
+ALTER INDEX accel_mag_data_pkey RENAME TO accel_mag_data_unpartitioned_pkey;
+
+CREATE TABLE accel_mag_data (
+    id INTEGER NOT NULL DEFAULT nextval('accel_mag_data_id_seq'),
+    endpoint_name VARCHAR(255) NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    accel_x DECIMAL(10, 6),
+    accel_y DECIMAL(10, 6),
+    accel_z DECIMAL(10, 6),
+    mag_x DECIMAL(10, 6),
+    mag_y DECIMAL(10, 6),
+    mag_z DECIMAL(10, 6),
+    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    source_id INTEGER,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+ALTER SEQUENCE accel_mag_data_id_seq OWNED BY accel_mag_data.id;
+CREATE TABLE accel_mag_data_default PARTITION OF accel_mag_data DEFAULT;
+
+INSERT INTO accel_mag_data (id, endpoint_name, timestamp, accel_x, accel_y, accel_z, mag_x, mag_y, mag_z, ingested_at, source_id)
+SELECT id, endpoint_name, timestamp, accel_x, accel_y, accel_z, mag_x, mag_y, mag_z, ingested_at, source_id
+FROM accel_mag_data_unpartitioned;
+DROP TABLE accel_mag_data_unpartitioned;
+
+CREATE INDEX idx_accel_mag_timestamp ON accel_mag_data USING brin (timestamp);
+-- Recreates 008's index, dropped with the unpartitioned table
+CREATE INDEX idx_accel_mag_endpoint_timestamp ON accel_mag_data(endpoint_name, timestamp);
+CREATE UNIQUE INDEX uq_accel_mag_endpoint_source ON accel_mag_data(endpoint_name, source_id, timestamp);
+
+COMMIT;
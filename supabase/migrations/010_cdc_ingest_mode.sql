@@ -0,0 +1,8 @@
+-- Change-data-capture: endpoints with ingest_mode = 'cdc' are streamed by the
+-- cdc-consumer service instead of polled by endpoint_monitor_sensor, and their
+-- replication position is checkpointed next to last_source_id
+ALTER TABLE ingest_control
+    ADD COLUMN IF NOT EXISTS ingest_mode VARCHAR(10) NOT NULL DEFAULT 'poll';
+
+ALTER TABLE ingest_state
+    ADD COLUMN IF NOT EXISTS cdc_position BIGINT;
@@ -0,0 +1,7 @@
+-- Event-driven file discovery: the file-watcher service appends completed
+-- folders here and file_event_sensor reads them from its cursor
+CREATE TABLE IF NOT EXISTS file_events (
+    id BIGSERIAL PRIMARY KEY,
+    folder_name VARCHAR(255) NOT NULL,
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
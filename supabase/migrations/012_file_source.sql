@@ -0,0 +1,4 @@
+-- File endpoints with file_source = 'remote' are synced through the endpoint's
+-- /manifest HTTP API instead of reading FILE_DATA_DIR
+ALTER TABLE ingest_control
+    ADD COLUMN IF NOT EXISTS file_source VARCHAR(10) NOT NULL DEFAULT 'local';
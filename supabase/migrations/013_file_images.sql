@@ -0,0 +1,17 @@
+-- Content-addressed image dedup: the file_images asset records each image's
+-- SHA-256 and shared thumbnail, and skips files whose size and mtime are unchanged
+CREATE TABLE IF NOT EXISTS file_images (
+    endpoint_name VARCHAR(255) NOT NULL,
+    folder_path VARCHAR(500) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    file_size BIGINT NOT NULL, -- with file_mtime_ns, decides whether content_hash is still current
+    file_mtime_ns BIGINT NOT NULL,
+    content_hash CHAR(64) NOT NULL, -- SHA-256 of the image bytes
+    width INTEGER,
+    height INTEGER,
+    thumbnail_path VARCHAR(500), -- INGEST_THUMBNAIL_DIR/<hash[:2]>/<hash>.jpg, shared by equal images
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (endpoint_name, folder_path, file_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_file_images_content_hash ON file_images(content_hash);
@@ -0,0 +1,11 @@
+-- Ledger of planned backfill partitions: backfill_planner_sensor records each
+-- range when it moves the watermark past it, and the partition run removes it
+-- once loaded, so a failed or never-launched run no longer loses its range
+CREATE TABLE IF NOT EXISTS backfill_ranges (
+    target_table VARCHAR(100) NOT NULL,
+    endpoint_name VARCHAR(255) NOT NULL,
+    partition_key VARCHAR(255) NOT NULL, -- "<endpoint_id>:<after_id>-<up_to_id>"
+    attempts INTEGER NOT NULL DEFAULT 1, -- runs requested for the range
+    planned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (target_table, partition_key)
+);
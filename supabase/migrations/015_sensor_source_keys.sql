@@ -0,0 +1,31 @@
+-- Restore (endpoint_name, source_id) uniqueness on the partitioned sensor tables.
+-- Their unique indexes (009) have to include timestamp, so a source row read again
+-- after its timestamp changed would load as a second row. Upserts now claim each
+-- row's source key in sensor_source_keys first. Existing rows are registered here;
+-- any duplicates loaded since 009 keep their oldest timestamp as the claimed key and
+-- should be removed by hand. Pause ingestion while this runs.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS sensor_source_keys (
+    source_table VARCHAR(100) NOT NULL, -- 'accelerometer_data' or 'accel_mag_data'
+    endpoint_name VARCHAR(255) NOT NULL,
+    source_id BIGINT NOT NULL,
+    timestamp TIMESTAMP NOT NULL, -- of the loaded row, so retention purges keys with their partition
+    PRIMARY KEY (source_table, endpoint_name, source_id)
+);
+
+INSERT INTO sensor_source_keys (source_table, endpoint_name, source_id, timestamp)
+SELECT DISTINCT ON (endpoint_name, source_id) 'accelerometer_data', endpoint_name, source_id, timestamp
+FROM accelerometer_data
+WHERE source_id IS NOT NULL
+ORDER BY endpoint_name, source_id, timestamp
+ON CONFLICT DO NOTHING;
+
+INSERT INTO sensor_source_keys (source_table, endpoint_name, source_id, timestamp)
+SELECT DISTINCT ON (endpoint_name, source_id) 'accel_mag_data', endpoint_name, source_id, timestamp
+FROM accel_mag_data
+WHERE source_id IS NOT NULL
+ORDER BY endpoint_name, source_id, timestamp
+ON CONFLICT DO NOTHING;
+
+COMMIT;
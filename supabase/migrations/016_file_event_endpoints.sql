@@ -0,0 +1,7 @@
+-- Record which file endpoint each file_events row belongs to, so file_event_sensor
+-- hands an endpoint only its own folders. Rows from before this migration have no
+-- endpoint and are never handed out; the sensor's periodic plain run picks their
+-- folders up.
+ALTER TABLE file_events ADD COLUMN IF NOT EXISTS endpoint_name VARCHAR(255);
+
+CREATE INDEX IF NOT EXISTS idx_file_events_endpoint ON file_events(endpoint_name, id);